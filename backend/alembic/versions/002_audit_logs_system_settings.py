@@ -0,0 +1,104 @@
+"""Audit logs & system settings
+
+Jusqu'ici ces tables n'étaient créées que par `Base.metadata.create_all` au
+démarrage de l'API. Les bases déjà initialisées ainsi sont adoptées telles
+quelles (création ignorée si la table existe).
+
+Revision ID: 002
+Revises: 001
+Create Date: 2024-06-01 00:00:00.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+# Noms des membres de app.models.audit.ActionType (SQLEnum stocke les noms)
+ACTION_TYPES = (
+    'USER_LOGIN', 'USER_LOGOUT', 'USER_CREATE', 'USER_UPDATE', 'USER_DELETE',
+    'USER_ACTIVATE', 'USER_DEACTIVATE',
+    'ROLE_CREATE', 'ROLE_UPDATE', 'ROLE_DELETE', 'ROLE_ASSIGN', 'ROLE_REVOKE',
+    'PERMISSION_CREATE', 'PERMISSION_UPDATE', 'PERMISSION_DELETE', 'PERMISSION_ASSIGN',
+    'SYSTEM_SETTINGS_UPDATE', 'SYSTEM_BACKUP', 'SYSTEM_MAINTENANCE',
+)
+
+
+def _has_table(name: str) -> bool:
+    # Mode --sql : pas de connexion, on génère toujours la création
+    if context.is_offline_mode():
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    if not _has_table('audit_logs'):
+        op.create_table(
+            'audit_logs',
+            sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column('action', sa.Enum(*ACTION_TYPES, name='actiontype'), nullable=False),
+            sa.Column('description', sa.String(500), nullable=False),
+            sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True),
+            sa.Column('user_email', sa.String(255), nullable=True),
+            sa.Column('user_name', sa.String(255), nullable=True),
+            sa.Column('target_type', sa.String(50), nullable=True),
+            sa.Column('target_id', sa.String(255), nullable=True),
+            sa.Column('target_name', sa.String(255), nullable=True),
+            sa.Column('ip_address', sa.String(50), nullable=True),
+            sa.Column('user_agent', sa.String(500), nullable=True),
+            sa.Column('details', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        )
+        op.create_index('ix_audit_logs_action', 'audit_logs', ['action'])
+        op.create_index('ix_audit_logs_user_id', 'audit_logs', ['user_id'])
+        op.create_index('ix_audit_logs_created_at', 'audit_logs', ['created_at'])
+
+    if not _has_table('system_settings'):
+        op.create_table(
+            'system_settings',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('site_name', sa.String(255), nullable=True),
+            sa.Column('site_description', sa.Text(), nullable=True),
+            sa.Column('support_email', sa.String(255), nullable=True),
+            sa.Column('support_phone', sa.String(50), nullable=True),
+            sa.Column('timezone', sa.String(100), nullable=True),
+            sa.Column('language', sa.String(10), nullable=True),
+            sa.Column('date_format', sa.String(50), nullable=True),
+            sa.Column('session_timeout', sa.Integer(), nullable=True),
+            sa.Column('password_min_length', sa.Integer(), nullable=True),
+            sa.Column('password_require_uppercase', sa.Boolean(), nullable=True),
+            sa.Column('password_require_lowercase', sa.Boolean(), nullable=True),
+            sa.Column('password_require_numbers', sa.Boolean(), nullable=True),
+            sa.Column('password_require_special', sa.Boolean(), nullable=True),
+            sa.Column('max_login_attempts', sa.Integer(), nullable=True),
+            sa.Column('lockout_duration', sa.Integer(), nullable=True),
+            sa.Column('two_factor_auth_enabled', sa.Boolean(), nullable=True),
+            sa.Column('smtp_host', sa.String(255), nullable=True),
+            sa.Column('smtp_port', sa.Integer(), nullable=True),
+            sa.Column('smtp_username', sa.String(255), nullable=True),
+            sa.Column('smtp_password', sa.String(255), nullable=True),
+            sa.Column('smtp_use_tls', sa.Boolean(), nullable=True),
+            sa.Column('smtp_from_email', sa.String(255), nullable=True),
+            sa.Column('smtp_from_name', sa.String(255), nullable=True),
+            sa.Column('enable_audit_log', sa.Boolean(), nullable=True),
+            sa.Column('enable_email_notifications', sa.Boolean(), nullable=True),
+            sa.Column('enable_user_registration', sa.Boolean(), nullable=True),
+            sa.Column('enable_password_reset', sa.Boolean(), nullable=True),
+            sa.Column('maintenance_mode', sa.Boolean(), nullable=True),
+            sa.Column('maintenance_message', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('updated_by', sa.Integer(), nullable=True),
+        )
+        op.create_index('ix_system_settings_id', 'system_settings', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_table('system_settings')
+    op.drop_table('audit_logs')
+    sa.Enum(name='actiontype').drop(op.get_bind(), checkfirst=True)
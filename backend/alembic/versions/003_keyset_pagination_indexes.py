@@ -0,0 +1,47 @@
+"""Keyset pagination indexes
+
+Index composites (created_at, id) pour la pagination par curseur des
+utilisateurs et des logs d'audit ; (action, created_at, id) pour la liste
+filtrée par action. Ils remplacent les index simples sur created_at et
+action, qui en sont des préfixes.
+
+Création CONCURRENTLY : pas de verrou d'écriture sur audit_logs.
+
+Revision ID: 003
+Revises: 002
+Create Date: 2024-06-15 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_audit_logs_created_at_id', 'audit_logs', ['created_at', 'id'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_audit_logs_action_created_at_id', 'audit_logs', ['action', 'created_at', 'id'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_users_created_at_id', 'users', ['created_at', 'id'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.drop_index('ix_audit_logs_created_at', 'audit_logs', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_audit_logs_action', 'audit_logs', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    op.create_index('ix_audit_logs_action', 'audit_logs', ['action'])
+    op.create_index('ix_audit_logs_created_at', 'audit_logs', ['created_at'])
+    op.drop_index('ix_users_created_at_id', 'users')
+    op.drop_index('ix_audit_logs_action_created_at_id', 'audit_logs')
+    op.drop_index('ix_audit_logs_created_at_id', 'audit_logs')
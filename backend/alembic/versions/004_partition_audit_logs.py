@@ -0,0 +1,83 @@
+"""Monthly partitions for audit_logs
+
+audit_logs devient une table partitionnée par mois sur created_at (clé
+primaire (id, created_at)). Les lignes existantes ne sont pas recopiées :
+l'ancienne table est attachée telle quelle comme partition
+`audit_logs_legacy` couvrant tout jusqu'au mois prochain (une contrainte
+CHECK validée au préalable évite le scan pendant l'ATTACH). Viennent ensuite
+les partitions des prochains mois et une partition par défaut ; la suite est
+assurée par `python -m scripts.audit_partitions`.
+
+Ajoute aussi system_settings.audit_retention_days (0 = illimitée).
+
+Revision ID: 004
+Revises: 003
+Create Date: 2024-07-01 00:00:00.000000
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_audit_logs_user_id', ['user_id']),
+    ('ix_audit_logs_created_at_id', ['created_at', 'id']),
+    ('ix_audit_logs_action_created_at_id', ['action', 'created_at', 'id']),
+)
+MONTHS_AHEAD = 3
+
+
+def _month(index: int) -> datetime:
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def upgrade() -> None:
+    now = datetime.now(timezone.utc)
+    current = now.year * 12 + now.month - 1
+    boundary = _month(current + 1).isoformat()
+
+    # L'ancienne table et ses index libèrent leurs noms
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_legacy")
+    op.execute("ALTER TABLE audit_logs_legacy RENAME CONSTRAINT audit_logs_pkey TO audit_logs_legacy_pkey")
+    for name, _ in INDEXES:
+        op.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name.replace('audit_logs', 'audit_logs_legacy')}")
+
+    op.execute("CREATE TABLE audit_logs (LIKE audit_logs_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+    op.create_primary_key('audit_logs_pkey', 'audit_logs', ['id', 'created_at'])
+    for name, columns in INDEXES:
+        op.create_index(name, 'audit_logs', columns)
+
+    # Historique : attaché sans copie jusqu'au début du mois prochain
+    op.execute(f"ALTER TABLE audit_logs_legacy ADD CONSTRAINT audit_logs_legacy_range CHECK (created_at < '{boundary}')")
+    op.execute(f"ALTER TABLE audit_logs ATTACH PARTITION audit_logs_legacy FOR VALUES FROM (MINVALUE) TO ('{boundary}')")
+    op.execute("ALTER TABLE audit_logs_legacy DROP CONSTRAINT audit_logs_legacy_range")
+
+    for index in range(current + 1, current + 1 + MONTHS_AHEAD):
+        month = _month(index)
+        op.execute(
+            f"CREATE TABLE audit_logs_y{month.year}m{month.month:02d} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_month(index + 1).isoformat()}')"
+        )
+    op.execute("CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT")
+
+    op.add_column('system_settings', sa.Column('audit_retention_days', sa.Integer(), nullable=True, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('system_settings', 'audit_retention_days')
+
+    # Les partitions déjà archivées (schéma audit_archive) ne sont pas réintégrées
+    op.execute("CREATE TABLE audit_logs_flat (LIKE audit_logs INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO audit_logs_flat SELECT * FROM audit_logs")
+    op.execute("DROP TABLE audit_logs")
+    op.execute("ALTER TABLE audit_logs_flat RENAME TO audit_logs")
+    op.create_primary_key('audit_logs_pkey', 'audit_logs', ['id'])
+    for name, columns in INDEXES:
+        op.create_index(name, 'audit_logs', columns)
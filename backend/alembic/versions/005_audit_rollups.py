@@ -0,0 +1,42 @@
+"""Hourly audit rollups
+
+Table audit_rollups : nombre de logs par (heure, action, utilisateur, type de
+cible), tenue à jour par l'écriture des logs (app/core/audit_writer.py) et
+lue par /audit/stats. L'historique est agrégé en une seule requête groupée.
+
+Revision ID: 005
+Revises: 004
+Create Date: 2024-07-15 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'audit_rollups',
+        sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('action', postgresql.ENUM(name='actiontype', create_type=False), nullable=False),
+        sa.Column('user_email', sa.String(255), nullable=False, server_default=''),
+        sa.Column('target_type', sa.String(50), nullable=False, server_default=''),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('bucket', 'action', 'user_email', 'target_type'),
+    )
+    op.execute(
+        "INSERT INTO audit_rollups (bucket, action, user_email, target_type, count) "
+        "SELECT date_trunc('hour', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', action, "
+        "COALESCE(user_email, ''), COALESCE(target_type, ''), count(*) "
+        "FROM audit_logs GROUP BY 1, 2, 3, 4"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('audit_rollups')
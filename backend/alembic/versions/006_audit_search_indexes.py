@@ -0,0 +1,68 @@
+"""Audit search indexes
+
+- details : texte JSON -> JSONB (réécriture de la table, verrou exclusif :
+  à passer hors charge), index GIN ;
+- user_email, user_name : index trigrammes (pg_trgm) pour les ILIKE '%...%' ;
+- target_id, ip_address : B-tree.
+
+audit_logs est partitionnée : PostgreSQL ne construit pas d'index
+CONCURRENTLY sur la table parente. On crée l'index parent seul (ON ONLY,
+invalide), on le construit CONCURRENTLY partition par partition, puis on y
+attache chaque index ; il devient valide avec la dernière partition. Les
+partitions créées ensuite héritent des index.
+
+Revision ID: 006
+Revises: 005
+Create Date: 2024-08-01 00:00:00.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+PREFIX = 'ix_audit_logs_'
+INDEXES = (
+    ('ix_audit_logs_user_email_trgm', 'USING gin (user_email gin_trgm_ops)'),
+    ('ix_audit_logs_user_name_trgm', 'USING gin (user_name gin_trgm_ops)'),
+    ('ix_audit_logs_details', 'USING gin (details)'),
+    ('ix_audit_logs_target_id', '(target_id)'),
+    ('ix_audit_logs_ip_address', '(ip_address)'),
+)
+
+
+def _partitions():
+    # Mode --sql : pas de connexion, index créés directement sur la table parente
+    if context.is_offline_mode():
+        return None
+    return op.get_bind().execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'audit_logs'::regclass ORDER BY c.relname"
+    )).scalars().all()
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("ALTER TABLE audit_logs ALTER COLUMN details TYPE jsonb USING details::jsonb")
+    partitions = _partitions()
+
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES:
+            if partitions is None:
+                op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON audit_logs {definition}")
+                continue
+            op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY audit_logs {definition}")
+            for partition in partitions:
+                child = f"{partition}_{name[len(PREFIX):]}"
+                op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} ON {partition} {definition}")
+                op.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+
+
+def downgrade() -> None:
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, 'audit_logs', if_exists=True)
+    op.execute("ALTER TABLE audit_logs ALTER COLUMN details TYPE text USING details::text")
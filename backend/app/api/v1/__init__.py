@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1 import auth, users, roles, permissions, stats, audit, settings
+from app.api.v1 import auth, users, roles, permissions, stats, audit, settings, metrics
 
 api_router = APIRouter()
 
@@ -10,3 +10,4 @@ api_router.include_router(permissions.router, prefix="/permissions", tags=["perm
 api_router.include_router(stats.router, prefix="/stats", tags=["statistics"])
 api_router.include_router(audit.router, prefix="/audit", tags=["audit"])
 api_router.include_router(settings.router, prefix="/settings", tags=["settings"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
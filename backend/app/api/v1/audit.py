@@ -1,93 +1,153 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
+import asyncio
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import desc, func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
 from datetime import datetime, timedelta, timezone
-from app.core.database import get_db
-from app.core.deps import has_permission
-from app.models.user import User
-from app.models.audit import AuditLog, ActionType
+from app.core.audit_stream import audit_stream
+from app.core.database import get_read_db
+from app.core.deps import has_permission, recheck_permission
+from app.core.auth_cache import Principal
+from app.core.pagination import Keyset
+from app.core.query_stats import query_budget
+from app.models.audit import AuditLog, AuditRollup, ActionType
 from app.schemas.audit import AuditLogResponse
+from app.services.audit_cold_storage import audit_cold_store
+from app.services.audit_export import EXPORT_FORMATS, export_filename, stream_export
+from app.services.audit_search import AuditLogFilters
 
 router = APIRouter()
 
+# Plus récents d'abord ; index ix_audit_logs_created_at_id
+AUDIT_KEYSET = Keyset(AuditLog.created_at, AuditLog.id, descending=True)
+
 
 @router.get("/", response_model=List[AuditLogResponse])
 @router.get("", response_model=List[AuditLogResponse])
-def list_audit_logs(
+async def list_audit_logs(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    action: Optional[str] = Query(None, description="Filter by action type"),
-    user_email: Optional[str] = Query(None, description="Filter by user email"),
-    target_type: Optional[str] = Query(None, description="Filter by target type"),
-    days: Optional[int] = Query(None, description="Filter by last N days"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("system", "read"))
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    filters: AuditLogFilters = Depends(),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(has_permission("system", "read"))
 ):
     """
     Lister tous les logs d'audit avec filtres optionnels
     """
-    query = db.query(AuditLog)
-    
-    # Apply filters
-    if action:
-        query = query.filter(AuditLog.action == action)
-    
-    if user_email:
-        query = query.filter(AuditLog.user_email.ilike(f"%{user_email}%"))
-    
-    if target_type:
-        query = query.filter(AuditLog.target_type == target_type)
+    query = filters.apply(select(AuditLog))
     
-    if days:
-        start_date = datetime.now(timezone.utc) - timedelta(days=days)
-        query = query.filter(AuditLog.created_at >= start_date)
+    if audit_cold_store.covers(filters.window()[0]):
+        # Window reaching into cold storage: merge database and Parquet pages
+        offset = 0 if cursor else skip
+        before = tuple(AUDIT_KEYSET.decode(cursor)) if cursor else None
+        hot = (await db.execute(AUDIT_KEYSET.paginate(query, offset + limit, cursor))).scalars().all()
+        cold = await asyncio.to_thread(audit_cold_store.list, filters, offset + limit, before)
+        logs = sorted(
+            [*hot, *(AuditLogResponse(**row) for row in cold)],
+            key=lambda log: (log.created_at, str(log.id)),
+            reverse=True,
+        )[offset:offset + limit]
+        AUDIT_KEYSET.set_next_cursor(response, logs, limit)
+        return logs
     
-    # Order by most recent first
-    query = query.order_by(desc(AuditLog.created_at))
-    
-    # Pagination
-    logs = query.offset(skip).limit(limit).all()
+    # Most recent first, keyset pagination (offset kept for compatibility)
+    logs = (await db.execute(AUDIT_KEYSET.paginate(query, limit, cursor, skip))).scalars().all()
+    AUDIT_KEYSET.set_next_cursor(response, logs, limit)
     
     return logs
 
 
+@router.get("/export")
+@router.get("/export/")
+async def export_audit_logs(
+    export_format: Literal["csv", "ndjson", "parquet"] = Query("csv", alias="format", description="csv, ndjson or parquet"),
+    gzip: bool = Query(False, description="Compress the file with gzip"),
+    filters: AuditLogFilters = Depends(),
+    current_user: Principal = Depends(has_permission("system", "read"))
+):
+    """
+    Exporter les logs d'audit filtrés (flux, mémoire constante quel que soit le volume)
+    """
+    media_type, _ = EXPORT_FORMATS[export_format]
+    filename = export_filename(export_format, gzip, datetime.now(timezone.utc))
+    return StreamingResponse(
+        stream_export(filters.apply(select(AuditLog)), export_format, gzip),
+        media_type="application/gzip" if gzip else media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/stream")
+@router.get("/stream/")
+async def stream_audit_logs(
+    request: Request,
+    action: Optional[str] = Query(None, description="Filter by action type"),
+    target_type: Optional[str] = Query(None, description="Filter by target type"),
+    user_email: Optional[str] = Query(None, description="Filter by user email (substring)"),
+    current_user: Principal = Depends(has_permission("system", "read"))
+):
+    """
+    Suivre les nouveaux logs d'audit en direct (Server-Sent Events)
+    """
+    session_id = getattr(request.state, "session_id", None)
+
+    async def authorize() -> bool:
+        # Revérifié pendant toute la durée du flux : révocation, désactivation, retrait du droit
+        return await recheck_permission(current_user.id, session_id, "system", "read")
+
+    return StreamingResponse(
+        audit_stream.sse(authorize, action=action, target_type=target_type, user_email=user_email),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/stats")
 @router.get("/stats/")
-def get_audit_stats(
+@query_budget(5)
+async def get_audit_stats(
     days: int = 7,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("system", "read"))
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(has_permission("system", "read"))
 ):
     """
     Récupérer les statistiques des logs d'audit
     """
     start_date = datetime.now(timezone.utc) - timedelta(days=days)
+    # Heures complètes : audit_rollups ; heure entamée en début de fenêtre : logs bruts
+    first_bucket = start_date.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    # Rollups survive archival; only the partial head hour may sit in cold storage
+    cold_counts = await asyncio.to_thread(audit_cold_store.counts, start_date, first_bucket) if audit_cold_store.covers(start_date) else {}
+    window = union_all(
+        select(AuditRollup.action, AuditRollup.user_email, AuditRollup.count)
+        .where(AuditRollup.bucket >= first_bucket),
+        select(AuditLog.action, func.coalesce(AuditLog.user_email, ""), literal(1))
+        .where(AuditLog.created_at >= start_date, AuditLog.created_at < first_bucket),
+        *(
+            select(literal(ActionType(action), AuditRollup.action.type), literal(email), literal(count))
+            for (action, email), count in cold_counts.items()
+        ),
+    ).subquery()
     
-    # Total logs in period
-    total_logs = db.query(AuditLog).filter(
-        AuditLog.created_at >= start_date
-    ).count()
-    
-    # Logs by action type
-    logs_by_action = {}
-    for action_type in ActionType:
-        count = db.query(AuditLog).filter(
-            AuditLog.action == action_type,
-            AuditLog.created_at >= start_date
-        ).count()
-        if count > 0:
-            logs_by_action[action_type.value] = count
+    # Logs by action type (one grouped query)
+    logs_by_action = {
+        action.value: count
+        for action, count in (await db.execute(
+            select(window.c.action, func.sum(window.c.count)).group_by(window.c.action)
+        )).all()
+        if count
+    }
+    total_logs = sum(logs_by_action.values())
     
     # Top users by activity
-    from sqlalchemy import func
-    top_users = db.query(
-        AuditLog.user_email,
-        func.count(AuditLog.id).label('count')
-    ).filter(
-        AuditLog.created_at >= start_date,
-        AuditLog.user_email.isnot(None)
-    ).group_by(AuditLog.user_email).order_by(desc('count')).limit(10).all()
+    top_users = (await db.execute(
+        select(window.c.user_email, func.sum(window.c.count).label('count'))
+        .where(window.c.user_email != "")
+        .group_by(window.c.user_email).order_by(desc('count')).limit(10)
+    )).all()
     
     top_users_dict = {email: count for email, count in top_users if email}
     
@@ -101,8 +161,8 @@ def get_audit_stats(
 
 @router.get("/actions")
 @router.get("/actions/")
-def get_available_actions(
-    current_user: User = Depends(has_permission("system", "read"))
+async def get_available_actions(
+    current_user: Principal = Depends(has_permission("system", "read"))
 ):
     """
     Récupérer la liste des types d'actions disponibles
@@ -1,139 +1,274 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from app.core.database import get_db
-from app.core.security import create_access_token, verify_password, get_password_hash
-from app.core.deps import get_current_active_user
-from app.schemas.user import UserCreate, UserResponse, LoginRequest, Token, UserUpdate, ChangePasswordRequest
-from app.services.user_service import UserService
+from app.core.security import verify_password_async, get_password_hash_async, decode_token_claims
+from app.core.authz import authz_versions, issue_access_token
+from app.core.last_login import last_login_buffer
+from app.core.deps import get_current_active_user, get_current_active_principal, optional_oauth2_scheme
+from app.core.auth_cache import Principal, principal_cache
+from app.core.client_ip import get_client_ip
+from app.core.rate_limit import login_throttle
+from app.core.sessions import RefreshTokenReused, session_registry
+from app.core.system_settings import system_settings_cache
+from app.core.query_stats import query_budget
+from app.core.audit_routes import audited
+from app.schemas.user import (
+    UserCreate, UserResponse, LoginRequest, Token, AccessToken, RefreshRequest,
+    UserUpdate, ChangePasswordRequest, SessionResponse,
+)
+from app.services.user_service import TOKEN_CLAIM_FIELDS, UserService
+from app.models.audit import ActionType
 from app.models.user import User
+from typing import List, Optional
+from uuid import UUID
 
 router = APIRouter()
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_in: UserCreate, db: Session = Depends(get_db)):
+@audited(ActionType.USER_CREATE, "user")
+async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
     """
     Créer un nouvel utilisateur
     """
-    user = UserService.create(db, user_in)
+    user = await UserService.create(db, user_in)
     return user
 
 
-@router.post("/login", response_model=Token)
-def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def _login(request: Request, db: AsyncSession, email: str, password: str) -> dict:
     """
-    Authentifier un utilisateur et retourner un token JWT
+    Authentifier (après vérification du verrouillage) et émettre le token
     """
-    user = UserService.authenticate(db, login_data.email, login_data.password)
+    policy = system_settings_cache.peek() or await system_settings_cache.get(db)
+    client_ip = get_client_ip(request)
+    
+    # Rejeter les principaux verrouillés avant tout hachage bcrypt
+    retry_after = await login_throttle.check(
+        email, client_ip, policy.max_login_attempts, policy.lockout_duration
+    )
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Tøø mæñý ¡øĝïñ ættëmþtšẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ",
+            headers={"Retry-After": str(retry_after)},
+        )
+    
+    user = await UserService.authenticate(db, email, password)
     if not user:
+        await login_throttle.record_failure(email, client_ip, policy.lockout_duration)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Ïñçørrëçt ëmæï¡ ør þæššwørðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    await login_throttle.reset(email)
     
-    # Mettre à jour last_login
-    user.last_login = datetime.utcnow()
-    db.commit()
+    # Mettre à jour last_login (écriture différée, vidée par lots)
+    await last_login_buffer.record(user, datetime.utcnow())
+    
+    # Ouvrir la session serveur (sans Redis : token d'accès seul, non révocable)
+    session_id, refresh_token = None, None
+    try:
+        session_id, refresh_token = await session_registry.create(
+            user.id, client_ip, request.headers.get("user-agent")
+        )
+    except Exception as e:
+        print(f"Session creation error: {e}")
     
     # Créer le token
-    access_token = create_access_token(data={"sub": str(user.id)})
+    access_token = await issue_access_token(db, user, session_id)
     
     return {
         "access_token": access_token,
         "token_type": "bearer",
+        "refresh_token": refresh_token,
         "user": user
     }
 
 
+def _invalid_credentials() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Çøµ¡ð ñøt væ¡ïðætë çrëðëñtïæ¡šẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+@router.post("/login", response_model=Token)
+async def login(request: Request, login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Authentifier un utilisateur et retourner un token JWT
+    """
+    return await _login(request, db, login_data.email, login_data.password)
+
+
 @router.post("/login/form", response_model=Token)
-def login_form(
+async def login_form(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Login avec OAuth2PasswordRequestForm pour la documentation Swagger
     """
-    user = UserService.authenticate(db, form_data.username, form_data.password)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Ïñçørrëçt ëmæï¡ ør þæššwørðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    return await _login(request, db, form_data.username, form_data.password)
+
+
+@router.post("/refresh", response_model=AccessToken)
+async def refresh_access_token(
+    refresh_in: Optional[RefreshRequest] = None,
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Ré-émettre un token d'accès :
+    - avec un refresh token : rotation (l'ancien refresh token est consommé) ;
+    - sinon, à partir d'un token d'accès encore valide (mise à jour de
+      versions d'autorisation périmées), seulement si sa session existe
+      encore et n'a pas expiré : la session n'est pas prolongée
+    """
+    refresh_token = None
+    if refresh_in is not None:
+        try:
+            rotated = await session_registry.rotate(refresh_in.refresh_token)
+        except RefreshTokenReused:
+            rotated = None
+        if rotated is None:
+            raise _invalid_credentials()
+        session_id, user_id, refresh_token = rotated
+    else:
+        claims = decode_token_claims(token) if token else None
+        if claims is None:
+            raise _invalid_credentials()
+        user_id, session_id = claims["sub"], claims.get("sid")
+        # Token sans session (Redis indisponible au login) : non révocable, pas de renouvellement
+        if not session_id or await session_registry.is_revoked(session_id):
+            raise _invalid_credentials()
+        try:
+            active = await session_registry.is_active(session_id, user_id)
+        except Exception as e:
+            print(f"Session lookup error: {e}")
+            active = False
+        if not active:
+            raise _invalid_credentials()
     
-    # Mettre à jour last_login
-    user.last_login = datetime.utcnow()
-    db.commit()
-    
-    # Créer le token
-    access_token = create_access_token(data={"sub": str(user.id)})
+    user = await UserService.get_by_id(db, UUID(user_id))
+    if not user or not user.is_active:
+        if session_id:
+            await session_registry.revoke(session_id, user_id)
+        raise _invalid_credentials()
     
     return {
-        "access_token": access_token,
+        "access_token": await issue_access_token(db, user, session_id),
         "token_type": "bearer",
-        "user": user
+        "refresh_token": refresh_token
     }
 
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(current_user: User = Depends(get_current_active_user)):
+@query_budget(6)
+async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
     """
     Récupérer les informations de l'utilisateur courant
     """
+    await last_login_buffer.overlay([current_user])
     return current_user
 
 
 @router.post("/logout")
-def logout(current_user: User = Depends(get_current_active_user)):
+@audited(ActionType.USER_LOGOUT, "session")
+async def logout(request: Request, current_user: Principal = Depends(get_current_active_principal)):
     """
-    Déconnexion (côté client, suppression du token)
+    Déconnexion : révoque la session courante (token d'accès et refresh token)
     """
+    session_id = getattr(request.state, "session_id", None)
+    if session_id:
+        await session_registry.revoke(session_id, current_user.id)
     return {"message": "Šµççëššfµ¡¡ý ¡øĝĝëð øµtẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"}
 
 
+@router.get("/sessions", response_model=List[SessionResponse])
+async def list_my_sessions(
+    request: Request,
+    current_user: Principal = Depends(get_current_active_principal)
+):
+    """
+    Lister les sessions actives de l'utilisateur courant
+    """
+    current_session = getattr(request.state, "session_id", None)
+    return [
+        {**session, "current": session["id"] == current_session}
+        for session in await session_registry.list_sessions(current_user.id)
+    ]
+
+
+@router.delete("/sessions/{session_id}")
+@audited(ActionType.USER_LOGOUT, "session", "session_id")
+async def revoke_my_session(
+    session_id: str,
+    current_user: Principal = Depends(get_current_active_principal)
+):
+    """
+    Révoquer une session de l'utilisateur courant (autre appareil)
+    """
+    if not await session_registry.revoke_user_sessions(current_user.id, [session_id]):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Šëššïøñ ñøt føµñðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
+        )
+    return {"message": "Šëššïøñ rëvøkëð šµççëššfµ¡¡ýẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"}
+
+
 @router.put("/me", response_model=UserResponse)
-def update_current_user(
+async def update_current_user(
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     Mettre à jour les informations de l'utilisateur courant
     """
     # Update user fields
+    changed = set()
     if user_update.first_name is not None:
         current_user.first_name = user_update.first_name
+        changed.add("first_name")
     if user_update.last_name is not None:
         current_user.last_name = user_update.last_name
+        changed.add("last_name")
     if user_update.phone is not None:
         current_user.phone = user_update.phone
+        changed.add("phone")
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await principal_cache.invalidate(current_user.id)
+    if changed & TOKEN_CLAIM_FIELDS:
+        # Le nom est embarqué dans les tokens sans état : les rendre périmés
+        await authz_versions.bump_users(current_user.id)
+    await last_login_buffer.overlay([current_user])
     return current_user
 
 
 @router.post("/change-password")
-def change_password(
+async def change_password(
     password_data: ChangePasswordRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     Changer le mot de passe de l'utilisateur courant
     """
     # Vérifier l'ancien mot de passe
-    if not verify_password(password_data.current_password, current_user.hashed_password):
+    if not await verify_password_async(password_data.current_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Çµrrëñt þæššwørð ïš ïñçørrëçtẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
         )
     
     # Hash et mettre à jour le nouveau mot de passe
-    current_user.hashed_password = get_password_hash(password_data.new_password)
-    db.commit()
+    current_user.hashed_password = await get_password_hash_async(password_data.new_password)
+    await db.commit()
     
     return {"message": "Þæššwørð çhæñĝëð šµççëššfµ¡¡ýẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"}
@@ -0,0 +1,141 @@
+from fastapi import APIRouter, Depends
+from app.core.audit_stream import audit_stream
+from app.core.audit_writer import audit_writer
+from app.core.database import async_engine, replica_engine
+from app.core.db_routing import replica_router
+from app.core.deps import get_current_active_superuser
+from app.core.auth_cache import Principal, principal_cache
+from app.core.hashing import bcrypt_pool
+from app.core.last_login import last_login_buffer
+from app.core.query_stats import query_stats
+from app.core.rate_limit import login_throttle
+from app.core.sessions import session_registry
+from app.core.token_cache import token_cache
+
+router = APIRouter()
+
+
+@router.get("/auth-cache")
+@router.get("/auth-cache/")
+async def get_auth_cache_metrics(
+    current_user: Principal = Depends(get_current_active_superuser)
+):
+    """
+    Statistiques du cache des utilisateurs authentifiés (succès/échecs)
+    """
+    return principal_cache.stats()
+
+
+@router.get("/bcrypt")
+@router.get("/bcrypt/")
+async def get_bcrypt_metrics(
+    current_user: Principal = Depends(get_current_active_superuser)
+):
+    """
+    Statistiques du pool bcrypt (latence, attente en file, refus)
+    """
+    return bcrypt_pool.stats()
+
+
+@router.get("/login-throttle")
+@router.get("/login-throttle/")
+async def get_login_throttle_metrics(
+    current_user: Principal = Depends(get_current_active_superuser)
+):
+    """
+    Statistiques du limiteur de tentatives de connexion
+    """
+    return login_throttle.stats()
+
+
+@router.get("/token-cache")
+@router.get("/token-cache/")
+async def get_token_cache_metrics(
+    current_user: Principal = Depends(get_current_active_superuser)
+):
+    """
+    Statistiques du cache des tokens validés (succès, expirations, évictions)
+    """
+    return token_cache.stats()
+
+
+@router.get("/sessions")
+@router.get("/sessions/")
+async def get_session_metrics(
+    current_user: Principal = Depends(get_current_active_superuser)
+):
+    """
+    Statistiques de la liste de révocation (filtre de Bloom, confirmations Redis)
+    """
+    return session_registry.stats()
+
+
+@router.get("/last-login")
+@router.get("/last-login/")
+async def get_last_login_metrics(
+    current_user: Principal = Depends(get_current_active_superuser)
+):
+    """
+    Statistiques du tampon d'écriture différée de last_login
+    """
+    return last_login_buffer.stats()
+
+
+@router.get("/db-pool")
+@router.get("/db-pool/")
+async def get_db_pool_metrics(
+    current_user: Principal = Depends(get_current_active_superuser)
+):
+    """
+    Télémétrie du pool de connexions de l'API (emprunts, overflow, attente, timeouts)
+    """
+    pool = async_engine.sync_engine.pool
+    return pool.telemetry.snapshot(pool)
+
+
+@router.get("/replica")
+@router.get("/replica/")
+async def get_replica_metrics(
+    current_user: Principal = Depends(get_current_active_superuser)
+):
+    """
+    Routage des lectures : retard du réplica, lectures servies, replis vers le primaire
+    """
+    stats = replica_router.stats()
+    if replica_engine is not None:
+        pool = replica_engine.sync_engine.pool
+        stats["pool"] = pool.telemetry.snapshot(pool)
+    return stats
+
+
+@router.get("/queries")
+@router.get("/queries/")
+async def get_query_metrics(
+    current_user: Principal = Depends(get_current_active_superuser)
+):
+    """
+    Requêtes SQL par route : volume, maximum, temps base, dépassements de budget
+    """
+    return query_stats.stats()
+
+
+@router.get("/audit-writer")
+@router.get("/audit-writer/")
+async def get_audit_writer_metrics(
+    current_user: Principal = Depends(get_current_active_superuser)
+):
+    """
+    Écriture par lots des logs d'audit : file, lots, débordements, pertes
+    """
+    return audit_writer.stats()
+
+
+@router.get("/audit-stream")
+@router.get("/audit-stream/")
+async def get_audit_stream_metrics(
+    current_user: Principal = Depends(get_current_active_superuser)
+):
+    """
+    Flux en direct des logs d'audit : abonnés du worker, événements diffusés et perdus
+    """
+    return audit_stream.stats()
@@ -1,24 +1,36 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List
-from app.core.database import get_db
-from app.core.deps import get_current_active_user
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.core.database import get_read_db
+from app.core.deps import get_current_active_principal
+from app.core.auth_cache import Principal
+from app.core.query_stats import query_budget
+from app.core.pagination import Keyset
 from app.schemas.user import PermissionResponse
-from app.models.user import User, Permission
+from app.models.user import Permission
 
 router = APIRouter()
 
+PERMISSION_KEYSET = Keyset(Permission.created_at, Permission.id)
+
 
 @router.get("/", response_model=List[PermissionResponse])
 @router.get("", response_model=List[PermissionResponse])
-def list_permissions(
+@query_budget(4)
+async def list_permissions(
+    response: Response,
     skip: int = 0,
     limit: int = 200,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_active_principal)
 ):
     """
     Lister toutes les permissions disponibles
     """
-    permissions = db.query(Permission).offset(skip).limit(limit).all()
+    permissions = (await db.execute(
+        PERMISSION_KEYSET.paginate(select(Permission), limit, cursor, skip)
+    )).scalars().all()
+    PERMISSION_KEYSET.set_next_cursor(response, permissions, limit)
     return permissions
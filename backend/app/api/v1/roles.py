@@ -1,60 +1,94 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from uuid import UUID
-from app.core.database import get_db
-from app.core.deps import get_current_active_user, has_permission
+from app.core.database import get_db, get_read_db
+from app.core.deps import get_current_active_principal, has_permission
+from app.core.auth_cache import Principal, principal_cache, invalidate_role_members
+from app.core.authz import authz_versions
+from app.core.query_stats import query_budget
+from app.core.audit_routes import audited
+from app.core.pagination import Keyset
 from app.schemas.user import RoleResponse, RoleCreate, PermissionResponse
-from app.models.user import User, Role, Permission
+from app.models.audit import ActionType
+from app.models.user import Role, Permission, user_roles
+from app.services.loaders import ROLE_WITH_PERMISSIONS
 
 router = APIRouter()
 
+ROLE_KEYSET = Keyset(Role.created_at, Role.id)
+
+
+async def _get_role(db: AsyncSession, role_id: UUID, refresh: bool = False) -> Role:
+    """Récupérer un rôle et ses permissions, ou 404"""
+    query = select(Role).options(*ROLE_WITH_PERMISSIONS).where(Role.id == role_id)
+    if refresh:
+        query = query.execution_options(populate_existing=True)
+    role = (await db.execute(query)).scalars().first()
+    if not role:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Rø¡ë ñøt føµñðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
+        )
+    return role
+
+
+async def _get_permissions(db: AsyncSession, permission_ids: List[str]) -> List[Permission]:
+    """Charger les permissions demandées en un seul SELECT (ids inconnus ignorés)"""
+    if not permission_ids:
+        return []
+    ids = [UUID(perm_id) for perm_id in permission_ids]
+    return list((await db.execute(select(Permission).where(Permission.id.in_(ids)))).scalars().all())
+
 
 @router.get("/", response_model=List[RoleResponse])
 @router.get("", response_model=List[RoleResponse])
-def list_roles(
+@query_budget(5)
+async def list_roles(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_active_principal)
 ):
     """
     Lister tous les rôles
     """
-    roles = db.query(Role).offset(skip).limit(limit).all()
+    roles = (await db.execute(
+        ROLE_KEYSET.paginate(select(Role).options(*ROLE_WITH_PERMISSIONS), limit, cursor, skip)
+    )).scalars().all()
+    ROLE_KEYSET.set_next_cursor(response, roles, limit)
     return roles
 
 
 @router.get("/{role_id}", response_model=RoleResponse)
-def get_role(
+@query_budget(5)
+async def get_role(
     role_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("roles", "read"))
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(has_permission("roles", "read"))
 ):
     """
     Récupérer un rôle par ID
     """
-    role = db.query(Role).filter(Role.id == role_id).first()
-    if not role:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Rø¡ë ñøt føµñðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
-        )
-    return role
+    return await _get_role(db, role_id)
 
 
 @router.post("/", response_model=RoleResponse, status_code=status.HTTP_201_CREATED)
 @router.post("", response_model=RoleResponse, status_code=status.HTTP_201_CREATED)
-def create_role(
+@audited(ActionType.ROLE_CREATE, "role")
+async def create_role(
     role_in: RoleCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("roles", "create"))
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(has_permission("roles", "create"))
 ):
     """
     Créer un nouveau rôle
     """
     # Check if role already exists
-    existing = db.query(Role).filter(Role.name == role_in.name).first()
+    existing = await db.scalar(select(Role.id).where(Role.name == role_in.name))
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -68,92 +102,82 @@ def create_role(
     
     # Assign permissions if provided
     if hasattr(role_in, 'permission_ids') and role_in.permission_ids:
-        for perm_id in role_in.permission_ids:
-            permission = db.query(Permission).filter(Permission.id == UUID(perm_id)).first()
-            if permission:
-                role.permissions.append(permission)
+        role.permissions.extend(await _get_permissions(db, role_in.permission_ids))
     
     db.add(role)
-    db.commit()
-    db.refresh(role)
-    return role
+    await db.commit()
+    return await _get_role(db, role.id, refresh=True)
 
 
 @router.put("/{role_id}", response_model=RoleResponse)
 @router.put("/{role_id}/", response_model=RoleResponse)
-def update_role(
+@audited(ActionType.ROLE_UPDATE, "role", "role_id")
+async def update_role(
     role_id: UUID,
     role_in: RoleCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("roles", "update"))
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(has_permission("roles", "update"))
 ):
     """
     Mettre à jour un rôle
     """
-    role = db.query(Role).filter(Role.id == role_id).first()
-    if not role:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Rø¡ë ñøt føµñðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
-        )
+    role = await _get_role(db, role_id)
     
     role.name = role_in.name
     role.description = role_in.description
-    db.commit()
-    db.refresh(role)
+    await db.commit()
+    await invalidate_role_members(db, [role.id])
+    await authz_versions.bump_roles(role.id)
     return role
 
 
 @router.post("/{role_id}/permissions", response_model=RoleResponse)
 @router.post("/{role_id}/permissions/", response_model=RoleResponse)
-def assign_permissions_to_role(
+@audited(ActionType.PERMISSION_ASSIGN, "role", "role_id")
+async def assign_permissions_to_role(
     role_id: UUID,
     permissions_data: dict,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("roles", "update"))
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(has_permission("roles", "update"))
 ):
     """
     Assigner des permissions à un rôle
     """
-    role = db.query(Role).filter(Role.id == role_id).first()
-    if not role:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Rø¡ë ñøt føµñðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
-        )
-    
-    # Clear existing permissions
-    role.permissions = []
+    role = await _get_role(db, role_id)
     
-    # Assign new permissions
-    permission_ids = permissions_data.get('permission_ids', [])
-    for perm_id in permission_ids:
-        permission = db.query(Permission).filter(Permission.id == UUID(perm_id)).first()
-        if permission:
-            role.permissions.append(permission)
+    # Remplacer les permissions existantes
+    role.permissions = await _get_permissions(db, permissions_data.get('permission_ids', []))
     
-    db.commit()
-    db.refresh(role)
+    await db.commit()
+    await invalidate_role_members(db, [role.id])
+    await authz_versions.bump_roles(role.id)
     return role
 
 
 @router.delete("/{role_id}")
 @router.delete("/{role_id}/")
-def delete_role(
+@audited(ActionType.ROLE_DELETE, "role", "role_id")
+async def delete_role(
     role_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("roles", "delete"))
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(has_permission("roles", "delete"))
 ):
     """
     Supprimer un rôle
     """
-    role = db.query(Role).filter(Role.id == role_id).first()
+    role = await db.get(Role, role_id)
     if not role:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Rø¡ë ñøt føµñðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
         )
     
-    db.delete(role)
-    db.commit()
+    # Récupérer les membres avant la suppression en cascade de user_roles
+    member_ids = (await db.execute(
+        select(user_roles.c.user_id).where(user_roles.c.role_id == role_id)
+    )).scalars().all()
+    await db.delete(role)
+    await db.commit()
+    await principal_cache.invalidate(*member_ids)
+    await authz_versions.bump_roles(role_id)
     return {"message": "Rø¡ë ðë¡ëtëð šµççëššfµ¡¡ýẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"}
@@ -1,10 +1,12 @@
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core import deps
 from app.core.database import get_db
-from app.models.user import User
+from app.core.auth_cache import Principal
+from app.models.audit import ActionType
 from app.models.settings import SystemSettings
 from app.schemas.settings import (
     SystemSettingsResponse,
@@ -12,19 +14,21 @@ from app.schemas.settings import (
     SystemSettingsCreate
 )
 from app.core.config import settings as config_settings
+from app.core.system_settings import system_settings_cache
+from app.core.audit_routes import audited
 
 router = APIRouter()
 
 
 @router.get("/", response_model=SystemSettingsResponse)
-def get_settings(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_active_user),
+async def get_settings(
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(deps.get_current_active_principal),
 ) -> Any:
     """
     Récupérer les paramètres système.
     """
-    system_settings = db.query(SystemSettings).first()
+    system_settings = (await db.execute(select(SystemSettings).limit(1))).scalars().first()
     
     # Si aucun paramètre n'existe, créer les valeurs par défaut
     if not system_settings:
@@ -52,6 +56,7 @@ def get_settings(
             smtp_from_email=config_settings.FIRST_SUPERUSER,
             smtp_from_name="CRM System",
             enable_audit_log=True,
+            audit_retention_days=0,
             enable_email_notifications=True,
             enable_user_registration=False,
             enable_password_reset=True,
@@ -59,25 +64,27 @@ def get_settings(
             updated_by=current_user.id
         )
         db.add(default_settings)
-        db.commit()
-        db.refresh(default_settings)
+        await db.commit()
+        system_settings_cache.invalidate()
+        await db.refresh(default_settings)
         system_settings = default_settings
     
     return system_settings
 
 
 @router.put("/", response_model=SystemSettingsResponse)
-def update_settings(
+@audited(ActionType.SYSTEM_SETTINGS_UPDATE, "settings")
+async def update_settings(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     settings_in: SystemSettingsUpdate,
-    current_user: User = Depends(deps.get_current_active_superuser),
+    current_user: Principal = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
     Mettre à jour les paramètres système.
     Réservé aux Super Admins.
     """
-    system_settings = db.query(SystemSettings).first()
+    system_settings = (await db.execute(select(SystemSettings).limit(1))).scalars().first()
     
     if not system_settings:
         # Créer les paramètres si ils n'existent pas
@@ -92,21 +99,22 @@ def update_settings(
             setattr(system_settings, field, value)
         system_settings.updated_by = current_user.id
     
-    db.commit()
-    db.refresh(system_settings)
+    await db.commit()
+    system_settings_cache.invalidate()
+    await db.refresh(system_settings)
     return system_settings
 
 
 @router.post("/test-email")
-def test_email_config(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_active_superuser),
+async def test_email_config(
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
     Tester la configuration SMTP.
     Réservé aux Super Admins.
     """
-    system_settings = db.query(SystemSettings).first()
+    system_settings = (await db.execute(select(SystemSettings).limit(1))).scalars().first()
     
     if not system_settings:
         raise HTTPException(status_code=404, detail="Paramètres système non trouvés")
@@ -121,15 +129,16 @@ def test_email_config(
 
 
 @router.post("/reset", response_model=SystemSettingsResponse)
-def reset_settings(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_active_superuser),
+@audited(ActionType.SYSTEM_SETTINGS_UPDATE, "settings")
+async def reset_settings(
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
     Réinitialiser les paramètres aux valeurs par défaut.
     Réservé aux Super Admins.
     """
-    system_settings = db.query(SystemSettings).first()
+    system_settings = (await db.execute(select(SystemSettings).limit(1))).scalars().first()
     
     # Valeurs par défaut
     defaults = {
@@ -156,6 +165,7 @@ def reset_settings(
         "smtp_from_email": config_settings.FIRST_SUPERUSER,
         "smtp_from_name": "CRM System",
         "enable_audit_log": True,
+        "audit_retention_days": 0,
         "enable_email_notifications": True,
         "enable_user_registration": False,
         "enable_password_reset": True,
@@ -170,6 +180,7 @@ def reset_settings(
         for field, value in defaults.items():
             setattr(system_settings, field, value)
     
-    db.commit()
-    db.refresh(system_settings)
+    await db.commit()
+    system_settings_cache.invalidate()
+    await db.refresh(system_settings)
     return system_settings
@@ -1,47 +1,53 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime, timedelta, timezone
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import DateTime, func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, time, timedelta, timezone
+from app.core.database import get_read_db
 from app.core.deps import has_permission
+from app.core.auth_cache import Principal
+from app.core.query_stats import query_budget
 from app.models.user import User, Role
+from app.services.loaders import USER_WITH_ROLES
 
 router = APIRouter()
 
 
 @router.get("/")
 @router.get("")
-def get_dashboard_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("system", "read"))
+@query_budget(10)
+async def get_dashboard_stats(
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(has_permission("system", "read"))
 ):
     """
     Récupérer les statistiques du dashboard pour Super Admin
     """
     # Total users
-    total_users = db.query(User).count()
-    active_users = db.query(User).filter(User.is_active == True).count()
+    total_users = await db.scalar(select(func.count(User.id)))
+    active_users = await db.scalar(select(func.count(User.id)).where(User.is_active == True))
     inactive_users = total_users - active_users
     
     # Users created in last 30 days
     thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
-    new_users_last_month = db.query(User).filter(
-        User.created_at >= thirty_days_ago
-    ).count()
+    new_users_last_month = await db.scalar(
+        select(func.count(User.id)).where(User.created_at >= thirty_days_ago)
+    )
     
     # Total roles
-    total_roles = db.query(Role).count()
+    total_roles = await db.scalar(select(func.count(Role.id)))
     
     # Users by role
-    users_by_role = db.query(
-        Role.name,
-        func.count(User.id).label('count')
-    ).join(User.roles).group_by(Role.name).all()
+    users_by_role = (await db.execute(
+        select(Role.name, func.count(User.id).label('count'))
+        .join(User.roles).group_by(Role.name)
+    )).all()
     
     users_by_role_dict = dict(users_by_role)
     
     # Recent users (last 10)
-    recent_users = db.query(User).order_by(User.created_at.desc()).limit(10).all()
+    recent_users = (await db.execute(
+        select(User).options(*USER_WITH_ROLES).order_by(User.created_at.desc()).limit(10)
+    )).scalars().all()
     recent_users_data = [
         {
             "id": str(user.id),
@@ -69,30 +75,34 @@ def get_dashboard_stats(
 
 @router.get("/activity")
 @router.get("/activity/")
-def get_activity_stats(
-    days: int = 7,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("system", "read"))
+@query_budget(10)
+async def get_activity_stats(
+    days: int = Query(7, ge=1, le=365),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(has_permission("system", "read"))
 ):
     """
-    Récupérer les statistiques d'activité (nombre d'utilisateurs créés par jour)
+    Récupérer les statistiques d'activité (nombre d'utilisateurs créés par jour, UTC)
     """
-    start_date = datetime.now(timezone.utc) - timedelta(days=days)
+    # created_at est en UTC naïf (datetime.utcnow) : jours calendaires UTC, aujourd'hui inclus
+    first_day = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+    
+    # Une seule requête, groupée par jour ; les jours sans création valent 0
+    # 'day' en littéral : un paramètre lié différerait entre SELECT et GROUP BY
+    day = func.date_trunc(literal_column("'day'"), User.created_at, type_=DateTime)
+    result = await db.execute(
+        select(day, func.count(User.id))
+        .where(User.created_at >= datetime.combine(first_day, time.min))
+        .group_by(day)
+    )
+    counts = {created.date(): count for created, count in result.all()}
     
-    # Users created per day
     activity_data = []
     for i in range(days):
-        day_start = start_date + timedelta(days=i)
-        day_end = day_start + timedelta(days=1)
-        
-        count = db.query(User).filter(
-            User.created_at >= day_start,
-            User.created_at < day_end
-        ).count()
-        
+        date = first_day + timedelta(days=i)
         activity_data.append({
-            "date": day_start.strftime("%Y-%m-%d"),
-            "count": count
+            "date": date.strftime("%Y-%m-%d"),
+            "count": counts.get(date, 0)
         })
     
     return {
@@ -1,127 +1,171 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from uuid import UUID
-from app.core.database import get_db
-from app.core.deps import get_current_active_user, has_permission
-from app.schemas.user import UserResponse, UserUpdate, AssignRolesRequest
+from app.core.database import get_db, get_read_db
+from app.core.deps import has_permission
+from app.core.auth_cache import Principal, principal_cache
+from app.core.authz import authz_versions
+from app.core.last_login import last_login_buffer
+from app.core.sessions import session_registry
+from app.core.query_stats import query_budget
+from app.core.audit_routes import audited
+from app.core.pagination import Keyset
+from app.schemas.user import UserResponse, UserUpdate, AssignRolesRequest, SessionResponse, RevokeSessionsRequest
 from app.services.user_service import UserService
+from app.services.loaders import USER_WITH_ROLES_AND_PERMISSIONS
+from app.models.audit import ActionType
 from app.models.user import User, Role
 
 router = APIRouter()
 
+USER_KEYSET = Keyset(User.created_at, User.id)
+
 
 @router.get("/", response_model=List[UserResponse])
 @router.get("", response_model=List[UserResponse])
-def list_users(
+@query_budget(6)
+async def list_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("users", "read"))
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(has_permission("users", "read"))
 ):
     """
     Lister tous les utilisateurs (nécessite permission users.read)
     """
-    users = db.query(User).offset(skip).limit(limit).all()
+    users = (await db.execute(
+        USER_KEYSET.paginate(select(User).options(*USER_WITH_ROLES_AND_PERMISSIONS), limit, cursor, skip)
+    )).scalars().all()
+    USER_KEYSET.set_next_cursor(response, users, limit)
+    await last_login_buffer.overlay(users)
     return users
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(
+@query_budget(6)
+async def get_user(
     user_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("users", "read"))
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(has_permission("users", "read"))
 ):
     """
     Récupérer un utilisateur par ID (nécessite permission users.read)
     """
-    user = UserService.get_by_id(db, user_id)
+    user = await UserService.get_by_id(db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="µšër ñøt føµñðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
         )
+    await last_login_buffer.overlay([user])
     return user
 
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(
+@audited(ActionType.USER_UPDATE, "user", "user_id")
+async def update_user(
     user_id: UUID,
     user_in: UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("users", "update"))
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(has_permission("users", "update"))
 ):
     """
     Mettre à jour un utilisateur (nécessite permission users.update)
     """
-    user = UserService.update(db, user_id, user_in)
+    user = await UserService.update(db, user_id, user_in)
+    await last_login_buffer.overlay([user])
     return user
 
 
 @router.delete("/{user_id}", response_model=UserResponse)
 @router.delete("/{user_id}/", response_model=UserResponse)
-def deactivate_user(
+@audited(ActionType.USER_DEACTIVATE, "user", "user_id")
+async def deactivate_user(
     user_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("users", "delete"))
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(has_permission("users", "delete"))
 ):
     """
     Désactiver un utilisateur (nécessite permission users.delete)
     """
-    user = UserService.deactivate(db, user_id)
+    user = await UserService.deactivate(db, user_id)
+    await last_login_buffer.overlay([user])
     return user
 
 
 @router.post("/{user_id}/activate", response_model=UserResponse)
 @router.post("/{user_id}/activate/", response_model=UserResponse)
-def activate_user(
+@audited(ActionType.USER_ACTIVATE, "user", "user_id")
+async def activate_user(
     user_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("users", "update"))
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(has_permission("users", "update"))
 ):
     """
     Réactiver un utilisateur désactivé (nécessite permission users.update)
     """
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="µšër ñøt føµñðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
-        )
+    user = await UserService.get_or_404(db, user_id)
     
     user.is_active = True
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await principal_cache.invalidate(user.id)
+    await last_login_buffer.overlay([user])
     return user
 
 
 @router.post("/{user_id}/roles", response_model=UserResponse)
 @router.post("/{user_id}/roles/", response_model=UserResponse)
-def assign_roles(
+@audited(ActionType.ROLE_ASSIGN, "user", "user_id")
+async def assign_roles(
     user_id: UUID,
     roles_data: AssignRolesRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(has_permission("users", "update"))
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(has_permission("users", "update"))
 ):
     """
     Assigner des rôles à un utilisateur
     """
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="µšër ñøt føµñðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
-        )
-    
-    # Clear existing roles
-    user.roles = []
+    user = await UserService.get_or_404(db, user_id)
     
-    # Assign new roles
-    for role_id in roles_data.role_ids:
-        role = db.query(Role).filter(Role.id == UUID(role_id)).first()
-        if role:
-            user.roles.append(role)
+    # Remplacer les rôles existants (un seul SELECT pour les nouveaux rôles)
+    role_ids = [UUID(role_id) for role_id in roles_data.role_ids]
+    roles = (await db.execute(select(Role).where(Role.id.in_(role_ids)))).scalars().all() if role_ids else []
+    user.roles = list(roles)
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await principal_cache.invalidate(user.id)
+    await authz_versions.bump_users(user.id)
+    user = await UserService.get_by_id(db, user_id, refresh=True)
+    await last_login_buffer.overlay([user])
     return user
+
+
+@router.get("/{user_id}/sessions", response_model=List[SessionResponse])
+@router.get("/{user_id}/sessions/", response_model=List[SessionResponse])
+async def list_user_sessions(
+    user_id: UUID,
+    current_user: Principal = Depends(has_permission("users", "read"))
+):
+    """
+    Lister les sessions actives d'un utilisateur (nécessite permission users.read)
+    """
+    return await session_registry.list_sessions(user_id)
+
+
+@router.post("/{user_id}/sessions/revoke")
+@router.post("/{user_id}/sessions/revoke/")
+@audited(ActionType.USER_LOGOUT, "user", "user_id")
+async def revoke_user_sessions(
+    user_id: UUID,
+    revoke_data: RevokeSessionsRequest,
+    current_user: Principal = Depends(has_permission("users", "update"))
+):
+    """
+    Révoquer en masse les sessions d'un utilisateur (toutes si session_ids est absent)
+    """
+    revoked = await session_registry.revoke_user_sessions(user_id, revoke_data.session_ids)
+    return {"revoked": revoked}
@@ -0,0 +1,232 @@
+"""
+Audit des modifications à partir des événements de session SQLAlchemy.
+
+À chaque flush (`after_flush`), les objets User, Role, Permission et
+SystemSettings créés, modifiés ou supprimés donnent un événement d'audit :
+identifiant et nom de la cible, colonnes modifiées avec ancienne et nouvelle
+valeur (secrets masqués), rôles / permissions ajoutés ou retirés. Les
+événements s'accumulent dans `session.info` et sont déposés ensemble dans
+audit_writer au commit (`after_commit`), donc insérés dans le même lot ; un
+rollback les abandonne.
+
+Le principal vient de la requête en cours : AuditMiddleware pose son scope
+ASGI dans `audit_scope`, la dépendance d'authentification y a renseigné
+request.state. Une requête dont la transaction a produit des événements est
+marquée (`audit_captured`) : le middleware n'ajoute pas l'événement de route.
+"""
+import asyncio
+import enum
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Callable, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers
+
+from app.core.audit_writer import audit_writer
+from app.core.client_ip import client_ip_from_scope
+from app.models.audit import ActionType
+from app.models.settings import SystemSettings
+from app.models.user import Permission, Role, User
+
+ACTION_DESCRIPTIONS = {
+    ActionType.USER_CREATE: "Nouvel utilisateur créé",
+    ActionType.USER_UPDATE: "Utilisateur mis à jour",
+    ActionType.USER_DELETE: "Utilisateur supprimé",
+    ActionType.USER_ACTIVATE: "Utilisateur activé",
+    ActionType.USER_DEACTIVATE: "Utilisateur désactivé",
+    ActionType.USER_LOGIN: "Connexion utilisateur",
+    ActionType.USER_LOGOUT: "Déconnexion utilisateur",
+    ActionType.ROLE_CREATE: "Nouveau rôle créé",
+    ActionType.ROLE_UPDATE: "Rôle mis à jour",
+    ActionType.ROLE_DELETE: "Rôle supprimé",
+    ActionType.ROLE_ASSIGN: "Rôles assignés à l'utilisateur",
+    ActionType.ROLE_REVOKE: "Rôles retirés de l'utilisateur",
+    ActionType.PERMISSION_CREATE: "Nouvelle permission créée",
+    ActionType.PERMISSION_UPDATE: "Permission mise à jour",
+    ActionType.PERMISSION_DELETE: "Permission supprimée",
+    ActionType.PERMISSION_ASSIGN: "Permissions assignées au rôle",
+    ActionType.SYSTEM_SETTINGS_UPDATE: "Paramètres système mis à jour",
+    ActionType.SYSTEM_BACKUP: "Sauvegarde système",
+    ActionType.SYSTEM_MAINTENANCE: "Maintenance système",
+}
+
+REDACTED = "********"
+REDACTED_FIELDS = frozenset({"hashed_password", "smtp_password"})
+# Horodatages techniques : pas une modification en soi
+IGNORED_FIELDS = frozenset({"created_at", "updated_at"})
+SESSION_KEY = "audit_events"
+
+# Scope ASGI de la requête d'écriture en cours (posé par AuditMiddleware)
+audit_scope: ContextVar[Optional[dict]] = ContextVar("audit_scope", default=None)
+
+
+@dataclass(frozen=True)
+class TrackedModel:
+    target_type: str
+    create: ActionType
+    update: ActionType
+    delete: ActionType
+    name: Callable[[object], Optional[str]]
+    collections: Tuple[str, ...] = ()
+
+
+TRACKED = {
+    User: TrackedModel(
+        "user", ActionType.USER_CREATE, ActionType.USER_UPDATE, ActionType.USER_DELETE,
+        lambda user: user.email, ("roles",),
+    ),
+    Role: TrackedModel(
+        "role", ActionType.ROLE_CREATE, ActionType.ROLE_UPDATE, ActionType.ROLE_DELETE,
+        lambda role: role.name, ("permissions",),
+    ),
+    Permission: TrackedModel(
+        "permission", ActionType.PERMISSION_CREATE, ActionType.PERMISSION_UPDATE, ActionType.PERMISSION_DELETE,
+        lambda permission: permission.name,
+    ),
+    SystemSettings: TrackedModel(
+        "settings", ActionType.SYSTEM_SETTINGS_UPDATE, ActionType.SYSTEM_SETTINGS_UPDATE,
+        ActionType.SYSTEM_SETTINGS_UPDATE, lambda system_settings: system_settings.site_name,
+    ),
+}
+
+
+def _json(value):
+    # details est du JSONB
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _changes(obj, kind: str) -> dict:
+    """Colonnes modifiées {nom: {"old", "new"}} ; tout l'état pour une création ou une suppression"""
+    state = inspect(obj)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        key = attr.key
+        if key in IGNORED_FIELDS:
+            continue
+        if kind == "update":
+            history = state.attrs[key].history
+            if not history.added and not history.deleted:
+                continue
+            old = history.deleted[0] if history.deleted else None
+            new = history.added[0] if history.added else None
+            if old == new:
+                continue
+        else:
+            value = state.dict.get(key)
+            if value is None:
+                continue
+            old, new = (None, value) if kind == "create" else (value, None)
+        if key in REDACTED_FIELDS:
+            old, new = old and REDACTED, new and REDACTED
+        changes[key] = {"old": _json(old), "new": _json(new)}
+    return changes
+
+
+def _collection_changes(obj, names: Tuple[str, ...]) -> dict:
+    """Rôles / permissions ajoutés et retirés {collection: {"added", "removed"}}"""
+    state = inspect(obj)
+    changes = {}
+    for name in names:
+        history = state.attrs[name].history
+        if history.added or history.deleted:
+            changes[name] = {
+                "added": sorted(item.name for item in history.added),
+                "removed": sorted(item.name for item in history.deleted),
+            }
+    return changes
+
+
+def _update_action(tracked: TrackedModel, changes: dict, collections: dict) -> ActionType:
+    # Action plus précise que "mise à jour" quand un seul aspect a changé
+    if tracked.target_type == "user":
+        if not collections and set(changes) == {"is_active"}:
+            return ActionType.USER_ACTIVATE if changes["is_active"]["new"] else ActionType.USER_DEACTIVATE
+        if collections and not changes:
+            return ActionType.ROLE_ASSIGN if collections["roles"]["added"] else ActionType.ROLE_REVOKE
+    if tracked.target_type == "role" and collections and not changes:
+        return ActionType.PERMISSION_ASSIGN
+    return tracked.update
+
+
+def _request_fields() -> dict:
+    """Principal et client de la requête en cours (None hors requête)"""
+    scope = audit_scope.get()
+    if scope is None:
+        return dict.fromkeys(("user_id", "user_email", "user_name", "ip_address", "user_agent"))
+    state = scope.get("state", {})
+    headers = Headers(scope=scope)
+    return {
+        "user_id": state.get("user_id"),
+        "user_email": state.get("user_email"),
+        "user_name": state.get("user_name"),
+        "ip_address": client_ip_from_scope(scope),
+        "user_agent": headers.get("user-agent"),
+    }
+
+
+def _event(tracked: TrackedModel, kind: str, obj, now: datetime) -> Optional[dict]:
+    changes = _changes(obj, kind)
+    collections = _collection_changes(obj, tracked.collections) if kind != "delete" else {}
+    if kind == "update" and not changes and not collections:
+        return None
+    action = {"create": tracked.create, "delete": tracked.delete}.get(kind) or _update_action(tracked, changes, collections)
+    return {
+        "action": action,
+        "description": ACTION_DESCRIPTIONS.get(action, f"Action: {action.value}"),
+        "target_type": tracked.target_type,
+        # Clé d'identité pas encore posée pour un objet créé dans ce flush
+        "target_id": str(inspect(obj).mapper.primary_key_from_instance(obj)[0]),
+        "target_name": tracked.name(obj),
+        "details": {"changes": {**changes, **collections}},
+        "created_at": now,
+    }
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session: Session, flush_context) -> None:
+    # Encore l'état d'avant le flush : new / dirty / deleted et historique des attributs
+    now = datetime.now(timezone.utc)
+    for kind, objects in (("create", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            tracked = TRACKED.get(type(obj))
+            if tracked is None:
+                continue
+            try:
+                audit = _event(tracked, kind, obj, now)
+            except Exception as e:
+                print(f"Audit capture error: {e}")
+                continue
+            if audit is not None:
+                session.info.setdefault(SESSION_KEY, []).append(audit)
+
+
+@event.listens_for(Session, "after_commit")
+def _submit(session: Session) -> None:
+    events = session.info.pop(SESSION_KEY, None)
+    if not events:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # Session synchrone hors boucle (scripts) : pas d'audit_writer
+        return
+    request_fields = _request_fields()
+    audit_writer.submit_nowait([{**audit, **request_fields} for audit in events])
+    scope = audit_scope.get()
+    if scope is not None:
+        scope.setdefault("state", {})["audit_captured"] = True
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(SESSION_KEY, None)
@@ -0,0 +1,65 @@
+"""
+Table des routes auditées.
+
+Chaque endpoint d'écriture déclare son audit avec `@audited(action,
+target_type, target_param)`. Au démarrage, `audit_routes.build(app.routes)`
+compile ces déclarations en un dictionnaire indexé par (méthode, gabarit de
+route). Le middleware retrouve alors l'action en O(1) grâce à la route déjà
+résolue par Starlette (`request.scope["route"]`), sans analyser l'URL.
+L'identifiant de la cible est le paramètre de chemin `target_param`, UUID
+compris.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.models.audit import ActionType
+
+
+@dataclass(frozen=True)
+class AuditRoute:
+    """Métadonnées d'audit d'un endpoint"""
+    action: ActionType
+    target_type: Optional[str] = None
+    target_param: Optional[str] = None
+
+    def target_id(self, path_params: dict) -> Optional[str]:
+        value = path_params.get(self.target_param) if self.target_param else None
+        return str(value) if value is not None else None
+
+
+def audited(action: ActionType, target_type: Optional[str] = None, target_param: Optional[str] = None):
+    """Déclarer l'audit d'un endpoint (à placer sous les décorateurs @router)"""
+    def decorator(endpoint):
+        endpoint.audit = AuditRoute(action, target_type, target_param)
+        return endpoint
+    return decorator
+
+
+class AuditRouteTable:
+    """(méthode, gabarit de route) -> AuditRoute, compilé une fois au démarrage"""
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], AuditRoute] = {}
+
+    def build(self, routes: Iterable) -> None:
+        table = {}
+        for route in routes:
+            audit = getattr(getattr(route, "endpoint", None), "audit", None)
+            if audit is None:
+                continue
+            for method in getattr(route, "methods", None) or ():
+                table[(method, route.path)] = audit
+        self._routes = table
+
+    def lookup(self, scope: dict) -> Optional[AuditRoute]:
+        """Métadonnées de la route résolue pour cette requête (None si non auditée)"""
+        route = scope.get("route")
+        if route is None:
+            return None
+        return self._routes.get((scope["method"], route.path))
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+
+audit_routes = AuditRouteTable()
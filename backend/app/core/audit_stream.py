@@ -0,0 +1,195 @@
+"""
+Flux en direct des logs d'audit (Redis pub/sub, diffusion SSE).
+
+Après chaque lot inséré, audit_writer publie ses événements sur le canal
+Redis AUDIT_CHANNEL (un PUBLISH par lot). Dans chaque worker, une seule
+tâche est abonnée au canal, démarrée avec le premier client : elle distribue
+chaque événement aux abonnements locaux dont les filtres correspondent.
+Cinquante administrateurs connectés coûtent donc un abonnement Redis par
+worker, et aucune requête SQL.
+
+Contre-pression : chaque abonnement a sa propre file bornée
+(AUDIT_STREAM_QUEUE_SIZE). Un client trop lent perd les événements les plus
+anciens plutôt que de ralentir la diffusion ; le nombre perdu lui est
+signalé pour qu'il recharge la liste.
+
+Autorisation : vérifiée à la connexion par la route, puis revérifiée au plus
+toutes les AUDIT_STREAM_KEEPALIVE_SECONDS pendant le flux (session révoquée,
+utilisateur désactivé, permission retirée) ; un échec ferme le flux. La
+tâche d'abonnement s'arrête avec le départ du dernier client.
+"""
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Set
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.models.audit import ActionType
+
+AUDIT_CHANNEL = "audit:events"
+LISTEN_TIMEOUT = 1.0
+RECONNECT_SECONDS = 1.0
+
+
+class AuditSubscription:
+    """Abonnement d'un client : filtres et file bornée des événements à envoyer"""
+
+    def __init__(
+        self,
+        action: Optional[str] = None,
+        target_type: Optional[str] = None,
+        user_email: Optional[str] = None,
+        queue_size: int = 100,
+    ):
+        # Valeur ("user.update") ou nom du membre, comme la liste
+        self.action = ActionType[action].value if action in ActionType.__members__ else action
+        self.target_type = target_type
+        self.user_email = user_email.lower() if user_email else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def matches(self, event: dict) -> bool:
+        if self.action and event.get("action") != self.action:
+            return False
+        if self.target_type and event.get("target_type") != self.target_type:
+            return False
+        if self.user_email and self.user_email not in (event.get("user_email") or "").lower():
+            return False
+        return True
+
+    def push(self, event: dict) -> None:
+        """Ajouter sans attendre ; file pleine : l'événement le plus ancien est perdu"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    def take_dropped(self) -> int:
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+class AuditStream:
+    """Abonnement Redis unique du worker, diffusé aux clients connectés"""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscriptions: Set[AuditSubscription] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.revoked = 0
+
+    # --- Publication (audit_writer, après insertion) ---------------------------
+
+    async def publish(self, events: List[dict]) -> None:
+        """Publier un lot d'événements déjà sérialisés (dict JSON) ; n'échoue jamais"""
+        try:
+            await get_redis().publish(AUDIT_CHANNEL, json.dumps(events, default=str))
+            self.published += len(events)
+        except Exception as e:
+            self.errors += 1
+            print(f"Audit stream publish error: {e}")
+
+    # --- Abonnements (routes SSE) ----------------------------------------------
+
+    def subscribe(self, **filters) -> AuditSubscription:
+        subscription = AuditSubscription(queue_size=self.queue_size, **filters)
+        self._subscriptions.add(subscription)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+        return subscription
+
+    def unsubscribe(self, subscription: AuditSubscription) -> None:
+        self._subscriptions.discard(subscription)
+        if not self._subscriptions and self._task is not None:
+            # Plus aucun client : libérer l'abonnement Redis du worker
+            self._task.cancel()
+            self._task = None
+
+    async def sse(self, authorize: Optional[Callable[[], Awaitable[bool]]] = None, **filters) -> AsyncIterator[str]:
+        """Flux Server-Sent Events d'un client : abonné le temps de la connexion"""
+        interval = settings.AUDIT_STREAM_KEEPALIVE_SECONDS
+        subscription = self.subscribe(**filters)
+        checked_at = time.monotonic()
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=interval)
+                except asyncio.TimeoutError:
+                    event = None
+                if authorize is not None and time.monotonic() - checked_at >= interval:
+                    if not await authorize():
+                        self.revoked += 1
+                        yield "event: revoked\ndata: {}\n\n"
+                        return
+                    checked_at = time.monotonic()
+                if event is None:
+                    # Commentaire SSE : garde la connexion ouverte derrière les proxys
+                    yield ": keepalive\n\n"
+                    continue
+                dropped = subscription.take_dropped()
+                if dropped:
+                    yield f"event: dropped\ndata: {json.dumps({'count': dropped})}\n\n"
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    def _dispatch(self, data) -> None:
+        events = json.loads(data)
+        self.received += len(events)
+        for subscription in list(self._subscriptions):
+            for event in events:
+                if subscription.matches(event):
+                    if subscription.queue.full():
+                        self.dropped += 1
+                    subscription.push(event)
+                    self.delivered += 1
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(AUDIT_CHANNEL)
+                while True:
+                    # Attente bornée : listen() lèverait REDIS_SOCKET_TIMEOUT sur un canal calme
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=LISTEN_TIMEOUT)
+                    if message is not None:
+                        self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                print(f"Audit stream subscription error: {e}")
+                await asyncio.sleep(RECONNECT_SECONDS)
+            finally:
+                await pubsub.aclose()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "subscribed": self._task is not None and not self._task.done(),
+            "subscribers": len(self._subscriptions),
+            "published": self.published,
+            "received": self.received,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "revoked": self.revoked,
+        }
+
+
+audit_stream = AuditStream(settings.AUDIT_STREAM_QUEUE_SIZE)
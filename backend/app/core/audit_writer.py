@@ -0,0 +1,393 @@
+"""
+Écriture asynchrone et par lots des logs d'audit.
+
+Le middleware ne touche plus la base : `submit_nowait` dépose l'événement
+dans une file asyncio bornée (AUDIT_WRITER_QUEUE_SIZE) sans jamais suspendre
+la requête. Une tâche de
+fond insère les événements par lots (AUDIT_WRITER_BATCH_SIZE lignes, ou toutes
+les AUDIT_WRITER_FLUSH_SECONDS) en un seul INSERT multi-lignes.
+
+File pleine, selon AUDIT_WRITER_OVERFLOW :
+- `block` : `submit` attend une place (aucune perte) ; avec `submit_nowait`,
+  l'attente est confiée à une tâche, pas à la requête ;
+- `spill` : l'événement est ajouté à un fichier JSONL local
+  (AUDIT_SPILL_DIR), réinjecté quand la file se vide ;
+- `drop`  : l'événement est abandonné et compté.
+
+Les événements d'une même transaction (app/core/audit_capture.py) sont
+déposés ensemble et insérés dans le même lot.
+
+Chaque lot inséré est publié sur Redis pour le flux en direct
+(app/core/audit_stream.py).
+
+Le même INSERT met à jour, dans la même transaction, les compteurs horaires
+de audit_rollups (statistiques sans relire les logs).
+
+Un lot dont l'insertion échoue est toujours déversé sur disque, puis rejoué.
+Au rejeu, un lot refusé par la base (et non une base injoignable) est repris
+ligne par ligne : les lignes encore refusées sont mises en quarantaine
+(`*.quarantine`, même format JSONL) au lieu de bloquer les autres. Les
+chaînes sont tronquées à la longueur de leur colonne avant insertion.
+À l'arrêt, la file est vidée avant la fermeture du moteur.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional, Set, Union
+
+from sqlalchemy import String, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from app.core.audit_stream import audit_stream
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import Histogram
+from app.models.audit import AuditLog, AuditRollup, ActionType
+
+OVERFLOW_POLICIES = ("block", "spill", "drop")
+SPILL_SUFFIX = ".jsonl"
+QUARANTINE_SUFFIX = ".quarantine"
+_STOP = object()
+
+# Longueur des colonnes VARCHAR : une valeur trop longue ferait échouer tout le lot
+STRING_LIMITS = {
+    column.name: column.type.length
+    for column in AuditLog.__table__.columns
+    if isinstance(column.type, String) and column.type.length
+}
+
+
+def _to_json(event: dict) -> str:
+    return json.dumps({
+        **event,
+        "action": event["action"].value,
+        "created_at": event["created_at"].isoformat(),
+    }, default=str)
+
+
+def _events(item: Union[dict, List[dict]]) -> List[dict]:
+    # Élément de la file : un événement, ou la liste de ceux d'une transaction
+    return list(item) if isinstance(item, list) else [item]
+
+
+def _from_json(line: str) -> dict:
+    event = json.loads(line)
+    event["action"] = ActionType(event["action"])
+    event["created_at"] = datetime.fromisoformat(event["created_at"])
+    return event
+
+
+def _row(event: dict) -> dict:
+    row = dict(event)
+    row.setdefault("id", uuid.uuid4())
+    for name, length in STRING_LIMITS.items():
+        value = row.get(name)
+        if isinstance(value, str) and len(value) > length:
+            row[name] = value[:length]
+    if row.get("user_id") is not None and not isinstance(row["user_id"], uuid.UUID):
+        row["user_id"] = uuid.UUID(str(row["user_id"]))
+    return row
+
+
+def _rollup_rows(events: List[dict]) -> List[dict]:
+    """Agréger un lot par (heure, action, utilisateur, type de cible)"""
+    counts = Counter(
+        (
+            event["created_at"].astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0),
+            event["action"],
+            event.get("user_email") or "",
+            event.get("target_type") or "",
+        )
+        for event in events
+    )
+    # Ordre stable des clés : deux workers ne se verrouillent pas mutuellement
+    return [
+        {"bucket": bucket, "action": action, "user_email": email, "target_type": target_type, "count": count}
+        for (bucket, action, email, target_type), count in sorted(counts.items())
+    ]
+
+
+def _unavailable(error: Exception) -> bool:
+    """Base injoignable (à rejouer plus tard), par opposition à une ligne refusée"""
+    return isinstance(error, (OperationalError, InterfaceError, OSError))
+
+
+def _published(row: dict) -> dict:
+    # Forme de AuditLogResponse, en JSON
+    return {**row, "action": row["action"].value, "created_at": row["created_at"].isoformat()}
+
+
+async def _insert(rows: List[dict]) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(AuditLog), rows)
+        upsert = pg_insert(AuditRollup).values(_rollup_rows(rows))
+        await db.execute(upsert.on_conflict_do_update(
+            index_elements=[AuditRollup.bucket, AuditRollup.action, AuditRollup.user_email, AuditRollup.target_type],
+            set_={"count": AuditRollup.count + upsert.excluded["count"]},
+        ))
+        await db.commit()
+
+
+class AuditWriter:
+    """File bornée d'événements d'audit, vidée en base par une tâche de fond"""
+
+    def __init__(
+        self,
+        queue_size: int,
+        batch_size: int,
+        flush_interval: float,
+        overflow: str,
+        spill_dir: str,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"AUDIT_WRITER_OVERFLOW must be one of {OVERFLOW_POLICIES}")
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.spill_dir = spill_dir
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._pending: Set[asyncio.Task] = set()
+        self._spill_path = os.path.join(spill_dir, f"audit-{os.getpid()}{SPILL_SUFFIX}")
+        self._quarantine_path = os.path.join(spill_dir, f"audit-{os.getpid()}{QUARANTINE_SUFFIX}")
+        self.flush_latency = Histogram()
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.blocked = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.quarantined = 0
+        self.dropped = 0
+        self.direct_writes = 0
+        self.errors = 0
+
+    # --- Dépôt (chemin de la requête) ----------------------------------------
+
+    async def submit(self, item: Union[dict, List[dict]]) -> None:
+        """Déposer un événement (colonnes d'AuditLog), ou ceux d'une transaction, sans attendre la base"""
+        self.submitted += len(_events(item))
+        if self._queue is None:
+            # Hors application (scripts) : pas de tâche de fond, écriture directe
+            self.direct_writes += 1
+            await self._write(_events(item))
+            return
+        try:
+            self._queue.put_nowait(item)
+            return
+        except asyncio.QueueFull:
+            pass
+        if self.overflow == "block":
+            self.blocked += 1
+            await self._queue.put(item)
+        else:
+            self._overflow(item)
+
+    def submit_nowait(self, item: Union[dict, List[dict]]) -> None:
+        """Déposer sans jamais suspendre l'appelant (middleware ASGI, événements de session)"""
+        if self._queue is not None and not (self.overflow == "block" and self._queue.full()):
+            self.submitted += len(_events(item))
+            try:
+                self._queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self._overflow(item)
+            return
+        # Attente d'une place (block) ou écriture directe : confiée à une tâche
+        task = asyncio.create_task(self.submit(item))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def _overflow(self, item: Union[dict, List[dict]]) -> None:
+        if self.overflow == "spill":
+            self._spill(_events(item))
+        else:
+            self.dropped += len(_events(item))
+
+    # --- Disque de débordement -----------------------------------------------
+
+    def _spill(self, events: List[dict]) -> None:
+        if not events:
+            return
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(self._spill_path, "a", encoding="utf-8") as spill:
+                spill.write("".join(_to_json(event) + "\n" for event in events))
+            self.spilled += len(events)
+        except Exception as e:
+            self.errors += 1
+            self.dropped += len(events)
+            print(f"Audit spill error: {e}")
+
+    def _quarantine(self, event: dict, error: Exception) -> None:
+        """Écarter une ligne refusée par la base (à examiner, renommable en .jsonl pour rejeu)"""
+        print(f"Audit event quarantined: {error}")
+        try:
+            with open(self._quarantine_path, "a", encoding="utf-8") as quarantine:
+                quarantine.write(_to_json(event) + "\n")
+            self.quarantined += 1
+        except Exception as e:
+            self.errors += 1
+            self.dropped += 1
+            print(f"Audit quarantine error: {e}")
+
+    def _claim_spill_files(self) -> List[str]:
+        """Renommer (atomiquement) les fichiers à rejouer : un seul worker les prend"""
+        claimed = []
+        try:
+            names = sorted(os.listdir(self.spill_dir))
+        except FileNotFoundError:
+            return claimed
+        for name in names:
+            if not name.endswith(SPILL_SUFFIX):
+                continue
+            path = os.path.join(self.spill_dir, name)
+            replay_path = f"{path}.{os.getpid()}.replay"
+            try:
+                os.rename(path, replay_path)
+            except FileNotFoundError:
+                continue
+            claimed.append(replay_path)
+        return claimed
+
+    async def _replay_spill(self) -> None:
+        for path in self._claim_spill_files():
+            with open(path, encoding="utf-8") as spill:
+                events = [_from_json(line) for line in spill if line.strip()]
+            os.remove(path)
+            for start in range(0, len(events), self.batch_size):
+                if not await self._replay_batch(events[start:start + self.batch_size]):
+                    # Base injoignable : le reste attend le prochain rejeu
+                    self._spill(events[start + self.batch_size:])
+                    break
+            self.replayed += len(events)
+
+    async def _replay_batch(self, events: List[dict]) -> bool:
+        """Rejouer un lot ; refusé par la base, ligne par ligne. False si la base est injoignable"""
+        try:
+            await self._flush(events)
+            return True
+        except Exception as e:
+            self.errors += 1
+            print(f"Audit spill replay error: {e}")
+            if _unavailable(e):
+                self._spill(events)
+                return False
+        for index, event in enumerate(events):
+            try:
+                await self._flush([event])
+            except Exception as e:
+                if _unavailable(e):
+                    self._spill(events[index:])
+                    return False
+                self._quarantine(event, e)
+        return True
+
+    # --- Vidage ---------------------------------------------------------------
+
+    async def _write(self, events: List[dict]) -> None:
+        """Insérer un lot ; en cas d'échec, le déverser sur disque (rejoué plus tard)"""
+        try:
+            await self._flush(events)
+        except Exception as e:
+            self.errors += 1
+            print(f"Audit flush error: {e}")
+            self._spill(events)
+
+    async def _flush(self, events: List[dict]) -> None:
+        """Insérer un lot et le publier ; lève l'erreur d'insertion"""
+        started = time.perf_counter()
+        rows = [_row(event) for event in events]
+        await _insert(rows)
+        self.flush_latency.observe(time.perf_counter() - started)
+        self.batches += 1
+        self.written += len(events)
+        if settings.AUDIT_STREAM_ENABLED:
+            # Lot validé : diffusion en direct (un PUBLISH par lot)
+            await audit_stream.publish([_published(row) for row in rows])
+
+    def _take(self, queue: asyncio.Queue, batch: List[dict]) -> List[dict]:
+        while len(batch) < self.batch_size:
+            try:
+                event = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if event is _STOP:
+                self._stopping = True
+                break
+            batch.extend(_events(event))
+        return batch
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                first = await asyncio.wait_for(self._queue.get(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                # File vide : moment de rejouer ce qui a débordé
+                try:
+                    await self._replay_spill()
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Audit spill replay error: {e}")
+                continue
+            if first is _STOP:
+                return
+            # Laisser le lot se remplir jusqu'à flush_interval, sauf s'il est déjà plein
+            if self._queue.qsize() + 1 < self.batch_size:
+                await asyncio.sleep(self.flush_interval)
+            await self._write(self._take(self._queue, _events(first)))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arrêter la tâche de fond (sans interrompre un lot) et vider la file"""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        # Les dépôts suivants passent en écriture directe
+        queue, self._queue = self._queue, None
+        while not queue.empty():
+            batch = self._take(queue, [])
+            if batch:
+                await self._write(batch)
+
+    def stats(self) -> dict:
+        return {
+            "overflow": self.overflow,
+            "queue_size": self.queue_size,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "submitted": self.submitted,
+            "written": self.written,
+            "batches": self.batches,
+            "blocked": self.blocked,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "quarantined": self.quarantined,
+            "dropped": self.dropped,
+            "direct_writes": self.direct_writes,
+            "errors": self.errors,
+            "flush_seconds": self.flush_latency.snapshot(),
+        }
+
+
+audit_writer = AuditWriter(
+    queue_size=settings.AUDIT_WRITER_QUEUE_SIZE,
+    batch_size=settings.AUDIT_WRITER_BATCH_SIZE,
+    flush_interval=settings.AUDIT_WRITER_FLUSH_SECONDS,
+    overflow=settings.AUDIT_WRITER_OVERFLOW,
+    spill_dir=settings.AUDIT_SPILL_DIR,
+)
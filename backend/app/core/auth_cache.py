@@ -0,0 +1,214 @@
+"""
+Cache à deux niveaux des utilisateurs authentifiés.
+
+Niveau 1 : LRU en mémoire (par worker) avec TTL court.
+Niveau 2 : Redis, partagé entre les workers.
+
+On ne met en cache qu'un "principal" compact (id, email, nom, statut, rôles).
+Les permissions effectives sont résolues à partir des rôles via le catalogue
+RBAC compilé (voir app.core.rbac), si bien qu'une modification des
+permissions d'un rôle ne laisse jamais de masque périmé dans le cache.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.rbac import CompiledCatalog, FULL_MASK
+from app.core.redis import get_redis
+from app.models.user import user_roles
+
+KEY_PREFIX = "auth:principal:"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Utilisateur authentifié, sans dépendance à la session SQLAlchemy"""
+    id: UUID
+    email: str
+    full_name: str
+    is_active: bool
+    role_ids: Tuple[UUID, ...] = ()
+    # Masque déjà compilé (tokens sans état), sinon résolu depuis les rôles
+    permission_mask: Optional[int] = None
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            is_active=user.is_active,
+            role_ids=tuple(role.id for role in user.roles),
+        )
+
+    def permissions(self, catalog: CompiledCatalog) -> int:
+        """Ensemble effectif des permissions (masque de bits)"""
+        if self.permission_mask is not None:
+            return self.permission_mask
+        return catalog.mask_for_roles(self.role_ids)
+
+    def is_superadmin(self, catalog: CompiledCatalog) -> bool:
+        return self.permissions(catalog) == FULL_MASK
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "id": str(self.id),
+            "email": self.email,
+            "full_name": self.full_name,
+            "is_active": self.is_active,
+            "role_ids": [str(role_id) for role_id in self.role_ids],
+        })
+
+    @classmethod
+    def from_json(cls, raw) -> "Principal":
+        data = json.loads(raw)
+        return cls(
+            id=UUID(data["id"]),
+            email=data["email"],
+            full_name=data["full_name"],
+            is_active=data["is_active"],
+            role_ids=tuple(UUID(role_id) for role_id in data["role_ids"]),
+        )
+
+
+class PrincipalCache:
+    """LRU local avec TTL adossé à Redis"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        local_ttl: int,
+        redis_ttl: int,
+        enabled: bool = True,
+    ):
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Tuple[float, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.redis_errors = 0
+
+    # --- Niveau 1 ---------------------------------------------------------
+
+    def _get_local(self, key: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return principal
+
+    def _set_local(self, key: str, principal: Principal) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.local_ttl, principal)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # --- API --------------------------------------------------------------
+
+    async def get(self, user_id: str) -> Optional[Principal]:
+        """Chercher un principal dans le LRU local puis dans Redis"""
+        if not self.enabled:
+            return None
+
+        principal = self._get_local(user_id)
+        if principal is not None:
+            self.local_hits += 1
+            return principal
+
+        try:
+            raw = await get_redis().get(KEY_PREFIX + user_id)
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"Auth cache Redis error: {e}")
+            raw = None
+
+        if raw is None:
+            self.misses += 1
+            return None
+
+        principal = Principal.from_json(raw)
+        self.redis_hits += 1
+        self._set_local(user_id, principal)
+        return principal
+
+    async def set(self, principal: Principal) -> None:
+        """Enregistrer un principal dans les deux niveaux"""
+        if not self.enabled:
+            return
+        key = str(principal.id)
+        self._set_local(key, principal)
+        try:
+            await get_redis().set(KEY_PREFIX + key, principal.to_json(), ex=self.redis_ttl)
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"Auth cache Redis error: {e}")
+
+    async def invalidate(self, *user_ids) -> None:
+        """Invalider explicitement des principaux (après commit)"""
+        keys = [str(user_id) for user_id in user_ids]
+        if not keys:
+            return
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        self.invalidations += len(keys)
+        try:
+            await get_redis().delete(*(KEY_PREFIX + key for key in keys))
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"Auth cache Redis error: {e}")
+
+    def clear_local(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.local_hits + self.redis_hits) / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "redis_errors": self.redis_errors,
+        }
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    local_ttl=settings.AUTH_CACHE_LOCAL_TTL_SECONDS,
+    redis_ttl=settings.AUTH_CACHE_REDIS_TTL_SECONDS,
+    enabled=settings.AUTH_CACHE_ENABLED,
+)
+
+
+async def invalidate_role_members(db, role_ids: Iterable[UUID]) -> None:
+    """Invalider les principaux de tous les utilisateurs portant ces rôles"""
+    role_ids = list(role_ids)
+    if not role_ids:
+        return
+    user_ids = (await db.execute(
+        select(user_roles.c.user_id).where(user_roles.c.role_id.in_(role_ids)).distinct()
+    )).scalars().all()
+    await principal_cache.invalidate(*user_ids)
@@ -0,0 +1,138 @@
+"""
+Autorisation sans état (opt-in via STATELESS_AUTH_ENABLED).
+
+Le token d'accès embarque le masque de permissions compilé, les rôles et des
+versions d'autorisation. Une requête est autorisée à partir des claims seules :
+Redis n'est consulté que pour comparer les versions (un seul MGET).
+
+Incrémenter la version d'un utilisateur (désactivation, réassignation de
+rôles) ou d'un rôle (modification de ses permissions) rend les tokens déjà
+émis périmés et force leur ré-émission via POST /auth/refresh.
+"""
+from typing import Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.auth_cache import Principal
+from app.core.config import settings
+from app.core.rbac import CompiledCatalog, FULL_MASK, rbac_engine
+from app.core.redis import get_redis
+from app.core.security import create_access_token
+
+USER_VERSION_KEY = "authz:version:user:"
+ROLE_VERSION_KEY = "authz:version:role:"
+
+
+class StaleAuthorization(Exception):
+    """Les versions d'autorisation du token ne sont plus à jour"""
+
+
+def encode_mask(mask: int) -> str:
+    return "*" if mask == FULL_MASK else format(mask, "x")
+
+
+def decode_mask(raw: str) -> int:
+    return FULL_MASK if raw == "*" else int(raw, 16)
+
+
+class AuthzVersions:
+    """Compteurs de version d'autorisation stockés dans Redis"""
+
+    @staticmethod
+    def _keys(user_id, role_ids: Iterable) -> List[str]:
+        return [USER_VERSION_KEY + str(user_id)] + [ROLE_VERSION_KEY + str(r) for r in role_ids]
+
+    @staticmethod
+    def _parse(values) -> List[int]:
+        return [int(value) if value is not None else 0 for value in values]
+
+    async def _bump(self, keys: List[str]) -> None:
+        if not keys:
+            return
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for key in keys:
+                pipe.incr(key)
+            await pipe.execute()
+        except Exception as e:
+            print(f"Authz version bump error: {e}")
+
+    async def bump_users(self, *user_ids) -> None:
+        await self._bump([USER_VERSION_KEY + str(user_id) for user_id in user_ids])
+
+    async def bump_roles(self, *role_ids) -> None:
+        await self._bump([ROLE_VERSION_KEY + str(role_id) for role_id in role_ids])
+
+    async def snapshot(self, user_id, role_ids) -> List[int]:
+        """Versions courantes [utilisateur, rôle1, rôle2, ...]"""
+        return self._parse(await get_redis().mget(self._keys(user_id, role_ids)))
+
+
+authz_versions = AuthzVersions()
+
+
+async def issue_access_token(db: AsyncSession, user, session_id: Optional[str] = None) -> str:
+    """
+    Émettre un token d'accès : classique (sub seul) ou, en mode sans état,
+    avec permissions et versions d'autorisation embarquées.
+    Le `sid` rattache le token à sa session serveur (révocable).
+    """
+    base = {"sub": str(user.id)}
+    if session_id:
+        base["sid"] = session_id
+
+    if not settings.STATELESS_AUTH_ENABLED:
+        return create_access_token(data=base)
+
+    catalog = await rbac_engine.get(db)
+    role_ids = [role.id for role in user.roles]
+    try:
+        versions = await authz_versions.snapshot(user.id, role_ids)
+    except Exception as e:
+        # Sans Redis, on ne peut pas estampiller le token : format classique
+        print(f"Authz version snapshot error: {e}")
+        return create_access_token(data=base)
+
+    return create_access_token(data={
+        **base,
+        "email": user.email,
+        "name": user.full_name,
+        "roles": [str(role_id) for role_id in role_ids],
+        "perms": encode_mask(catalog.mask_for_roles(role_ids)),
+        "cat": catalog.fingerprint,
+        "authz_version": versions[0],
+        "role_versions": versions[1:],
+    })
+
+
+async def principal_from_claims(claims: dict, catalog: CompiledCatalog) -> Optional[Principal]:
+    """
+    Construire le principal à partir des claims d'un token sans état.
+    Retourne None si le token est au format classique ou si Redis est
+    indisponible (l'appelant retombe alors sur le chemin cache/base).
+    """
+    if "perms" not in claims:
+        return None
+
+    if claims.get("cat") != catalog.fingerprint:
+        raise StaleAuthorization()
+
+    role_ids = [UUID(role_id) for role_id in claims["roles"]]
+    try:
+        current = await authz_versions.snapshot(claims["sub"], role_ids)
+    except Exception as e:
+        print(f"Authz version check error: {e}")
+        return None
+
+    if current != [claims["authz_version"], *claims["role_versions"]]:
+        raise StaleAuthorization()
+
+    return Principal(
+        id=UUID(claims["sub"]),
+        email=claims["email"],
+        full_name=claims["name"],
+        is_active=True,  # une désactivation incrémente la version utilisateur
+        role_ids=tuple(role_ids),
+        permission_mask=decode_mask(claims["perms"]),
+    )
@@ -0,0 +1,38 @@
+"""
+IP cliente derrière les proxys de confiance.
+
+Chaque proxy ajoute à X-Forwarded-For l'adresse dont il reçoit la requête :
+seules les TRUSTED_PROXY_HOPS dernières entrées sont fiables, celles placées
+avant peuvent être envoyées par le client lui-même. L'IP retenue est donc
+l'entrée ajoutée par le premier proxy de confiance (N-ième en partant de la
+fin) ; sans proxy (0) ou sans en-tête, l'adresse de la connexion.
+"""
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.types import Scope
+
+from app.core.config import settings
+
+
+def client_ip_from_scope(scope: Scope, trusted_hops: Optional[int] = None) -> Optional[str]:
+    """IP cliente d'un scope ASGI"""
+    hops = settings.TRUSTED_PROXY_HOPS if trusted_hops is None else trusted_hops
+    client = scope.get("client")
+    client_host = client[0] if client else None
+    if hops <= 0:
+        return client_host
+    forwarded_for = Headers(scope=scope).get("x-forwarded-for")
+    if not forwarded_for:
+        return client_host
+    hops_seen = [entry.strip() for entry in forwarded_for.split(",") if entry.strip()]
+    if not hops_seen:
+        return client_host
+    # Moins d'entrées que de proxys : toutes ont été ajoutées par un proxy de confiance
+    return hops_seen[-min(hops, len(hops_seen))]
+
+
+def get_client_ip(request: Request) -> Optional[str]:
+    """IP cliente d'une requête"""
+    return client_ip_from_scope(request.scope)
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 import os
+import tempfile
 import json
 
 
@@ -14,14 +15,82 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    # Pool de connexions de l'API (par worker)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_PRE_PING_IDLE_SECONDS: float = 30.0  # 0 = pas de ping
+    # Réplica en lecture seule (optionnel) pour les routes GET
+    READ_REPLICA_URL: Optional[str] = None
+    READ_YOUR_WRITES_SECONDS: int = 5
+    REPLICA_MAX_LAG_SECONDS: float = 10.0
+    REPLICA_LAG_CHECK_SECONDS: float = 5.0
+    # Instrumentation SQL par requête (Server-Timing, requêtes lentes, N+1)
+    SQL_INSTRUMENTATION_ENABLED: bool = True
+    SLOW_REQUEST_MS: float = 500.0
+    SLOW_REQUEST_QUERIES: int = 50
+    N_PLUS_ONE_THRESHOLD: int = 10
+    QUERY_BUDGET_DEFAULT: int = 0  # 0 = pas de budget hors @query_budget
+    QUERY_BUDGET_STRICT: bool = False  # à activer en test : dépassement = erreur
+    
+    # Proxys devant l'API (X-Forwarded-For) : 0 = connexion directe, 1 = un load balancer
+    TRUSTED_PROXY_HOPS: int = 1
     
     # Redis
     REDIS_URL: str
+    REDIS_SOCKET_TIMEOUT: float = 0.5  # secondes
+    
+    # Cache des utilisateurs authentifiés (LRU local + Redis)
+    AUTH_CACHE_ENABLED: bool = True
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_CACHE_LOCAL_TTL_SECONDS: int = 5  # borne la latence d'invalidation entre workers
+    AUTH_CACHE_REDIS_TTL_SECONDS: int = 300
     
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Sessions serveur : refresh tokens rotatifs et liste de révocation
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    SESSION_REVOCATION_SYNC_SECONDS: float = 1.0
+    SESSION_BLOOM_BITS: int = 1 << 20
+    SESSION_BLOOM_HASHES: int = 7
+    # Mode d'autorisation sans état : permissions et versions dans le JWT
+    STATELESS_AUTH_ENABLED: bool = False
+    # Relecture de la génération du catalogue RBAC (Redis) : délai max de propagation entre workers
+    RBAC_CATALOG_CHECK_SECONDS: float = 2.0
+    # Cache des tokens validés (interrupteur d'arrêt : TOKEN_CACHE_ENABLED=false)
+    TOKEN_CACHE_ENABLED: bool = True
+    TOKEN_CACHE_MAX_ENTRIES: int = 20000
+    
+    # Pool de processus bcrypt (0 = hachage dans le threadpool)
+    BCRYPT_POOL_SIZE: int = 2
+    BCRYPT_POOL_MAX_QUEUE: int = 64
+    BCRYPT_POOL_RETRY_AFTER_SECONDS: int = 2
+    
+    # Limitation des tentatives de connexion (seuils dans SystemSettings)
+    LOGIN_THROTTLE_ENABLED: bool = True
+    LOGIN_THROTTLE_IP_MULTIPLIER: int = 5
+    SYSTEM_SETTINGS_CACHE_TTL_SECONDS: int = 30
+    
+    # Écriture différée de last_login (tampon Redis vidé par lots)
+    LAST_LOGIN_BUFFER_ENABLED: bool = True
+    LAST_LOGIN_FLUSH_SECONDS: float = 5.0
+    LAST_LOGIN_FLUSH_BATCH_SIZE: int = 1000
+    
+    # Écriture des logs d'audit : file bornée vidée par lots
+    AUDIT_WRITER_QUEUE_SIZE: int = 10000
+    AUDIT_WRITER_BATCH_SIZE: int = 500
+    AUDIT_WRITER_FLUSH_SECONDS: float = 1.0
+    AUDIT_WRITER_OVERFLOW: str = "spill"  # block | spill | drop
+    AUDIT_SPILL_DIR: str = os.path.join(tempfile.gettempdir(), "crm-audit-spill")
+    AUDIT_EXPORT_BATCH_SIZE: int = 5000  # lignes par lot du curseur d'export
+    AUDIT_COLD_STORAGE_URI: str = ""  # chemin local ou s3://bucket/prefixe ; vide = désactivé
+    AUDIT_COLD_STORAGE_CACHE_SECONDS: float = 300.0  # relecture de la liste des mois archivés
+    AUDIT_STREAM_ENABLED: bool = True  # publication Redis des lots pour /audit/stream
+    AUDIT_STREAM_QUEUE_SIZE: int = 100  # événements en attente par client du flux
+    AUDIT_STREAM_KEEPALIVE_SECONDS: float = 15.0
     
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = [
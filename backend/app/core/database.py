@@ -1,18 +1,78 @@
+from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.db_pool import InstrumentedAsyncPool, instrument_pool
+from app.core.db_routing import replica_router
+from app.core.query_stats import instrument_engine
 
+# Pilotes asynchrones correspondant aux URLs synchrones de DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str):
+    """Convertir une URL synchrone (psycopg2) vers son pilote asynchrone"""
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername))
+
+
+# Moteur synchrone : réservé aux scripts (init_roles.py, create_super_admin.py...)
 engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+
+def _create_api_engine(url: str):
+    engine = create_async_engine(
+        to_async_url(url),
+        poolclass=InstrumentedAsyncPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    )
+    instrument_pool(engine.sync_engine, settings.DB_POOL_PRE_PING_IDLE_SECONDS)
+    instrument_engine(engine.sync_engine)
+    return engine
+
+
+# Moteur asynchrone : utilisé par l'API
+async_engine = _create_api_engine(settings.DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# Réplica en lecture seule (optionnel), voir app.core.db_routing
+replica_engine = _create_api_engine(settings.READ_REPLICA_URL) if settings.READ_REPLICA_URL else None
+ReplicaSessionLocal = (
+    async_sessionmaker(replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    if replica_engine is not None else None
+)
+
 Base = declarative_base()
 
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db(request: Request):
+    async with AsyncSessionLocal() as db:
+        yield db
+        # Exécuté avant l'envoi de la réponse : la lecture suivante voit l'écriture
+        await replica_router.mark_write(request, db)
+
+
+async def get_read_db(request: Request):
+    """Session pour les routes en lecture seule : réplica si possible, sinon primaire"""
+    if ReplicaSessionLocal is not None:
+        async with ReplicaSessionLocal() as replica:
+            if await replica_router.use_replica(request, replica):
+                yield replica
+                return
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
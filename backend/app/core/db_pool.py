@@ -0,0 +1,123 @@
+"""
+Pool de connexions instrumenté.
+
+Le pool de l'API est dimensionné depuis Settings (DB_POOL_*) et alimente des
+métriques exposées sur /metrics/db-pool : connexions empruntées, overflow
+utilisé, histogramme du temps d'attente d'une connexion et dépassements de
+DB_POOL_TIMEOUT_SECONDS.
+
+Plutôt qu'un pre-ping à chaque emprunt (un aller-retour de plus par
+requête), une connexion n'est vérifiée que si elle est restée inactive plus
+de DB_POOL_PRE_PING_IDLE_SECONDS : une connexion morte lève alors
+DisconnectionError et le pool la remplace de façon transparente.
+"""
+import time
+from typing import Dict
+
+import greenlet
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.metrics import Histogram
+
+# Seaux en secondes : une attente de pool saine se compte en microsecondes
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+
+_IDLE_SINCE = "idle_since"
+
+
+class PoolTelemetry:
+    """Compteurs et histogramme d'attente d'un pool"""
+
+    def __init__(self):
+        self.wait = Histogram(WAIT_BUCKETS)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.idle_pings = 0
+        self.stale_connections = 0
+
+    def snapshot(self, pool) -> Dict[str, object]:
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow_in_use": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "idle_pings": self.idle_pings,
+            "stale_connections": self.stale_connections,
+            "wait_seconds": self.wait.snapshot(),
+        }
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Pool asyncpg qui mesure le temps d'obtention d'une connexion"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.telemetry = PoolTelemetry()
+        # _do_get se rappelle lui-même sous contention : ne mesurer que l'appel externe
+        self._timing = set()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.telemetry = self.telemetry
+        return pool
+
+    def _do_get(self):
+        current = greenlet.getcurrent()
+        if current in self._timing:
+            return super()._do_get()
+        self._timing.add(current)
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.telemetry.timeouts += 1
+            raise
+        finally:
+            self._timing.discard(current)
+            self.telemetry.wait.observe(time.perf_counter() - started)
+
+
+def instrument_pool(engine: Engine, pre_ping_idle_seconds: float) -> None:
+    """Brancher les événements de pool (télémétrie et ping après inactivité)"""
+
+    def telemetry() -> PoolTelemetry:
+        return engine.pool.telemetry
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        telemetry().connects += 1
+        connection_record.info[_IDLE_SINCE] = time.monotonic()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info[_IDLE_SINCE] = time.monotonic()
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        telemetry().invalidations += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats = telemetry()
+        stats.checkouts += 1
+        if pre_ping_idle_seconds <= 0:
+            return
+        idle_since = connection_record.info.get(_IDLE_SINCE)
+        if idle_since is None or time.monotonic() - idle_since < pre_ping_idle_seconds:
+            return
+        stats.idle_pings += 1
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            # Le pool jette la connexion et en ouvre une nouvelle
+            stats.stale_connections += 1
+            raise exc.DisconnectionError(f"Stale pooled connection: {e}") from e
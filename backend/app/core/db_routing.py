@@ -0,0 +1,142 @@
+"""
+Routage des lectures vers le réplica (optionnel, via READ_REPLICA_URL).
+
+Les routes en lecture seule dépendent de `get_read_db` (app.core.database),
+qui choisit le réplica sauf si :
+- l'utilisateur a écrit il y a moins de READ_YOUR_WRITES_SECONDS (marqueur
+  Redis posé par `get_db` quand la session a flushé des changements) ;
+- le retard de réplication dépasse REPLICA_MAX_LAG_SECONDS, ou n'a pas pu
+  être mesuré (mesure mise en cache REPLICA_LAG_CHECK_SECONDS par worker).
+"""
+import asyncio
+import time
+from typing import Optional
+
+from fastapi import Request
+from fastapi.security.utils import get_authorization_scheme_param
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.core.security import decode_token_claims
+
+RYW_KEY = "db:ryw:"
+WROTE_FLAG = "wrote"
+
+# 0 si le réplica a rejoué tout ce qu'il a reçu (primaire inactif), sinon l'âge
+# de la dernière transaction rejouée
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+@event.listens_for(Session, "after_flush")
+def _flag_write(session, flush_context):
+    session.info[WROTE_FLAG] = True
+
+
+def request_user_id(request: Request) -> Optional[str]:
+    """Identifiant de l'utilisateur du bearer token (claims en cache), sans accès base"""
+    user_id = getattr(request.state, "user_id", None)
+    if user_id:
+        return user_id
+    scheme, token = get_authorization_scheme_param(request.headers.get("authorization"))
+    if scheme.lower() != "bearer" or not token:
+        return None
+    claims = decode_token_claims(token)
+    return claims["sub"] if claims else None
+
+
+class ReplicaRouter:
+    """Décide, requête par requête, si une lecture peut aller au réplica"""
+
+    def __init__(self, enabled: bool, ryw_window: int, max_lag: float, lag_check_interval: float):
+        self.enabled = enabled
+        self.ryw_window = ryw_window
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self._lag: Optional[float] = None
+        self._lag_checked_at = 0.0
+        self._lag_lock = asyncio.Lock()
+        self.replica_reads = 0
+        self.primary_ryw = 0
+        self.primary_lag = 0
+        self.lag_errors = 0
+        self.writes_marked = 0
+
+    async def mark_write(self, request: Request, db: AsyncSession) -> None:
+        """Ouvrir la fenêtre read-your-writes si la session de la requête a écrit"""
+        if not self.enabled or not db.info.get(WROTE_FLAG):
+            return
+        user_id = request_user_id(request)
+        if not user_id:
+            return
+        try:
+            await get_redis().set(RYW_KEY + user_id, 1, ex=self.ryw_window)
+            self.writes_marked += 1
+        except Exception as e:
+            print(f"Read-your-writes mark error: {e}")
+
+    async def _recent_writer(self, user_id: Optional[str]) -> bool:
+        if not user_id:
+            return False
+        try:
+            return bool(await get_redis().exists(RYW_KEY + user_id))
+        except Exception as e:
+            # Sans Redis, on ne peut pas garantir la cohérence : lire sur le primaire
+            print(f"Read-your-writes check error: {e}")
+            return True
+
+    async def lag(self, replica: AsyncSession) -> Optional[float]:
+        """Retard du réplica en secondes (None si la mesure a échoué)"""
+        if time.monotonic() - self._lag_checked_at < self.lag_check_interval:
+            return self._lag
+        async with self._lag_lock:
+            if time.monotonic() - self._lag_checked_at < self.lag_check_interval:
+                return self._lag
+            try:
+                self._lag = float(await replica.scalar(LAG_QUERY))
+            except Exception as e:
+                self.lag_errors += 1
+                self._lag = None
+                print(f"Replica lag check error: {e}")
+            self._lag_checked_at = time.monotonic()
+        return self._lag
+
+    async def use_replica(self, request: Request, replica: AsyncSession) -> bool:
+        if not self.enabled:
+            return False
+        if await self._recent_writer(request_user_id(request)):
+            self.primary_ryw += 1
+            return False
+        lag = await self.lag(replica)
+        if lag is None or lag > self.max_lag:
+            self.primary_lag += 1
+            return False
+        self.replica_reads += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "lag_seconds": self._lag,
+            "max_lag_seconds": self.max_lag,
+            "read_your_writes_seconds": self.ryw_window,
+            "replica_reads": self.replica_reads,
+            "primary_read_your_writes": self.primary_ryw,
+            "primary_lag_fallbacks": self.primary_lag,
+            "lag_errors": self.lag_errors,
+            "writes_marked": self.writes_marked,
+        }
+
+
+replica_router = ReplicaRouter(
+    enabled=bool(settings.READ_REPLICA_URL),
+    ryw_window=settings.READ_YOUR_WRITES_SECONDS,
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+    lag_check_interval=settings.REPLICA_LAG_CHECK_SECONDS,
+)
@@ -1,43 +1,108 @@
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.security import decode_access_token
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import AsyncSessionLocal, get_db
+from app.core.config import settings
+from app.core.security import decode_token_claims
+from app.core.rbac import rbac_engine
+from app.core.auth_cache import Principal, principal_cache
+from app.core.authz import StaleAuthorization, principal_from_claims
+from app.core.sessions import session_registry
 from app.models.user import User
 from app.services.user_service import UserService
 from uuid import UUID
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login", auto_error=False)
 
 
-async def get_current_user(
+async def get_current_principal(
     request: Request,
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
     """
-    Récupérer l'utilisateur courant depuis le token JWT
+    Récupérer le principal courant depuis le token JWT (via le cache)
     """
-    user_id = decode_access_token(token)
-    if user_id is None:
+    claims = decode_token_claims(token)
+    if claims is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Çøµ¡ð ñøt væ¡ïðætë çrëðëñtïæ¡šẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    user = UserService.get_by_id(db, UUID(user_id))
+    user_id = claims["sub"]
+
+    # Session révoquée (déconnexion, désactivation, révocation par un admin)
+    session_id = claims.get("sid")
+    if session_id and await session_registry.is_revoked(session_id):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Šëššïøñ hæš þëëñ rëvøkëðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ",
+            headers={"WWW-Authenticate": 'Bearer error="invalid_token"'},
+        )
+
+    principal = None
+    if settings.STATELESS_AUTH_ENABLED:
+        # Autorisation depuis les claims, seules les versions passent par Redis
+        try:
+            principal = await principal_from_claims(claims, await rbac_engine.get(db))
+        except StaleAuthorization:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Tøkëñ æµtħørïzætïøñ ïš øµtðætëðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ",
+                headers={"WWW-Authenticate": 'Bearer error="invalid_token"'},
+            )
+
+    if principal is None:
+        principal = await principal_cache.get(user_id)
+    if principal is None:
+        user = await UserService.get_by_id(db, UUID(user_id))
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="µšër ñøt føµñðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
+            )
+        principal = Principal.from_user(user)
+        await principal_cache.set(principal)
+
+    # Store user info in request state for audit middleware
+    request.state.user_id = str(principal.id)
+    request.state.user_email = principal.email
+    request.state.user_name = principal.full_name
+    request.state.session_id = session_id
+
+    return principal
+
+
+async def get_current_active_principal(
+    principal: Principal = Depends(get_current_principal)
+) -> Principal:
+    """
+    Vérifier que le principal est actif
+    """
+    if not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Ïñæçtïvë µšërẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
+        )
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """
+    Récupérer l'utilisateur courant (objet ORM) pour les routes qui le modifient
+    """
+    user = await UserService.get_by_id(db, principal.id)
     if user is None:
+        await principal_cache.invalidate(principal.id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="µšër ñøt føµñðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
         )
-    
-    # Store user info in request state for audit middleware
-    request.state.user_id = str(user.id)
-    request.state.user_email = user.email
-    request.state.user_name = user.full_name
-    
     return user
 
 
@@ -56,37 +121,62 @@ async def get_current_active_user(
 
 
 async def get_current_active_superuser(
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+    principal: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
     """
     Vérifier que l'utilisateur est un Super Admin actif
     """
-    is_superadmin = any(role.name == "Super Admin" for role in current_user.roles)
-    if not is_superadmin:
+    if not principal.is_superadmin(await rbac_engine.get(db)):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Šµþër Åðmïñ þrïvï¡ëğëš rëQµïrëðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
         )
-    return current_user
+    return principal
 
 
 def has_permission(resource: str, action: str):
     """
     Décorateur pour vérifier les permissions
     """
-    def permission_checker(current_user: User = Depends(get_current_active_user)) -> User:
-        # Vérifier si l'utilisateur a la permission
-        for role in current_user.roles:
-            for permission in role.permissions:
-                if permission.resource == resource and permission.action == action:
-                    return current_user
-                # Super Admin a toutes les permissions
-                if role.name == "Super Admin":
-                    return current_user
-        
+    async def permission_checker(
+        principal: Principal = Depends(get_current_active_principal),
+        db: AsyncSession = Depends(get_db)
+    ) -> Principal:
+        # Test de bit sur le masque compilé des rôles de l'utilisateur
+        catalog = await rbac_engine.get(db)
+        if catalog.allows(principal.permissions(catalog), resource, action):
+            return principal
+
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Ýøµ ðøñ't ħævë þërmïššïøñ tø {action} {resource}Ąğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
         )
-    
+
     return permission_checker
+
+
+async def recheck_permission(principal_id, session_id, resource: str, action: str) -> bool:
+    """
+    Revérifier une autorisation hors requête (flux longs) : session non
+    révoquée, utilisateur toujours actif et permission toujours accordée.
+    En cas d'erreur, l'autorisation est refusée.
+    """
+    try:
+        if session_id and await session_registry.is_revoked(session_id):
+            return False
+        async with AsyncSessionLocal() as db:
+            principal = await principal_cache.get(str(principal_id))
+            if principal is None:
+                user = await UserService.get_by_id(db, UUID(str(principal_id)))
+                if user is None:
+                    return False
+                principal = Principal.from_user(user)
+                await principal_cache.set(principal)
+            if not principal.is_active:
+                return False
+            catalog = await rbac_engine.get(db)
+            return catalog.allows(principal.permissions(catalog), resource, action)
+    except Exception as e:
+        print(f"Permission recheck error: {e}")
+        return False
@@ -0,0 +1,122 @@
+"""
+Pool de processus dédié à bcrypt.
+
+Le hachage et la vérification des mots de passe sont envoyés dans un
+ProcessPoolExecutor borné : un pic de connexions occupe des cœurs dédiés au
+lieu de saturer le threadpool anyio qui sert le reste de l'API. Au-delà de
+BCRYPT_POOL_MAX_QUEUE tâches en attente, les appels sont refusés
+(HashingPoolSaturated -> 503 + Retry-After).
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+import bcrypt
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.metrics import Histogram
+
+
+# --- Fonctions exécutées dans les processus du pool --------------------------
+
+def _checkpw(plain: bytes, hashed: bytes) -> Tuple[bool, float]:
+    started_at = time.time()
+    return bcrypt.checkpw(plain, hashed), started_at
+
+
+def _hashpw(password: bytes) -> Tuple[bytes, float]:
+    started_at = time.time()
+    return bcrypt.hashpw(password, bcrypt.gensalt()), started_at
+
+
+# -----------------------------------------------------------------------------
+
+class HashingPoolSaturated(Exception):
+    """File d'attente du pool bcrypt pleine"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("bcrypt pool saturated")
+        self.retry_after = retry_after
+
+
+class BcryptPool:
+    """ProcessPoolExecutor borné avec métriques de latence et d'attente"""
+
+    def __init__(self, size: int, max_queue: int, retry_after: int):
+        self.size = size
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+        self.latency = Histogram()
+        self.queue_wait = Histogram()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size,
+                    # "spawn" : pas de fork d'un processus multi-threadé
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    async def run(self, fn, *args):
+        """Exécuter fn dans le pool et retourner son résultat"""
+        submitted_at = time.time()
+        if self.size <= 0:
+            # Pool désactivé : exécution dans le threadpool comme auparavant
+            result, started_at = await run_in_threadpool(fn, *args)
+        else:
+            with self._lock:
+                if self._in_flight >= self.size + self.max_queue:
+                    self.rejected += 1
+                    raise HashingPoolSaturated(self.retry_after)
+                self._in_flight += 1
+            try:
+                future = self._get_executor().submit(fn, *args)
+                result, started_at = await asyncio.wrap_future(future)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+
+        finished_at = time.time()
+        self.queue_wait.observe(max(started_at - submitted_at, 0.0))
+        self.latency.observe(finished_at - submitted_at)
+        return result
+
+    async def checkpw(self, plain: bytes, hashed: bytes) -> bool:
+        return await self.run(_checkpw, plain, hashed)
+
+    async def hashpw(self, password: bytes) -> bytes:
+        return await self.run(_hashpw, password)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.size,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queued": max(self._in_flight - self.size, 0),
+            "rejected": self.rejected,
+            "latency_seconds": self.latency.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+        }
+
+
+bcrypt_pool = BcryptPool(
+    size=settings.BCRYPT_POOL_SIZE,
+    max_queue=settings.BCRYPT_POOL_MAX_QUEUE,
+    retry_after=settings.BCRYPT_POOL_RETRY_AFTER_SECONDS,
+)
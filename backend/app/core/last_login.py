@@ -0,0 +1,183 @@
+"""
+Écriture différée (write-behind) de `users.last_login`.
+
+Une connexion n'écrit plus dans `users` : l'horodatage est placé dans le hash
+Redis `auth:last_login:pending` (partagé entre workers), puis une tâche de
+fond vide le tampon toutes les LAST_LOGIN_FLUSH_SECONDS en un seul
+`UPDATE ... FROM (VALUES ...)` par lot. Le tampon est aussi vidé à l'arrêt.
+
+Les routes qui renvoient un UserResponse superposent les valeurs en attente
+(`overlay`, un HMGET) pour que last_login reste cohérent avant le vidage.
+"""
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import DateTime, String, cast, column, or_, update, values
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.redis import get_redis
+from app.models.user import User
+
+PENDING_KEY = "auth:last_login:pending"
+
+# Prendre tout le tampon atomiquement (un seul worker vide une entrée donnée)
+TAKE_SCRIPT = """
+local data = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return data
+"""
+
+# Réinjecter un lot non écrit sans écraser un horodatage plus récent
+# (format ISO : l'ordre lexicographique est l'ordre chronologique)
+MERGE_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    if not current or current < ARGV[i + 1] then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+return 1
+"""
+
+
+async def _write(pending: Dict[str, str], batch_size: int) -> None:
+    """UPDATE ... FROM (VALUES ...) par lots ; n'écrase jamais une valeur plus récente"""
+    items = list(pending.items())
+    async with AsyncSessionLocal() as db:
+        for start in range(0, len(items), batch_size):
+            rows = values(
+                column("id", String), column("ts", String), name="pending"
+            ).data(items[start:start + batch_size])
+            login_at = cast(rows.c.ts, DateTime)
+            await db.execute(
+                update(User)
+                .where(User.id == cast(rows.c.id, User.id.type))
+                .where(or_(User.last_login.is_(None), User.last_login < login_at))
+                .values(last_login=login_at)
+                .execution_options(synchronize_session=False)
+            )
+        await db.commit()
+
+
+class LastLoginBuffer:
+    """Tampon Redis des dernières connexions, vidé périodiquement"""
+
+    def __init__(self, enabled: bool, flush_interval: float, batch_size: int):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._take = None
+        self._merge = None
+        self._task: Optional[asyncio.Task] = None
+        self.buffered = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.direct_writes = 0
+        self.errors = 0
+
+    async def record(self, user, login_at: datetime) -> None:
+        """Enregistrer une connexion (repli en écriture directe si Redis est indisponible)"""
+        # Valeur visible immédiatement sur l'objet, sans le marquer modifié
+        set_committed_value(user, "last_login", login_at)
+        if self.enabled:
+            try:
+                await get_redis().hset(PENDING_KEY, str(user.id), login_at.isoformat())
+                self.buffered += 1
+                return
+            except Exception as e:
+                self.errors += 1
+                print(f"Last login buffer error: {e}")
+        self.direct_writes += 1
+        await _write({str(user.id): login_at.isoformat()}, 1)
+
+    async def overlay(self, users: Iterable[User]) -> None:
+        """Superposer les horodatages en attente sur des utilisateurs chargés"""
+        if not self.enabled:
+            return
+        users = [user for user in users if user is not None]
+        if not users:
+            return
+        try:
+            pending = await get_redis().hmget(PENDING_KEY, [str(user.id) for user in users])
+        except Exception as e:
+            self.errors += 1
+            print(f"Last login buffer error: {e}")
+            return
+        for user, raw in zip(users, pending):
+            if raw is None:
+                continue
+            login_at = datetime.fromisoformat(raw.decode())
+            if user.last_login is None or user.last_login < login_at:
+                set_committed_value(user, "last_login", login_at)
+
+    async def flush(self) -> int:
+        """Vider le tampon vers la base ; retourne le nombre d'utilisateurs écrits"""
+        client = get_redis()
+        if self._take is None:
+            self._take = client.register_script(TAKE_SCRIPT)
+            self._merge = client.register_script(MERGE_SCRIPT)
+
+        raw = await self._take(keys=[PENDING_KEY], client=client)
+        if not raw:
+            return 0
+        pending = {raw[i].decode(): raw[i + 1].decode() for i in range(0, len(raw), 2)}
+        try:
+            await _write(pending, self.batch_size)
+        except Exception:
+            # Rien n'est perdu : le lot retourne dans le tampon pour le prochain cycle
+            flat = [part for item in pending.items() for part in item]
+            await self._merge(keys=[PENDING_KEY], args=flat, client=client)
+            raise
+        self.flushes += 1
+        self.flushed += len(pending)
+        return len(pending)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self.errors += 1
+                print(f"Last login flush error: {e}")
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arrêter la tâche de fond et effectuer un dernier vidage"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.enabled:
+            try:
+                await self.flush()
+            except Exception as e:
+                self.errors += 1
+                print(f"Last login flush error: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "flush_interval": self.flush_interval,
+            "buffered": self.buffered,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "direct_writes": self.direct_writes,
+            "errors": self.errors,
+        }
+
+
+last_login_buffer = LastLoginBuffer(
+    enabled=settings.LAST_LOGIN_BUFFER_ENABLED,
+    flush_interval=settings.LAST_LOGIN_FLUSH_SECONDS,
+    batch_size=settings.LAST_LOGIN_FLUSH_BATCH_SIZE,
+)
@@ -0,0 +1,51 @@
+"""
+Primitives de métriques en mémoire (par worker), exposées sur /metrics
+"""
+import threading
+from typing import Dict, Sequence
+
+# Seaux en secondes
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Histogramme à seaux fixes, cumulatifs à la Prometheus"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            if value > self._max:
+                self._max = value
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            counts = list(self._counts)
+            total, count, maximum = self._sum, self._count, self._max
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            buckets[f"le_{bound}"] = cumulative
+        buckets["le_inf"] = cumulative + counts[-1]
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "avg": round(total / count, 6) if count else 0.0,
+            "max": round(maximum, 6),
+            "buckets": buckets,
+        }
@@ -0,0 +1,73 @@
+"""
+Pagination par curseur (keyset).
+
+Une liste est triée sur une clé unique, par exemple (created_at, id) ; la
+page suivante reprend après la dernière ligne vue (`WHERE (created_at, id) <
+(:c, :i)`) au lieu de sauter `skip` lignes : le coût d'une page ne dépend
+plus de sa profondeur, à condition qu'un index composite couvre la clé.
+
+Le curseur est opaque pour le client (JSON encodé en base64url). Les routes
+renvoient toujours une liste ; le curseur de la page suivante est dans
+l'en-tête `X-Next-Cursor`, présent dès qu'une page est pleine, y compris en
+mode offset (`skip`, conservé pour compatibilité).
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Select, tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Ïñvæ¡ïð þæĝïñæţïøñ çµršørẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
+    )
+
+
+class Keyset:
+    """Clé de tri unique d'une liste et (dé)codage de ses curseurs"""
+
+    def __init__(self, *columns, descending: bool = False):
+        self.columns = columns
+        self.descending = descending
+
+    def decode(self, cursor: str) -> list:
+        """Valeurs de la clé contenues dans un curseur (400 si invalide)"""
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            if not isinstance(raw, list) or len(raw) != len(self.columns):
+                raise ValueError(cursor)
+            values = []
+            for column, value in zip(self.columns, raw):
+                python_type = column.type.python_type
+                values.append(datetime.fromisoformat(value) if python_type is datetime else python_type(value))
+            return values
+        except (ValueError, TypeError):
+            raise _invalid_cursor()
+
+    def encode(self, row) -> str:
+        values = []
+        for column in self.columns:
+            value = getattr(row, column.key)
+            values.append(value.isoformat() if isinstance(value, datetime) else str(value))
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+    def paginate(self, query: Select, limit: int, cursor: Optional[str] = None, skip: int = 0) -> Select:
+        """Trier sur la clé puis reprendre après `cursor` (ou sauter `skip` lignes sans curseur)"""
+        query = query.order_by(*(column.desc() if self.descending else column.asc() for column in self.columns))
+        if cursor:
+            key, values = tuple_(*self.columns), tuple_(*self.decode(cursor))
+            query = query.where(key < values if self.descending else key > values)
+        elif skip:
+            query = query.offset(skip)
+        return query.limit(limit)
+
+    def set_next_cursor(self, response: Response, rows: Sequence, limit: int) -> None:
+        """Exposer le curseur de la page suivante si la page est pleine"""
+        if rows and len(rows) >= limit:
+            response.headers[NEXT_CURSOR_HEADER] = self.encode(rows[-1])
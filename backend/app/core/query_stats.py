@@ -0,0 +1,234 @@
+"""
+Instrumentation SQL par requête.
+
+Les événements `before_cursor_execute` / `after_cursor_execute` des moteurs de
+l'API alimentent un `RequestQueryStats` porté par une ContextVar (positionnée
+par le middleware, propagée aux greenlets de SQLAlchemy) : nombre de requêtes,
+temps base cumulé et empreintes des instructions.
+
+Le middleware (ASGI pur, enregistré seulement si SQL_INSTRUMENTATION_ENABLED)
+ajoute l'en-tête `Server-Timing` (db, app) au message `http.response.start`,
+journalise les requêtes lentes et les N+1 suspects (même empreinte répétée),
+et agrège des statistiques par route exposées sur /metrics/queries.
+
+Budget de requêtes : `@query_budget(n)` sur un endpoint. En mode strict
+(QUERY_BUDGET_STRICT, à activer en test), un dépassement lève
+QueryBudgetExceeded au lieu d'être seulement journalisé.
+"""
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+_STARTED = "query_started"
+
+# Paramètres liés (?, $1, %(name)s, :name) et listes IN dépliées
+_PARAM_RE = re.compile(r"\$\d+|%\(\w+\)s|(?<!:):\w+|\?")
+_IN_LIST_RE = re.compile(r"\bIN \((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Forme normalisée d'une instruction : deux exécutions d'un même N+1 coïncident"""
+    normalized = _PARAM_RE.sub("?", statement)
+    normalized = _IN_LIST_RE.sub("IN (?)", normalized)
+    return _SPACE_RE.sub(" ", normalized).strip()
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Route au-delà de son budget de requêtes (mode strict)"""
+
+
+class RequestQueryStats:
+    """Compteurs SQL d'une requête HTTP"""
+
+    __slots__ = ("count", "db_time", "fingerprints")
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.fingerprints: Counter = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.db_time += duration
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int):
+        """Empreintes exécutées au moins `threshold` fois (N+1 suspects)"""
+        return [(fp, n) for fp, n in self.fingerprints.most_common() if n >= threshold]
+
+
+_current: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+def query_budget(max_queries: int) -> Callable:
+    """Déclarer le nombre maximal de requêtes SQL d'un endpoint"""
+
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.query_budget = max_queries
+        return endpoint
+
+    return decorator
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Brancher le comptage des requêtes sur un moteur (sync_engine pour l'async)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault(_STARTED, []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        started = conn.info.get(_STARTED)
+        if stats is None or not started:
+            return
+        stats.record(statement, time.perf_counter() - started.pop())
+
+
+class QueryStatsRegistry:
+    """Agrégats par route (par worker) et politique de journalisation"""
+
+    def __init__(
+        self,
+        enabled: bool,
+        slow_request_ms: float,
+        slow_request_queries: int,
+        n_plus_one_threshold: int,
+        default_budget: int,
+        strict: bool,
+    ):
+        self.enabled = enabled
+        self.slow_request_ms = slow_request_ms
+        self.slow_request_queries = slow_request_queries
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.default_budget = default_budget
+        self.strict = strict
+        self._routes: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.slow_requests = 0
+        self.n_plus_one = 0
+        self.budget_exceeded = 0
+
+    def _observe(self, route: str, stats: RequestQueryStats, over_budget: bool) -> None:
+        with self._lock:
+            entry = self._routes.setdefault(
+                route,
+                {"requests": 0, "queries": 0, "max_queries": 0, "db_seconds": 0.0, "budget_exceeded": 0},
+            )
+            entry["requests"] += 1
+            entry["queries"] += stats.count
+            entry["max_queries"] = max(entry["max_queries"], stats.count)
+            entry["db_seconds"] += stats.db_time
+            if over_budget:
+                entry["budget_exceeded"] += 1
+
+    def finish(self, scope: Scope, stats: RequestQueryStats, elapsed: float, status_code: int) -> str:
+        """Bilan d'une requête à l'envoi de sa réponse ; retourne l'en-tête Server-Timing"""
+        method = scope["method"]
+        route = scope.get("route")
+        route_name = f"{method} {route.path}" if route is not None else f"{method} {scope['path']}"
+        endpoint = scope.get("endpoint")
+        budget = getattr(endpoint, "query_budget", self.default_budget)
+        over_budget = bool(budget) and stats.count > budget
+        self._observe(route_name, stats, over_budget)
+
+        repeated = stats.repeated(self.n_plus_one_threshold)
+        slow = elapsed * 1000 >= self.slow_request_ms or stats.count >= self.slow_request_queries
+        reasons = []
+        if slow:
+            self.slow_requests += 1
+            reasons.append("slow")
+        if repeated:
+            self.n_plus_one += 1
+            reasons.append("n+1")
+        if over_budget:
+            reasons.append(f"budget={budget}")
+        if reasons:
+            print(
+                f"SQL profile [{', '.join(reasons)}]: {route_name} status={status_code} "
+                f"duration={elapsed * 1000:.1f}ms queries={stats.count} db={stats.db_time * 1000:.1f}ms"
+            )
+            for statement, n in repeated[:3]:
+                print(f"  N+1 suspect x{n}: {statement[:200]}")
+
+        if over_budget:
+            self.budget_exceeded += 1
+            if self.strict:
+                raise QueryBudgetExceeded(
+                    f"{route_name} issued {stats.count} queries (budget {budget})"
+                )
+        return (
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.count} queries", '
+            f"app;dur={elapsed * 1000:.1f}"
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = {
+                name: {
+                    **entry,
+                    "avg_queries": round(entry["queries"] / entry["requests"], 2),
+                    "db_seconds": round(entry["db_seconds"], 6),
+                }
+                for name, entry in sorted(self._routes.items())
+            }
+        return {
+            "enabled": self.enabled,
+            "strict": self.strict,
+            "slow_requests": self.slow_requests,
+            "n_plus_one": self.n_plus_one,
+            "budget_exceeded": self.budget_exceeded,
+            "routes": routes,
+        }
+
+
+query_stats = QueryStatsRegistry(
+    enabled=settings.SQL_INSTRUMENTATION_ENABLED,
+    slow_request_ms=settings.SLOW_REQUEST_MS,
+    slow_request_queries=settings.SLOW_REQUEST_QUERIES,
+    n_plus_one_threshold=settings.N_PLUS_ONE_THRESHOLD,
+    default_budget=settings.QUERY_BUDGET_DEFAULT,
+    strict=settings.QUERY_BUDGET_STRICT,
+)
+
+
+class QueryStatsMiddleware:
+    """Compteurs SQL de chaque requête HTTP, bilan à l'envoi de la réponse"""
+
+    def __init__(self, app: ASGIApp, registry: QueryStatsRegistry = query_stats):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        started = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                server_timing = self.registry.finish(scope, stats, elapsed, message["status"])
+                MutableHeaders(scope=message)["Server-Timing"] = server_timing
+            await send(message)
+
+        token = _current.set(stats)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
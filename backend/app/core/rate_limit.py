@@ -0,0 +1,131 @@
+"""
+Limitation des tentatives de connexion (fenêtre glissante dans Redis).
+
+Les échecs sont enregistrés dans deux sorted sets (par email et par IP cliente)
+dont le score est l'horodatage en millisecondes. La vérification, exécutée
+avant tout hachage bcrypt, est un unique script Lua : un seul aller-retour
+Redis, atomique. Les seuils viennent de SystemSettings (max_login_attempts,
+lockout_duration) ; l'IP tolère LOGIN_THROTTLE_IP_MULTIPLIER fois plus
+d'échecs, plusieurs agents d'une même agence partageant souvent une IP.
+"""
+import hashlib
+import time
+import uuid
+from typing import Optional
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+EMAIL_KEY = "auth:login:fail:email:"
+IP_KEY = "auth:login:fail:ip:"
+
+# KEYS : sorted sets d'échecs ; ARGV[1] = maintenant (ms), ARGV[2] = fenêtre (ms),
+# ARGV[3..] = seuil de chaque clé. Retourne le délai d'attente en ms (0 = autorisé).
+CHECK_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[i + 2])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    local count = redis.call('ZCARD', key)
+    if count >= limit then
+        local pivot = redis.call('ZRANGE', key, count - limit, count - limit, 'WITHSCORES')
+        local wait = tonumber(pivot[2]) + window - now
+        if wait > retry_after then
+            retry_after = wait
+        end
+    end
+end
+return retry_after
+"""
+
+
+def _email_key(email: str) -> str:
+    digest = hashlib.sha1(email.strip().lower().encode("utf-8")).hexdigest()
+    return EMAIL_KEY + digest
+
+
+class LoginThrottle:
+    """Limiteur à fenêtre glissante par email et par IP"""
+
+    def __init__(self, enabled: bool, ip_multiplier: int):
+        self.enabled = enabled
+        self.ip_multiplier = ip_multiplier
+        self._script = None
+        self.rejected = 0
+        self.redis_errors = 0
+
+    def _keys(self, email: str, ip: Optional[str]):
+        keys = [_email_key(email)]
+        if ip:
+            keys.append(IP_KEY + ip)
+        return keys
+
+    async def check(self, email: str, ip: Optional[str], max_attempts: int, lockout_minutes: int) -> int:
+        """
+        Retourne le nombre de secondes avant la prochaine tentative autorisée
+        (0 si la connexion peut être tentée)
+        """
+        if not self.enabled:
+            return 0
+        keys = self._keys(email, ip)
+        limits = [max_attempts, max_attempts * self.ip_multiplier][:len(keys)]
+        try:
+            if self._script is None:
+                self._script = get_redis().register_script(CHECK_SCRIPT)
+            now_ms = int(time.time() * 1000)
+            wait_ms = await self._script(
+                keys=keys,
+                args=[now_ms, lockout_minutes * 60000, *limits],
+                client=get_redis(),
+            )
+        except Exception as e:
+            # Ne jamais bloquer toutes les connexions parce que Redis est indisponible
+            self.redis_errors += 1
+            print(f"Login throttle Redis error: {e}")
+            return 0
+        wait_ms = int(wait_ms)
+        if wait_ms <= 0:
+            return 0
+        self.rejected += 1
+        return max(1, -(-wait_ms // 1000))
+
+    async def record_failure(self, email: str, ip: Optional[str], lockout_minutes: int) -> None:
+        if not self.enabled:
+            return
+        now_ms = int(time.time() * 1000)
+        member = f"{now_ms}:{uuid.uuid4().hex[:8]}"
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for key in self._keys(email, ip):
+                pipe.zadd(key, {member: now_ms})
+                pipe.pexpire(key, lockout_minutes * 60000)
+            await pipe.execute()
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"Login throttle Redis error: {e}")
+
+    async def reset(self, email: str) -> None:
+        """Effacer les échecs de l'email après une connexion réussie"""
+        if not self.enabled:
+            return
+        try:
+            await get_redis().delete(_email_key(email))
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"Login throttle Redis error: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "ip_multiplier": self.ip_multiplier,
+            "rejected": self.rejected,
+            "redis_errors": self.redis_errors,
+        }
+
+
+login_throttle = LoginThrottle(
+    enabled=settings.LOGIN_THROTTLE_ENABLED,
+    ip_multiplier=settings.LOGIN_THROTTLE_IP_MULTIPLIER,
+)
@@ -0,0 +1,241 @@
+"""
+Moteur RBAC compilé.
+
+Chaque couple (resource, action) de la table `permissions` reçoit un petit
+identifiant entier (un bit), chaque rôle devient un masque précalculé et les
+permissions effectives d'un utilisateur sont le OU des masques de ses rôles.
+Une vérification se résume alors à un test de bit.
+
+Le catalogue n'est recompilé que lorsque `roles`, `permissions` ou
+`role_permissions` changent (détecté via les événements de session SQLAlchemy).
+Le worker qui valide la modification incrémente une génération dans Redis
+(CATALOG_GENERATION_KEY) ; les autres la relisent au plus toutes les
+RBAC_CATALOG_CHECK_SECONDS et recompilent quand elle a changé (ou quand
+Redis ne répond pas).
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.models.user import Role, Permission, role_permissions
+
+SUPER_ADMIN_ROLE = "Super Admin"
+
+# Tous les bits à 1 : le Super Admin possède toutes les permissions,
+# y compris celles qui n'existent pas (encore) dans la table `permissions`.
+FULL_MASK = -1
+
+CATALOG_GENERATION_KEY = "rbac:catalog:generation"
+
+
+class CompiledCatalog:
+    """Snapshot immuable du catalogue de permissions compilé"""
+
+    __slots__ = ("version", "bits", "role_masks", "fingerprint")
+
+    def __init__(
+        self,
+        version: int,
+        bits: Dict[Tuple[str, str], int],
+        role_masks: Dict[UUID, int],
+    ):
+        self.version = version
+        self.bits = bits
+        self.role_masks = role_masks
+        # Empreinte de l'attribution des bits, identique d'un worker à l'autre :
+        # un masque n'a de sens que face au catalogue qui l'a produit.
+        layout = "\n".join(f"{resource}:{action}" for resource, action in bits)
+        self.fingerprint = hashlib.sha1(layout.encode("utf-8")).hexdigest()[:12]
+
+    def bit(self, resource: str, action: str) -> Optional[int]:
+        """Identifiant entier d'une permission, None si inconnue"""
+        return self.bits.get((resource, action))
+
+    def mask_for_roles(self, role_ids: Iterable[UUID]) -> int:
+        """Permissions effectives : OU des masques des rôles"""
+        mask = 0
+        for role_id in role_ids:
+            mask |= self.role_masks.get(role_id, 0)
+        return mask
+
+    def allows(self, mask: int, resource: str, action: str) -> bool:
+        """Tester un bit du masque"""
+        if mask == FULL_MASK:
+            return True
+        bit = self.bits.get((resource, action))
+        if bit is None:
+            return False
+        return bool(mask >> bit & 1)
+
+
+def compile_catalog(
+    permissions: Iterable[Tuple[UUID, str, str]],
+    roles: Iterable[Tuple[UUID, str]],
+    grants: Iterable[Tuple[UUID, UUID]],
+    version: int = 0,
+) -> CompiledCatalog:
+    """
+    Compiler le catalogue à partir de tuples bruts :
+    permissions (id, resource, action), roles (id, name),
+    grants (role_id, permission_id).
+
+    Les bits sont attribués dans l'ordre des permissions fournies, un même
+    couple (resource, action) partageant le même bit.
+    """
+    bits: Dict[Tuple[str, str], int] = {}
+    permission_bits: Dict[UUID, int] = {}
+    for permission_id, resource, action in permissions:
+        key = (resource, action)
+        if key not in bits:
+            bits[key] = len(bits)
+        permission_bits[permission_id] = bits[key]
+
+    role_masks: Dict[UUID, int] = {}
+    for role_id, name in roles:
+        role_masks[role_id] = FULL_MASK if name == SUPER_ADMIN_ROLE else 0
+
+    for role_id, permission_id in grants:
+        mask = role_masks.get(role_id)
+        bit = permission_bits.get(permission_id)
+        if mask is None or mask == FULL_MASK or bit is None:
+            continue
+        role_masks[role_id] = mask | (1 << bit)
+
+    return CompiledCatalog(version, bits, role_masks)
+
+
+class RBACEngine:
+    """Détient le catalogue compilé et le recompile à la demande"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._catalog: Optional[CompiledCatalog] = None
+        self._generation = 0
+        # Génération partagée (Redis) vue à la dernière vérification
+        self._shared_generation: Optional[int] = None
+        self._checked_at = float("-inf")
+        self._pending: Set[asyncio.Task] = set()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def invalidate(self) -> None:
+        """Marquer le catalogue comme périmé (recompilé au prochain accès)"""
+        with self._lock:
+            self._generation += 1
+            self._catalog = None
+
+    async def _check_shared_generation(self) -> None:
+        """Invalider si un autre worker a modifié le catalogue (au plus toutes les RBAC_CATALOG_CHECK_SECONDS)"""
+        now = time.monotonic()
+        if now - self._checked_at < settings.RBAC_CATALOG_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        try:
+            shared = int(await get_redis().get(CATALOG_GENERATION_KEY) or 0)
+        except Exception as e:
+            # Sans Redis, impossible de savoir : recompiler plutôt que servir un catalogue périmé
+            print(f"RBAC catalog generation check error: {e}")
+            self.invalidate()
+            return
+        if self._shared_generation is not None and shared != self._shared_generation:
+            self.invalidate()
+        self._shared_generation = shared
+
+    async def _publish_generation(self) -> None:
+        try:
+            self._shared_generation = await get_redis().incr(CATALOG_GENERATION_KEY)
+        except Exception as e:
+            print(f"RBAC catalog generation publish error: {e}")
+
+    def publish_invalidation(self) -> None:
+        """Invalider localement et signaler la modification aux autres workers"""
+        self.invalidate()
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Session synchrone hors boucle (scripts) : les workers verront le changement au redémarrage
+            return
+        task = asyncio.create_task(self._publish_generation())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def get(self, db: AsyncSession) -> CompiledCatalog:
+        """Récupérer le catalogue compilé, en le recompilant si nécessaire"""
+        await self._check_shared_generation()
+        catalog = self._catalog
+        if catalog is not None:
+            return catalog
+
+        generation = self._generation
+        catalog = await self._load(db, generation)
+        with self._lock:
+            # Ne pas publier un catalogue invalidé pendant sa compilation
+            if self._generation == generation:
+                self._catalog = catalog
+        return catalog
+
+    @staticmethod
+    async def _load(db: AsyncSession, version: int) -> CompiledCatalog:
+        permissions = (await db.execute(
+            select(Permission.id, Permission.resource, Permission.action)
+            .order_by(Permission.created_at, Permission.id)
+        )).all()
+        roles = (await db.execute(select(Role.id, Role.name))).all()
+        grants = (await db.execute(
+            select(role_permissions.c.role_id, role_permissions.c.permission_id)
+        )).all()
+        return compile_catalog(permissions, roles, grants, version=version)
+
+
+rbac_engine = RBACEngine()
+
+
+# --- Invalidation automatique ------------------------------------------------
+
+_RBAC_FLAG = "rbac_catalog_dirty"
+
+
+def _touches_catalog(session: Session) -> bool:
+    for obj in session.new:
+        if isinstance(obj, (Role, Permission)):
+            return True
+    for obj in session.deleted:
+        if isinstance(obj, (Role, Permission)):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, Permission):
+            return True
+        if isinstance(obj, Role):
+            # Ignorer les modifications de Role.users (assignation de rôles)
+            attrs = inspect(obj).attrs
+            if attrs.name.history.has_changes() or attrs.permissions.history.has_changes():
+                return True
+    return False
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_catalog_dirty(session, flush_context):
+    if _touches_catalog(session):
+        session.info[_RBAC_FLAG] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog(session):
+    if session.info.pop(_RBAC_FLAG, False):
+        rbac_engine.publish_invalidation()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_flag(session):
+    session.info.pop(_RBAC_FLAG, None)
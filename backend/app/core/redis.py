@@ -0,0 +1,30 @@
+"""
+Client Redis partagé (créé paresseusement, un par worker)
+"""
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+_async_client: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> aioredis.Redis:
+    """Client asynchrone, pour les dépendances et routes async"""
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+    return _async_client
+
+
+async def close_redis() -> None:
+    """Fermer les connexions (arrêt de l'application)"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
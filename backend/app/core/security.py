@@ -1,8 +1,11 @@
 import bcrypt
 from datetime import datetime, timedelta
 from typing import Optional
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
 from app.core.config import settings
+from app.core.hashing import HashingPoolSaturated, bcrypt_pool
+from app.core.token_cache import token_cache
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -24,6 +27,38 @@ def get_password_hash(password: str) -> str:
     return hashed.decode('utf-8')
 
 
+def _pool_saturated(exc: HashingPoolSaturated) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Šërvïçë tëmþøræ¡ý µñævæï¡æþ¡ëẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Vérifier un mot de passe dans le pool de processus bcrypt
+    """
+    try:
+        return await bcrypt_pool.checkpw(
+            plain_password.encode('utf-8'),
+            hashed_password.encode('utf-8')
+        )
+    except HashingPoolSaturated as exc:
+        raise _pool_saturated(exc)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Créer un hash du mot de passe dans le pool de processus bcrypt
+    """
+    try:
+        hashed = await bcrypt_pool.hashpw(password.encode('utf-8'))
+    except HashingPoolSaturated as exc:
+        raise _pool_saturated(exc)
+    return hashed.decode('utf-8')
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Créer un token JWT
@@ -39,15 +74,31 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def decode_access_token(token: str) -> Optional[str]:
+def decode_token_claims(token: str) -> Optional[dict]:
     """
-    Décoder et valider un token JWT
+    Décoder et valider un token JWT, en retournant toutes ses claims
+    (mises en cache jusqu'à l'expiration du token)
     """
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+    
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            return None
-        return user_id
     except JWTError:
         return None
+    if payload.get("sub") is None:
+        return None
+    
+    token_cache.put(token, payload)
+    return payload
+
+
+def decode_access_token(token: str) -> Optional[str]:
+    """
+    Décoder et valider un token JWT
+    """
+    payload = decode_token_claims(token)
+    if payload is None:
+        return None
+    return payload["sub"]
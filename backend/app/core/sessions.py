@@ -0,0 +1,291 @@
+"""
+Registre de sessions côté serveur (Redis).
+
+Chaque connexion ouvre une session : un hash `auth:session:{sid}` (utilisateur,
+empreinte du refresh token, IP, user agent, dates) référencé dans l'ensemble
+`auth:user_sessions:{user_id}`. Les tokens d'accès portent le `sid` et restent
+courts ; les refresh tokens (`{sid}.{secret}`) tournent à chaque usage et la
+réutilisation d'un refresh token déjà consommé révoque la session.
+
+Les sessions révoquées sont inscrites dans le sorted set `auth:revoked`
+(score = date de révocation en ms), consulté en O(1). Devant lui, chaque
+worker tient un filtre de Bloom synchronisé au plus toutes les
+SESSION_REVOCATION_SYNC_SECONDS : le cas courant (session non révoquée) est
+tranché en mémoire sans quitter le processus.
+"""
+import hashlib
+import secrets
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+SESSION_KEY = "auth:session:"
+USER_SESSIONS_KEY = "auth:user_sessions:"
+REVOKED_KEY = "auth:revoked"
+
+# Marge de relecture lors de la synchronisation (horloges des workers)
+SYNC_OVERLAP_MS = 5000
+
+# KEYS[1] = hash de session ; ARGV = empreinte attendue, nouvelle empreinte, maintenant.
+# Retourne 1 si la rotation a eu lieu, 0 si l'empreinte ne correspond pas, -1 si la
+# session n'existe plus.
+ROTATE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'refresh_hash')
+if not current then
+    return -1
+end
+if current ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'refresh_hash', ARGV[2], 'last_used_at', ARGV[3])
+return 1
+"""
+
+
+class RefreshTokenReused(Exception):
+    """Un refresh token déjà consommé a été présenté (session révoquée)"""
+
+
+def _digest(secret: str) -> str:
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+
+class BloomFilter:
+    """Filtre de Bloom minimal (double hachage sur blake2b)"""
+
+    def __init__(self, bits: int, hashes: int):
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, value: str) -> Iterable[int]:
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, value: str) -> None:
+        for position in self._positions(value):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._array[p >> 3] & (1 << (p & 7)) for p in self._positions(value))
+
+
+class SessionRegistry:
+    """Sessions, refresh tokens et liste de révocation"""
+
+    def __init__(
+        self,
+        refresh_ttl: int,
+        access_ttl: int,
+        sync_interval: float,
+        bloom_bits: int,
+        bloom_hashes: int,
+    ):
+        self.refresh_ttl = refresh_ttl
+        self.access_ttl = access_ttl
+        self.sync_interval = sync_interval
+        self.bloom_bits = bloom_bits
+        self.bloom_hashes = bloom_hashes
+        self._bloom = BloomFilter(bloom_bits, bloom_hashes)
+        self._lock = threading.Lock()
+        self._last_sync = 0.0
+        self._last_rebuild = time.time()
+        self._cursor_ms = 0
+        self._rotate_script = None
+        self.bloom_negatives = 0
+        self.bloom_positives = 0
+        self.confirmed_revoked = 0
+        self.redis_errors = 0
+
+    # --- Création et rotation -----------------------------------------------
+
+    async def create(self, user_id, ip_address: Optional[str], user_agent: Optional[str]) -> Tuple[str, str]:
+        """Ouvrir une session ; retourne (sid, refresh_token)"""
+        session_id = secrets.token_urlsafe(16)
+        secret = secrets.token_urlsafe(32)
+        now = int(time.time())
+        user_key = USER_SESSIONS_KEY + str(user_id)
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.hset(SESSION_KEY + session_id, mapping={
+            "user_id": str(user_id),
+            "refresh_hash": _digest(secret),
+            "created_at": now,
+            "last_used_at": now,
+            "expires_at": now + self.refresh_ttl,
+            "ip_address": ip_address or "",
+            "user_agent": (user_agent or "")[:500],
+        })
+        pipe.expire(SESSION_KEY + session_id, self.refresh_ttl)
+        pipe.sadd(user_key, session_id)
+        pipe.expire(user_key, self.refresh_ttl)
+        await pipe.execute()
+        return session_id, f"{session_id}.{secret}"
+
+    async def rotate(self, refresh_token: str) -> Optional[Tuple[str, str, str]]:
+        """
+        Consommer un refresh token et en émettre un nouveau.
+        Retourne (sid, user_id, nouveau refresh token), ou None si invalide.
+        """
+        session_id, _, secret = refresh_token.partition(".")
+        if not session_id or not secret:
+            return None
+        client = get_redis()
+        if self._rotate_script is None:
+            self._rotate_script = client.register_script(ROTATE_SCRIPT)
+
+        new_secret = secrets.token_urlsafe(32)
+        result = await self._rotate_script(
+            keys=[SESSION_KEY + session_id],
+            args=[_digest(secret), _digest(new_secret), int(time.time())],
+            client=client,
+        )
+        if result == -1:
+            return None
+        user_id = await client.hget(SESSION_KEY + session_id, "user_id")
+        if result == 0:
+            # Refresh token rejoué : on considère la session compromise
+            if user_id is not None:
+                await self.revoke(session_id, user_id.decode())
+            raise RefreshTokenReused()
+        return session_id, user_id.decode(), f"{session_id}.{new_secret}"
+
+    async def is_active(self, session_id: str, user_id) -> bool:
+        """Session existante, non expirée et à cet utilisateur (lecture seule : ne la prolonge pas)"""
+        owner, expires_at = await get_redis().hmget(SESSION_KEY + session_id, ["user_id", "expires_at"])
+        if owner is None or expires_at is None or owner.decode() != str(user_id):
+            return False
+        return int(expires_at) > time.time()
+
+    # --- Révocation ---------------------------------------------------------
+
+    def _remember(self, session_ids: Iterable[str]) -> None:
+        with self._lock:
+            for session_id in session_ids:
+                self._bloom.add(session_id)
+
+    async def revoke(self, session_id: str, user_id) -> None:
+        """Révoquer une session (déconnexion)"""
+        now_ms = int(time.time() * 1000)
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.zadd(REVOKED_KEY, {session_id: now_ms})
+        pipe.delete(SESSION_KEY + session_id)
+        pipe.srem(USER_SESSIONS_KEY + str(user_id), session_id)
+        await pipe.execute()
+        self._remember([session_id])
+
+    async def revoke_user_sessions(self, user_id, session_ids: Optional[List[str]] = None) -> int:
+        """Révoquer en masse les sessions d'un utilisateur (toutes par défaut)"""
+        client = get_redis()
+        user_key = USER_SESSIONS_KEY + str(user_id)
+        owned = {sid.decode() for sid in await client.smembers(user_key)}
+        targets = owned if session_ids is None else owned.intersection(session_ids)
+        if not targets:
+            return 0
+        now_ms = int(time.time() * 1000)
+        pipe = client.pipeline(transaction=True)
+        pipe.zadd(REVOKED_KEY, {session_id: now_ms for session_id in targets})
+        pipe.delete(*(SESSION_KEY + session_id for session_id in targets))
+        pipe.srem(user_key, *targets)
+        await pipe.execute()
+        self._remember(targets)
+        return len(targets)
+
+    async def list_sessions(self, user_id) -> List[Dict[str, object]]:
+        """Sessions actives d'un utilisateur (les entrées expirées sont purgées)"""
+        client = get_redis()
+        user_key = USER_SESSIONS_KEY + str(user_id)
+        session_ids = sorted(sid.decode() for sid in await client.smembers(user_key))
+        if not session_ids:
+            return []
+        pipe = client.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.hgetall(SESSION_KEY + session_id)
+        sessions, expired = [], []
+        for session_id, raw in zip(session_ids, await pipe.execute()):
+            if not raw:
+                expired.append(session_id)
+                continue
+            data = {key.decode(): value.decode() for key, value in raw.items()}
+            sessions.append({
+                "id": session_id,
+                "created_at": int(data["created_at"]),
+                "last_used_at": int(data["last_used_at"]),
+                "expires_at": int(data["expires_at"]),
+                "ip_address": data.get("ip_address") or None,
+                "user_agent": data.get("user_agent") or None,
+            })
+        if expired:
+            await client.srem(user_key, *expired)
+        return sorted(sessions, key=lambda s: s["last_used_at"], reverse=True)
+
+    # --- Vérification -------------------------------------------------------
+
+    async def _sync(self) -> None:
+        now = time.time()
+        if now - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = now
+        # Au-delà de la durée de vie d'un token d'accès, une révocation est inutile
+        horizon_ms = int((now - self.access_ttl) * 1000)
+        rebuild = now - self._last_rebuild > self.access_ttl
+        since = "-inf" if rebuild else max(self._cursor_ms - SYNC_OVERLAP_MS, 0)
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.zremrangebyscore(REVOKED_KEY, "-inf", horizon_ms)
+            pipe.zrangebyscore(REVOKED_KEY, since, "+inf", withscores=True)
+            _, entries = await pipe.execute()
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"Session revocation sync error: {e}")
+            return
+
+        with self._lock:
+            if rebuild:
+                # Repartir d'un filtre propre : les révocations purgées en sortent
+                self._bloom = BloomFilter(self.bloom_bits, self.bloom_hashes)
+                self._last_rebuild = now
+            for session_id, score in entries:
+                self._bloom.add(session_id.decode())
+                self._cursor_ms = max(self._cursor_ms, int(score))
+
+    async def is_revoked(self, session_id: str) -> bool:
+        await self._sync()
+        if session_id not in self._bloom:
+            self.bloom_negatives += 1
+            return False
+        self.bloom_positives += 1
+        try:
+            revoked = await get_redis().zscore(REVOKED_KEY, session_id) is not None
+        except Exception as e:
+            # Positif du filtre et Redis indisponible : on refuse par prudence
+            self.redis_errors += 1
+            print(f"Session revocation check error: {e}")
+            return True
+        if revoked:
+            self.confirmed_revoked += 1
+        return revoked
+
+    def stats(self) -> dict:
+        return {
+            "bloom_bits": self.bloom_bits,
+            "bloom_hashes": self.bloom_hashes,
+            "bloom_negatives": self.bloom_negatives,
+            "bloom_positives": self.bloom_positives,
+            "confirmed_revoked": self.confirmed_revoked,
+            "false_positives": self.bloom_positives - self.confirmed_revoked,
+            "redis_errors": self.redis_errors,
+        }
+
+
+session_registry = SessionRegistry(
+    refresh_ttl=settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400,
+    access_ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    sync_interval=settings.SESSION_REVOCATION_SYNC_SECONDS,
+    bloom_bits=settings.SESSION_BLOOM_BITS,
+    bloom_hashes=settings.SESSION_BLOOM_HASHES,
+)
@@ -0,0 +1,68 @@
+"""
+Cache en mémoire (par worker) de la ligne `system_settings`.
+
+Les chemins chauds (limitation des connexions, etc.) lisent les paramètres
+système ici plutôt que de requêter la table à chaque appel. Le cache est
+invalidé par les routes qui modifient les paramètres ; le TTL borne le délai
+de propagation vers les autres workers.
+"""
+import threading
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.settings import SystemSettings
+
+
+def _defaults() -> SimpleNamespace:
+    values = {}
+    for column in SystemSettings.__table__.columns:
+        default = column.default
+        values[column.name] = default.arg if default is not None and default.is_scalar else None
+    return SimpleNamespace(**values)
+
+
+class SystemSettingsCache:
+    """Snapshot détaché de la session, rafraîchi après expiration du TTL"""
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot: Optional[SimpleNamespace] = None
+        self._expires_at = 0.0
+
+    def peek(self) -> Optional[SimpleNamespace]:
+        """Snapshot courant s'il est encore valide, sans accès à la base"""
+        if self._snapshot is not None and time.monotonic() < self._expires_at:
+            return self._snapshot
+        return None
+
+    async def get(self, db: AsyncSession) -> SimpleNamespace:
+        snapshot = self.peek()
+        if snapshot is not None:
+            return snapshot
+
+        row = (await db.execute(select(SystemSettings).limit(1))).scalars().first()
+        if row is None:
+            snapshot = _defaults()
+        else:
+            snapshot = SimpleNamespace(**{
+                column.name: getattr(row, column.name)
+                for column in SystemSettings.__table__.columns
+            })
+        with self._lock:
+            self._snapshot = snapshot
+            self._expires_at = time.monotonic() + self.ttl
+        return snapshot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+            self._expires_at = 0.0
+
+
+system_settings_cache = SystemSettingsCache(ttl=settings.SYSTEM_SETTINGS_CACHE_TTL_SECONDS)
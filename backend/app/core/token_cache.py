@@ -0,0 +1,95 @@
+"""
+Cache des tokens JWT déjà validés.
+
+Une session SPA réutilise le même bearer token des milliers de fois : plutôt
+que de revérifier la signature HMAC et de re-parser le JSON à chaque requête,
+on garde les claims décodées, indexées par une empreinte du token, jusqu'à
+son `exp`. Les entrées expirées sont rejetées paresseusement à la lecture.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core.config import settings
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+
+class TokenCache:
+    """LRU borné de claims validées, avec statistiques d'éviction"""
+
+    def __init__(self, max_entries: int, enabled: bool = True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        key = token_digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        if not self.enabled:
+            return
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+        key = token_digest(token)
+        with self._lock:
+            self._entries[key] = (float(expires_at), claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def set_enabled(self, enabled: bool) -> None:
+        """Interrupteur d'arrêt : vide le cache à la désactivation"""
+        self.enabled = enabled
+        if not enabled:
+            self.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
+
+
+token_cache = TokenCache(
+    max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+    enabled=settings.TOKEN_CACHE_ENABLED,
+)
@@ -1,25 +1,59 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
-from app.core.database import get_db, engine, Base
+from app.core.database import get_db, async_engine, replica_engine, Base
 from app.api.v1 import api_router
-from app.api.middleware.audit import audit_middleware
-import redis
+from app.api.middleware.audit import AuditMiddleware
+from app.core.redis import get_redis, close_redis
+from app.core.hashing import bcrypt_pool
+from app.core.audit_routes import audit_routes
+from app.core.audit_stream import audit_stream
+from app.core.audit_writer import audit_writer
+from app.core.last_login import last_login_buffer
+from app.core.query_stats import QueryStatsMiddleware
 
-# Import models to create tables
+# Import models (metadata complète pour create_all en développement)
 from app.models.user import User, Role, Permission  # noqa
-from app.models.audit import AuditLog  # noqa
+from app.models.audit import AuditLog, AuditRollup  # noqa
 from app.models.settings import SystemSettings  # noqa
 
-# Create tables (temporaire, on utilisera Alembic plus tard)
-Base.metadata.create_all(bind=engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Démarrage sans accès base : le schéma appartient à Alembic (start.sh) et
+    le pool ouvre ses connexions à la première requête. Seul l'environnement
+    de développement crée les tables manquantes.
+    """
+    if settings.ENVIRONMENT == "development":
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    # Table (méthode, route) -> action d'audit, compilée une fois
+    audit_routes.build(app.routes)
+    last_login_buffer.start()
+    audit_writer.start()
+    yield
+    # Vider les last_login en attente avant de fermer Redis
+    await last_login_buffer.stop()
+    # Vider la file d'audit avant de fermer le moteur
+    await audit_writer.stop()
+    await audit_stream.stop()
+    bcrypt_pool.shutdown()
+    await close_redis()
+    await async_engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_PREFIX}/openapi.json",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # CORS - DOIT ÊTRE LE PREMIER MIDDLEWARE
@@ -33,18 +67,15 @@ app.add_middleware(
 )
 
 # Audit logging middleware - APRÈS CORS
-app.middleware("http")(audit_middleware)
+app.add_middleware(AuditMiddleware)
+
+# Instrumentation SQL : en dernier (le plus externe) pour couvrir toute la requête
+if settings.SQL_INSTRUMENTATION_ENABLED:
+    app.add_middleware(QueryStatsMiddleware)
 
 # Include API routes
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
-# Debug: afficher toutes les routes enregistrées
-print("\n🔍 Routes enregistrées:")
-for route in app.routes:
-    if hasattr(route, 'methods') and hasattr(route, 'path'):
-        print(f"  {list(route.methods)} {route.path}")
-print()
-
 
 # Routes de base
 @app.get("/")
@@ -58,16 +89,15 @@ async def root():
 
 
 @app.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(get_db)):
     """Health check endpoint pour Railway"""
     try:
         # Test database connection
         from sqlalchemy import text
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         
         # Test Redis connection
-        r = redis.from_url(settings.REDIS_URL)
-        r.ping()
+        await get_redis().ping()
         
         return {
             "status": "healthy",
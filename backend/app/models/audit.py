@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, DateTime, Text, Enum as SQLEnum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, Integer, Index, DDL, event, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from datetime import datetime, timezone
 import uuid
 import enum
@@ -40,11 +40,25 @@ class ActionType(str, enum.Enum):
 class AuditLog(Base):
     """Modèle pour l'audit trail"""
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        # Clés de pagination (keyset) : liste complète et liste filtrée par action
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+        Index("ix_audit_logs_action_created_at_id", "action", "created_at", "id"),
+        # Recherche (app/services/audit_search.py)
+        Index("ix_audit_logs_user_email_trgm", "user_email", postgresql_using="gin", postgresql_ops={"user_email": "gin_trgm_ops"}),
+        Index("ix_audit_logs_user_name_trgm", "user_name", postgresql_using="gin", postgresql_ops={"user_name": "gin_trgm_ops"}),
+        Index("ix_audit_logs_details", "details", postgresql_using="gin"),
+        Index("ix_audit_logs_target_id", "target_id"),
+        Index("ix_audit_logs_ip_address", "ip_address"),
+        # Partitions mensuelles (PostgreSQL) : voir app/services/audit_partitions.py
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
+    # La clé de partitionnement fait partie de la clé primaire
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
     # Action info
-    action = Column(SQLEnum(ActionType), nullable=False, index=True)
+    action = Column(SQLEnum(ActionType), nullable=False)
     description = Column(String(500), nullable=False)
     
     # User info (qui a fait l'action)
@@ -60,10 +74,40 @@ class AuditLog(Base):
     # Metadata
     ip_address = Column(String(50), nullable=True)
     user_agent = Column(String(500), nullable=True)
-    details = Column(Text, nullable=True)  # JSON string with additional details
+    details = Column(JSONB, nullable=True)  # Additional details (GIN index)
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), primary_key=True, default=lambda: datetime.now(timezone.utc), nullable=False)
 
     def __repr__(self):
         return f"<AuditLog {self.action} by {self.user_email} at {self.created_at}>"
+
+
+class AuditRollup(Base):
+    """Compteurs horaires des logs d'audit, tenus à jour à chaque écriture (statistiques)"""
+    __tablename__ = "audit_rollups"
+
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # début de l'heure (UTC)
+    action = Column(SQLEnum(ActionType), primary_key=True)
+    # '' plutôt que NULL : la clé primaire sert de cible à l'upsert
+    user_email = Column(String(255), primary_key=True, default="")
+    target_type = Column(String(50), primary_key=True, default="")
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<AuditRollup {self.bucket} {self.action} {self.user_email}: {self.count}>"
+
+
+# Tables créées par create_all (développement) : extension des index
+# trigrammes, puis une partition par défaut qui reçoit les lignes tant que la
+# maintenance n'a pas créé les mois
+event.listen(
+    AuditLog.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+event.listen(
+    AuditLog.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS audit_logs_default PARTITION OF audit_logs DEFAULT").execute_if(dialect="postgresql"),
+)
@@ -39,6 +39,7 @@ class SystemSettings(Base):
     
     # Paramètres de fonctionnalités
     enable_audit_log = Column(Boolean, default=True)
+    audit_retention_days = Column(Integer, default=0)  # 0 = conservation illimitée
     enable_email_notifications = Column(Boolean, default=True)
     enable_user_registration = Column(Boolean, default=False)
     enable_password_reset = Column(Boolean, default=True)
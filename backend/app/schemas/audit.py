@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Optional
 from uuid import UUID
 
 
@@ -15,7 +15,7 @@ class AuditLogBase(BaseModel):
     target_name: Optional[str] = None
     ip_address: Optional[str] = None
     user_agent: Optional[str] = None
-    details: Optional[str] = None
+    details: Optional[Dict[str, Any]] = None
 
 
 class AuditLogCreate(AuditLogBase):
@@ -35,6 +35,7 @@ class SystemSettingsBase(BaseModel):
     
     # Fonctionnalités
     enable_audit_log: Optional[bool] = None
+    audit_retention_days: Optional[int] = Field(None, ge=0, le=3650)
     enable_email_notifications: Optional[bool] = None
     enable_user_registration: Optional[bool] = None
     enable_password_reset: Optional[bool] = None
@@ -99,9 +99,20 @@ class PermissionResponse(PermissionBase):
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
     user: UserResponse
 
 
+class AccessToken(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
 class TokenPayload(BaseModel):
     sub: str
     exp: int
@@ -132,3 +143,18 @@ class ChangePasswordRequest(BaseModel):
 # Assign Roles Schema
 class AssignRolesRequest(BaseModel):
     role_ids: List[str]
+
+
+# Session Schemas
+class SessionResponse(BaseModel):
+    id: str
+    created_at: datetime
+    last_used_at: datetime
+    expires_at: datetime
+    ip_address: Optional[str] = None
+    user_agent: Optional[str] = None
+    current: bool = False
+
+
+class RevokeSessionsRequest(BaseModel):
+    session_ids: Optional[List[str]] = None  # None = toutes les sessions
@@ -0,0 +1,342 @@
+"""
+Stockage à froid des logs d'audit (Parquet, disque local ou objet).
+
+Les partitions expirées, détachées dans le schéma audit_archive par la
+maintenance (app/services/audit_partitions.py), sont écrites en fichiers
+Parquet compressés (zstd) sous AUDIT_COLD_STORAGE_URI, rangés par mois et
+par action :
+
+    <racine>/month=2024-03/action=user.update/audit_logs_y2024m03.parquet
+
+puis supprimées de PostgreSQL. La racine est un chemin local ou toute URI
+comprise par pyarrow (s3://bucket/prefixe, identifiants AWS de
+l'environnement).
+
+Fédération : quand la fenêtre d'une requête (`days`, `start_date`) remonte
+avant la fin du dernier mois archivé, la liste lit aussi ces fichiers. Les
+filtres sont poussés dans le scan pyarrow : élagage des répertoires
+month/action et statistiques des row groups (created_at, égalités) ; seuls
+les fichiers concernés sont ouverts. Le tri et la sélection des `limit`
+plus récents restent dans Arrow ; seules les lignes retenues deviennent des
+objets Python. Les statistiques, elles, viennent des rollups horaires,
+conservés à l'archivage.
+
+pyarrow est importé à la demande : il ne pèse pas sur le démarrage des workers.
+"""
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.models.audit import AuditLog, ActionType
+from app.services.audit_partitions import ARCHIVE_SCHEMA, add_months
+from app.services.audit_search import AuditLogFilters
+
+# Colonnes des fichiers ; month et action sont dans le chemin (partitionnement hive)
+FILE_COLUMNS = [column.name for column in AuditLog.__table__.columns if column.name != "action"]
+WRITE_BATCH_SIZE = 10000
+# Lignes triées relues à la fois quand un filtre details reste à vérifier en Python
+DETAILS_SCAN_ROWS = 1000
+SORT_KEYS = [("created_at", "descending"), ("id", "descending")]
+
+
+def _utc(moment: datetime) -> datetime:
+    # Les horodatages naïfs sont en UTC (comme created_at)
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment.astimezone(timezone.utc)
+
+
+def _month_key(moment: datetime) -> str:
+    moment = _utc(moment)
+    return f"{moment.year}-{moment.month:02d}"
+
+
+def _action_value(action) -> str:
+    if isinstance(action, ActionType):
+        return action.value
+    # SQLEnum stocke le nom du membre
+    return ActionType[action].value if action in ActionType.__members__ else action
+
+
+class AuditColdStore:
+    """Fichiers Parquet des mois archivés : écriture (maintenance) et lecture (API)"""
+
+    def __init__(self, uri: str, cache_seconds: float):
+        self.uri = uri.rstrip("/")
+        self.enabled = bool(uri)
+        self.cache_seconds = cache_seconds
+        self._months: List[str] = []
+        self._listed_at: Optional[float] = None
+
+    def _filesystem(self):
+        from pyarrow import fs
+        return fs.FileSystem.from_uri(self.uri)
+
+    def _schema(self):
+        import pyarrow as pa
+        return pa.schema([
+            (name, pa.timestamp("us", tz="UTC") if name == "created_at" else pa.string()) for name in FILE_COLUMNS
+        ])
+
+    def _dataset(self):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        filesystem, root = self._filesystem()
+        return ds.dataset(
+            root,
+            filesystem=filesystem,
+            format="parquet",
+            schema=self._schema().append(pa.field("month", pa.string())).append(pa.field("action", pa.string())),
+            partitioning=ds.partitioning(pa.schema([("month", pa.string()), ("action", pa.string())]), flavor="hive"),
+        )
+
+    # --- Mois disponibles -------------------------------------------------------
+
+    def months(self) -> List[str]:
+        """Mois archivés ("YYYY-MM"), relus au plus toutes les cache_seconds"""
+        if not self.enabled:
+            return []
+        if self._listed_at is not None and time.monotonic() - self._listed_at < self.cache_seconds:
+            return self._months
+        from pyarrow import fs
+        filesystem, root = self._filesystem()
+        try:
+            infos = filesystem.get_file_info(fs.FileSelector(root, allow_not_found=True))
+        except Exception as e:
+            print(f"Audit cold storage listing error: {e}")
+            infos = []
+        self._months = sorted(
+            info.base_name.split("=", 1)[1]
+            for info in infos
+            if info.type == fs.FileType.Directory and info.base_name.startswith("month=")
+        )
+        self._listed_at = time.monotonic()
+        return self._months
+
+    def horizon(self) -> Optional[datetime]:
+        """Fin du dernier mois archivé (les données plus récentes sont en base)"""
+        months = self.months()
+        if not months:
+            return None
+        year, month = map(int, months[-1].split("-"))
+        return add_months(datetime(year, month, 1, tzinfo=timezone.utc), 1)
+
+    def covers(self, window_start: Optional[datetime]) -> bool:
+        horizon = self.horizon()
+        return horizon is not None and (window_start is None or window_start < horizon)
+
+    # --- Archivage (maintenance, synchrone) -------------------------------------
+
+    def archived_tables(self, conn: Connection) -> List[str]:
+        return conn.execute(text(
+            "SELECT tablename FROM pg_tables WHERE schemaname = :schema AND tablename LIKE 'audit_logs%' ORDER BY tablename"
+        ), {"schema": ARCHIVE_SCHEMA}).scalars().all()
+
+    def store_table(self, conn: Connection, table: str) -> int:
+        """Écrire une table archivée en Parquet (un fichier par mois et action) ; retourne le nombre de lignes"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        filesystem, root = self._filesystem()
+        schema = self._schema()
+        columns = ", ".join(["action", *FILE_COLUMNS])
+        # Tri par (mois, action) : un seul fichier ouvert à la fois
+        result = conn.execution_options(stream_results=True, yield_per=WRITE_BATCH_SIZE).execute(text(
+            f"SELECT {columns} FROM {ARCHIVE_SCHEMA}.{table} "
+            f"ORDER BY date_trunc('month', created_at AT TIME ZONE 'UTC'), action, created_at, id"
+        ))
+        written, current, pending = 0, None, []
+        writer = stream = None
+
+        def flush():
+            if pending:
+                writer.write_table(pa.Table.from_pylist(pending, schema=schema))
+                pending.clear()
+
+        def close():
+            # Le flux doit être fermé lui aussi : c'est là que l'objet est envoyé (S3)
+            if writer is not None:
+                writer.close()
+                stream.close()
+
+        try:
+            for row in result:
+                key = (_month_key(row.created_at), _action_value(row.action))
+                if key != current:
+                    flush()
+                    close()
+                    current = key
+                    directory = f"{root}/month={key[0]}/action={key[1]}"
+                    filesystem.create_dir(directory)
+                    stream = filesystem.open_output_stream(f"{directory}/{table}.parquet")
+                    writer = pq.ParquetWriter(stream, schema, compression="zstd")
+                pending.append({
+                    name: (
+                        value if name == "created_at" or value is None
+                        else json.dumps(value, ensure_ascii=False) if isinstance(value, dict)
+                        else str(value)
+                    )
+                    for name, value in zip(FILE_COLUMNS, row[1:])
+                })
+                written += 1
+                if len(pending) >= WRITE_BATCH_SIZE:
+                    flush()
+            flush()
+        finally:
+            close()
+        self._listed_at = None
+        return written
+
+    def drop_table(self, conn: Connection, table: str, expected: int) -> None:
+        """Supprimer la table archivée, si tout a bien été écrit"""
+        count = conn.scalar(text(f"SELECT count(*) FROM {ARCHIVE_SCHEMA}.{table}"))
+        if count != expected:
+            raise RuntimeError(f"{table}: {count} lignes en base, {expected} écrites")
+        conn.execute(text(f"DROP TABLE {ARCHIVE_SCHEMA}.{table}"))
+
+    # --- Lecture (API, synchrone : à appeler via asyncio.to_thread) --------------
+
+    def _expression(self, filters: AuditLogFilters, start: Optional[datetime], end: Optional[datetime]):
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        conditions = []
+        if start is not None:
+            conditions += [ds.field("month") >= _month_key(start), ds.field("created_at") >= start]
+        if end is not None:
+            conditions += [ds.field("month") <= _month_key(end), ds.field("created_at") < end]
+        if filters.action:
+            conditions.append(ds.field("action") == _action_value(filters._action()))
+        for name in ("user_email", "user_name"):
+            if getattr(filters, name):
+                conditions.append(pc.match_substring(ds.field(name), pattern=getattr(filters, name), ignore_case=True))
+        for name in ("target_type", "target_id", "ip_address"):
+            if getattr(filters, name):
+                conditions.append(ds.field(name) == getattr(filters, name))
+        # details est écrit par json.dumps : présélection par sous-chaîne, vérifiée ensuite
+        for key in {*filters.details_key, *filters.details}:
+            conditions.append(pc.match_substring(ds.field("details"), pattern=json.dumps(key, ensure_ascii=False) + ":"))
+        for key, value in filters.details.items():
+            # Flottants exclus : 1.0 et 1 sont égaux mais ne s'écrivent pas pareil
+            if not isinstance(value, (dict, list, float)):
+                pattern = f"{json.dumps(key, ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False)}"
+                conditions.append(pc.match_substring(ds.field("details"), pattern=pattern))
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    @staticmethod
+    def _details_match(filters: AuditLogFilters, raw: Optional[str]) -> bool:
+        # Filtres JSON : évalués après lecture (pas de pushdown possible sur une chaîne)
+        if not filters.details_key and not filters.details:
+            return True
+        details = json.loads(raw) if raw else {}
+        return all(key in details for key in filters.details_key) and all(
+            details.get(key) == value for key, value in filters.details.items()
+        )
+
+    @staticmethod
+    def _before(table, before: Tuple[datetime, str]):
+        """Masque du curseur : (created_at, id) < before"""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        moment = pa.scalar(before[0], type=table.schema.field("created_at").type)
+        return pc.or_(
+            pc.less(table["created_at"], moment),
+            pc.and_(pc.equal(table["created_at"], moment), pc.less(table["id"], before[1])),
+        )
+
+    def _newest(self, table, filters: AuditLogFilters, count: int, details_filtered: bool) -> List[tuple]:
+        """Clés (created_at, id, month) des `count` lignes les plus récentes d'un mois"""
+        import pyarrow.compute as pc
+
+        if not table.num_rows or count <= 0:
+            return []
+        if not details_filtered:
+            top = table.take(pc.select_k_unstable(table, k=min(count, table.num_rows), sort_keys=SORT_KEYS))
+            return [(row["created_at"], row["id"], row["month"]) for row in top.to_pylist()]
+        # Ordre calculé dans Arrow ; details n'est décodé que tranche par tranche
+        order = pc.sort_indices(table, sort_keys=SORT_KEYS)
+        keys = []
+        for offset in range(0, len(order), max(count, DETAILS_SCAN_ROWS)):
+            window = table.take(order[offset:offset + max(count, DETAILS_SCAN_ROWS)])
+            for row in window.to_pylist():
+                if self._details_match(filters, row["details"]):
+                    keys.append((row["created_at"], row["id"], row["month"]))
+                    if len(keys) >= count:
+                        return keys
+        return keys
+
+    def list(self, filters: AuditLogFilters, limit: int, before: Optional[Tuple[datetime, str]] = None) -> List[dict]:
+        """Les `limit` logs archivés les plus récents qui passent les filtres (avant le curseur `before`)"""
+        import pyarrow.dataset as ds
+
+        start, end = (_utc(bound) if bound else None for bound in filters.window())
+        expression = self._expression(filters, start, end)
+        if before is not None:
+            before = (_utc(before[0]), str(before[1]))
+            # Curseur : created_at <= c poussé dans le scan, départage sur id ensuite
+            bound = (ds.field("created_at") <= before[0]) & (ds.field("month") <= _month_key(before[0]))
+            expression = bound if expression is None else expression & bound
+            end = before[0] if end is None else min(end, before[0])
+        dataset = self._dataset()
+        months = [
+            month for month in reversed(self.months())
+            if (start is None or month >= _month_key(start)) and (end is None or month <= _month_key(end))
+        ]
+
+        # 1er passage : clés de tri seulement, mois par mois du plus récent au plus ancien
+        details_filtered = bool(filters.details_key or filters.details)
+        key_columns = ["created_at", "id", "month"] + (["details"] if details_filtered else [])
+        picked: List[tuple] = []
+        for month in months:
+            month_filter = ds.field("month") == month
+            table = dataset.to_table(
+                columns=key_columns,
+                filter=month_filter if expression is None else expression & month_filter,
+            )
+            if before is not None:
+                table = table.filter(self._before(table, before))
+            picked.extend(self._newest(table, filters, limit - len(picked), details_filtered))
+            if len(picked) >= limit:
+                break
+        if not picked:
+            return []
+
+        # 2e passage : lignes complètes des seules clés retenues
+        ids = [key[1] for key in picked]
+        table = dataset.to_table(filter=ds.field("id").isin(ids) & ds.field("month").isin({key[2] for key in picked}))
+        logs = []
+        for row in table.to_pylist():
+            row.pop("month")
+            row["details"] = json.loads(row["details"]) if row["details"] else None
+            logs.append(row)
+        return sorted(logs, key=lambda log: (log["created_at"], log["id"]), reverse=True)
+
+    def counts(self, start: datetime, end: datetime) -> Dict[Tuple[str, str], int]:
+        """Nombre de logs archivés par (action, user_email) sur [start, end)"""
+        if not self.covers(start):
+            return {}
+        import pyarrow.dataset as ds
+
+        start, end = _utc(start), _utc(end)
+        expression = (
+            (ds.field("month") >= _month_key(start)) & (ds.field("month") <= _month_key(end))
+            & (ds.field("created_at") >= start) & (ds.field("created_at") < end)
+        )
+        table = self._dataset().to_table(columns=["action", "user_email"], filter=expression)
+        if not table.num_rows:
+            return {}
+        grouped = table.group_by(["action", "user_email"]).aggregate([([], "count_all")])
+        return {
+            (row["action"], row["user_email"] or ""): row["count_all"]
+            for row in grouped.to_pylist()
+        }
+
+
+audit_cold_store = AuditColdStore(settings.AUDIT_COLD_STORAGE_URI, settings.AUDIT_COLD_STORAGE_CACHE_SECONDS)
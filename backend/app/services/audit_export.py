@@ -0,0 +1,144 @@
+"""
+Export en flux des logs d'audit (CSV, NDJSON, Parquet), gzip optionnel.
+
+Les lignes sont lues par un curseur côté serveur (`AsyncSession.stream`,
+AUDIT_EXPORT_BATCH_SIZE lignes à la fois) en colonnes brutes, sans objets
+ORM ni schémas Pydantic, et chaque lot est encodé puis envoyé avant de lire
+le suivant : la mémoire ne dépend que de la taille d'un lot, pas du volume
+exporté. En Parquet, un lot = un row group.
+
+La session est ouverte par le générateur lui-même : celle de `Depends` est
+fermée avant l'envoi du corps de la réponse. L'export lit sur le réplica
+quand il y en a un.
+"""
+import csv
+import enum
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, List
+
+from sqlalchemy import Select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, ReplicaSessionLocal
+from app.models.audit import AuditLog
+
+COLUMNS = [column for column in AuditLog.__table__.columns]
+FIELDNAMES = [column.name for column in COLUMNS]
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def export_query(query: Select) -> Select:
+    """Colonnes brutes, dans l'ordre chronologique (index ix_audit_logs_created_at_id)"""
+    return query.with_only_columns(*COLUMNS).order_by(AuditLog.created_at, AuditLog.id)
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, enum.Enum):
+        return value.value
+    return None if value is None else str(value)
+
+
+async def _batches(query: Select) -> AsyncIterator[list]:
+    session_factory = ReplicaSessionLocal or AsyncSessionLocal
+    async with session_factory() as db:
+        result = await db.stream(query.execution_options(yield_per=settings.AUDIT_EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield rows
+
+
+async def _csv(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDNAMES)
+    async for rows in batches:
+        writer.writerows([_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def _ndjson(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield "".join(
+            json.dumps({name: _value(value) for name, value in zip(FIELDNAMES, row)}, ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode()
+
+
+class _Sink(io.RawIOBase):
+    """Fichier en écriture seule dont on retire le contenu au fil de l'eau"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+async def _parquet(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    # Import tardif : pyarrow n'est chargé que par les exports Parquet
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # created_at reste un horodatage ; details est le JSON sérialisé
+    schema = pa.schema([
+        (name, pa.timestamp("us", tz="UTC") if name == "created_at" else pa.string()) for name in FIELDNAMES
+    ])
+    sink = _Sink()
+    with pq.ParquetWriter(sink, schema, compression="snappy") as writer:
+        async for rows in batches:
+            writer.write_table(pa.Table.from_pylist(
+                [
+                    {name: value if name == "created_at" else _value(value) for name, value in zip(FIELDNAMES, row)}
+                    for row in rows
+                ],
+                schema=schema,
+            ))
+            yield sink.drain()
+    yield sink.drain()
+
+
+async def _gzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # en-tête et pied gzip
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(query: Select, export_format: str, gzip: bool = False) -> AsyncIterator[bytes]:
+    encoders = {"csv": _csv, "ndjson": _ndjson, "parquet": _parquet}
+    chunks = encoders[export_format](_batches(export_query(query)))
+    return _gzip(chunks) if gzip else chunks
+
+
+def export_filename(export_format: str, gzip: bool, now: datetime) -> str:
+    return f"audit-logs-{now:%Y%m%d-%H%M%S}.{EXPORT_FORMATS[export_format][1]}{'.gz' if gzip else ''}"
@@ -0,0 +1,129 @@
+"""
+Partitions mensuelles de audit_logs (PostgreSQL, RANGE sur created_at).
+
+- `ensure_partitions` crée à l'avance les mois à venir (audit_logs_yYYYYmMM),
+  pour que les insertions n'aboutissent jamais dans la partition par défaut ;
+- `archive_partitions` applique la rétention de SystemSettings : une
+  partition entièrement plus ancienne que `audit_retention_days` est
+  détachée puis déplacée dans le schéma `audit_archive`, sans DELETE ligne à
+  ligne. Elle y reste interrogeable jusqu'à son export ou sa suppression.
+
+Les requêtes filtrées sur created_at (`days`) n'examinent que les mois
+concernés (partition pruning).
+"""
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.engine import Connection
+
+from app.models.settings import SystemSettings
+
+PARENT = "audit_logs"
+ARCHIVE_SCHEMA = "audit_archive"
+# Un DETACH attend un verrou exclusif sur audit_logs : ne pas bloquer les écritures derrière lui
+LOCK_TIMEOUT = "5s"
+
+_BOUND = re.compile(r"FOR VALUES FROM \((.+)\) TO \((.+)\)")
+
+
+@dataclass
+class Partition:
+    name: str
+    lower: Optional[datetime]  # None : MINVALUE
+    upper: Optional[datetime]  # None : MAXVALUE
+    is_default: bool = False
+
+    def covers(self, moment: datetime) -> bool:
+        return (
+            not self.is_default
+            and (self.lower is None or self.lower <= moment)
+            and (self.upper is None or moment < self.upper)
+        )
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT}_y{month.year}m{month.month:02d}"
+
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    value = value.strip()
+    if value.upper() in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'")).astimezone(timezone.utc)
+
+
+def is_partitioned(conn: Connection) -> bool:
+    return bool(conn.scalar(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:parent))"
+    ), {"parent": PARENT}))
+
+
+def list_partitions(conn: Connection) -> List[Partition]:
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:parent) ORDER BY c.relname"
+    ), {"parent": PARENT}).all()
+    partitions = []
+    for name, bound in rows:
+        if bound == "DEFAULT":
+            partitions.append(Partition(name, None, None, is_default=True))
+            continue
+        match = _BOUND.match(bound)
+        if match:
+            partitions.append(Partition(name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+    return partitions
+
+
+def ensure_partitions(conn: Connection, months_ahead: int, now: Optional[datetime] = None, dry_run: bool = False) -> List[str]:
+    """Créer les partitions du mois courant et des `months_ahead` suivants"""
+    partitions = list_partitions(conn)
+    first = month_start(now or datetime.now(timezone.utc))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(first, offset)
+        if any(partition.covers(month) for partition in partitions):
+            continue
+        name = partition_name(month)
+        if not dry_run:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            ))
+        created.append(name)
+    return created
+
+
+def get_retention_days(conn: Connection) -> int:
+    return conn.scalar(select(SystemSettings.audit_retention_days).limit(1)) or 0
+
+
+def expired_partitions(partitions: List[Partition], retention_days: int, now: Optional[datetime] = None) -> List[Partition]:
+    """Partitions dont toutes les lignes sont antérieures à la limite de rétention"""
+    if retention_days <= 0:
+        return []
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=retention_days)
+    return [
+        partition for partition in partitions
+        if not partition.is_default and partition.upper is not None and partition.upper <= cutoff
+    ]
+
+
+def archive_partition(conn: Connection, partition: Partition) -> None:
+    """Détacher une partition et la ranger dans le schéma d'archive"""
+    conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+    conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+    conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {partition.name}"))
+    conn.execute(text(f"ALTER TABLE {partition.name} SET SCHEMA {ARCHIVE_SCHEMA}"))
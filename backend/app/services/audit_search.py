@@ -0,0 +1,110 @@
+"""
+Filtres de recherche des logs d'audit, partagés par la liste et l'export.
+
+Chaque filtre correspond à un index (migration 006) :
+- user_email, user_name : recherche de sous-chaîne, index trigrammes (GIN) ;
+- details_key, details : clés / paires clé=valeur de `details` (JSONB, GIN) ;
+- target_id, ip_address : égalité, B-tree ;
+- action, start_date, end_date, days : index (action, created_at, id) et
+  (created_at, id), avec élagage des partitions mensuelles.
+
+Vérification des plans : python -m scripts.check_audit_indexes
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import Select
+
+from app.models.audit import AuditLog, ActionType
+
+
+def _invalid_details_filter() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Ïñvæ¡ïð ðëţæï¡š fï¡ţër (ëxþëçţëð këý=væ¡µë)Ấğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
+    )
+
+
+class AuditLogFilters:
+    """Paramètres de filtre (dépendance FastAPI : `filters: AuditLogFilters = Depends()`)"""
+
+    def __init__(
+        self,
+        action: Optional[str] = Query(None, description="Filter by action type"),
+        user_email: Optional[str] = Query(None, description="Filter by user email (substring)"),
+        user_name: Optional[str] = Query(None, description="Filter by user name (substring)"),
+        target_type: Optional[str] = Query(None, description="Filter by target type"),
+        target_id: Optional[str] = Query(None, description="Filter by target id"),
+        ip_address: Optional[str] = Query(None, description="Filter by client IP address"),
+        details_key: Optional[List[str]] = Query(None, description="Keys that must be present in details"),
+        details: Optional[List[str]] = Query(None, description="key=value pairs contained in details (JSON values accepted)"),
+        start_date: Optional[datetime] = Query(None, description="Created at or after (ISO 8601)"),
+        end_date: Optional[datetime] = Query(None, description="Created before (ISO 8601)"),
+        days: Optional[int] = Query(None, description="Filter by last N days"),
+    ):
+        self.action = action
+        self.user_email = user_email
+        self.user_name = user_name
+        self.target_type = target_type
+        self.target_id = target_id
+        self.ip_address = ip_address
+        self.details_key = details_key or []
+        self.details = self._parse_details(details or [])
+        self.start_date = start_date
+        self.end_date = end_date
+        self.days = days
+
+    @staticmethod
+    def _parse_details(pairs: List[str]) -> dict:
+        contained = {}
+        for pair in pairs:
+            key, separator, value = pair.partition("=")
+            if not separator or not key:
+                raise _invalid_details_filter()
+            try:
+                contained[key] = json.loads(value)
+            except ValueError:
+                contained[key] = value
+        return contained
+
+    def _action(self):
+        # Valeur ("user.update", liste /audit/actions) ou nom du membre
+        try:
+            return ActionType(self.action)
+        except ValueError:
+            return self.action
+
+    def window(self) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """Bornes [début, fin) de created_at imposées par days / start_date / end_date"""
+        starts = [bound for bound in (
+            datetime.now(timezone.utc) - timedelta(days=self.days) if self.days else None,
+            self.start_date,
+        ) if bound is not None]
+        return (max(starts) if starts else None), self.end_date
+
+    def apply(self, query: Select) -> Select:
+        if self.action:
+            query = query.where(AuditLog.action == self._action())
+        if self.user_email:
+            query = query.where(AuditLog.user_email.ilike(f"%{self.user_email}%"))
+        if self.user_name:
+            query = query.where(AuditLog.user_name.ilike(f"%{self.user_name}%"))
+        if self.target_type:
+            query = query.where(AuditLog.target_type == self.target_type)
+        if self.target_id:
+            query = query.where(AuditLog.target_id == self.target_id)
+        if self.ip_address:
+            query = query.where(AuditLog.ip_address == self.ip_address)
+        for key in self.details_key:
+            query = query.where(AuditLog.details.has_key(key))
+        if self.details:
+            query = query.where(AuditLog.details.contains(self.details))
+        if self.days:
+            query = query.where(AuditLog.created_at >= datetime.now(timezone.utc) - timedelta(days=self.days))
+        if self.start_date:
+            query = query.where(AuditLog.created_at >= self.start_date)
+        if self.end_date:
+            query = query.where(AuditLog.created_at < self.end_date)
+        return query
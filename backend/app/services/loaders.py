@@ -0,0 +1,21 @@
+"""
+Profils de chargement nommés pour la sérialisation.
+
+Chaque profil est un tuple d'options à passer à `.options(*PROFILE)` : une
+route charge exactement ce que son schéma de réponse sérialise, en un nombre
+de SELECT constant quel que soit le nombre de lignes (selectinload : un
+`IN (...)` par niveau de relation, sans dupliquer les lignes parentes comme
+le ferait un joinedload sur une collection paginée).
+"""
+from sqlalchemy.orm import selectinload
+
+from app.models.user import User, Role
+
+# Noms des rôles seulement (tableau de bord)
+USER_WITH_ROLES = (selectinload(User.roles),)
+
+# UserResponse complet, authentification et émission des tokens
+USER_WITH_ROLES_AND_PERMISSIONS = (selectinload(User.roles).selectinload(Role.permissions),)
+
+# RoleResponse
+ROLE_WITH_PERMISSIONS = (selectinload(Role.permissions),)
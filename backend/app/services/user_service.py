@@ -1,110 +1,130 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 from app.models.user import User, Role
+from app.services.loaders import USER_WITH_ROLES_AND_PERMISSIONS
 from app.schemas.user import UserCreate, UserUpdate
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash_async, verify_password_async
+from app.core.auth_cache import principal_cache
+from app.core.authz import authz_versions
+from app.core.sessions import session_registry
 from typing import Optional
 from uuid import UUID
 
+# Champs du profil recopiés dans les claims du token sans état (email, name)
+TOKEN_CLAIM_FIELDS = frozenset({"email", "first_name", "last_name"})
 
 class UserService:
     @staticmethod
-    def get_by_email(db: Session, email: str) -> Optional[User]:
+    async def _first(db: AsyncSession, *criteria, refresh: bool = False) -> Optional[User]:
+        query = select(User).options(*USER_WITH_ROLES_AND_PERMISSIONS).where(*criteria)
+        if refresh:
+            query = query.execution_options(populate_existing=True)
+        return (await db.execute(query)).scalars().first()
+
+    @staticmethod
+    async def get_by_email(db: AsyncSession, email: str) -> Optional[User]:
         """Récupérer un utilisateur par email"""
-        return db.query(User).filter(User.email == email).first()
+        return await UserService._first(db, User.email == email)
 
     @staticmethod
-    def get_by_username(db: Session, username: str) -> Optional[User]:
+    async def get_by_username(db: AsyncSession, username: str) -> Optional[User]:
         """Récupérer un utilisateur par username"""
-        return db.query(User).filter(User.username == username).first()
+        return await UserService._first(db, User.username == username)
 
     @staticmethod
-    def get_by_id(db: Session, user_id: UUID) -> Optional[User]:
-        """Récupérer un utilisateur par ID"""
-        return db.query(User).filter(User.id == user_id).first()
+    async def get_by_id(db: AsyncSession, user_id: UUID, refresh: bool = False) -> Optional[User]:
+        """Récupérer un utilisateur par ID (refresh : recharger après un commit)"""
+        return await UserService._first(db, User.id == user_id, refresh=refresh)
 
     @staticmethod
-    def create(db: Session, user_in: UserCreate) -> User:
-        """Créer un nouvel utilisateur"""
+    async def get_or_404(db: AsyncSession, user_id: UUID) -> User:
+        db_user = await UserService.get_by_id(db, user_id)
+        if not db_user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="µšër ñøt føµñðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
+            )
+        return db_user
+
+    @staticmethod
+    async def create(db: AsyncSession, user_in: UserCreate) -> User:
+        """Créer un nouvel utilisateur (hachage dans le pool bcrypt)"""
+        # Vérifier l'unicité avant de payer le coût de bcrypt
         # Vérifier si l'email existe déjà
-        if UserService.get_by_email(db, user_in.email):
+        if await db.scalar(select(User.id).where(User.email == user_in.email)):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Èmæï¡ æ¡ræðý rëĝïštërëðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
             )
         
         # Vérifier si le username existe déjà
-        if UserService.get_by_username(db, user_in.username):
+        if await db.scalar(select(User.id).where(User.username == user_in.username)):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="µšërñæmë æ¡ræðý rëĝïštërëðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
             )
         
+        hashed_password = await get_password_hash_async(user_in.password)
+        
         # Créer l'utilisateur
         db_user = User(
             email=user_in.email,
             username=user_in.username,
-            hashed_password=get_password_hash(user_in.password),
+            hashed_password=hashed_password,
             first_name=user_in.first_name,
             last_name=user_in.last_name,
             phone=user_in.phone
         )
         
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
-        
         # Assigner le rôle par défaut (Viewer)
-        default_role = db.query(Role).filter(Role.name == "Viewer").first()
+        default_role = (await db.execute(select(Role).where(Role.name == "Viewer"))).scalars().first()
         if default_role:
             db_user.roles.append(default_role)
-            db.commit()
-            db.refresh(db_user)
         
-        return db_user
+        db.add(db_user)
+        await db.commit()
+        return await UserService.get_by_id(db, db_user.id, refresh=True)
 
     @staticmethod
-    def authenticate(db: Session, email: str, password: str) -> Optional[User]:
+    async def authenticate(db: AsyncSession, email: str, password: str) -> Optional[User]:
         """Authentifier un utilisateur"""
-        user = UserService.get_by_email(db, email)
+        user = await UserService.get_by_email(db, email)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        if not await verify_password_async(password, user.hashed_password):
             return None
         if not user.is_active:
             return None
         return user
 
     @staticmethod
-    def update(db: Session, user_id: UUID, user_in: UserUpdate) -> User:
+    async def update(db: AsyncSession, user_id: UUID, user_in: UserUpdate) -> User:
         """Mettre à jour un utilisateur"""
-        db_user = UserService.get_by_id(db, user_id)
-        if not db_user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="µšër ñøt føµñðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
-            )
+        db_user = await UserService.get_or_404(db, user_id)
         
         update_data = user_in.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_user, field, value)
         
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await principal_cache.invalidate(db_user.id)
+        if update_data.keys() & TOKEN_CLAIM_FIELDS:
+            # email et nom sont embarqués dans les tokens sans état : les rendre périmés
+            await authz_versions.bump_users(db_user.id)
         return db_user
 
     @staticmethod
-    def deactivate(db: Session, user_id: UUID) -> User:
+    async def deactivate(db: AsyncSession, user_id: UUID) -> User:
         """Désactiver un utilisateur"""
-        db_user = UserService.get_by_id(db, user_id)
-        if not db_user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="µšër ñøt føµñðẤğ倪İЂҰक्र्तिृまẤğ倪นั้ढूँ"
-            )
+        db_user = await UserService.get_or_404(db, user_id)
         
         db_user.is_active = False
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await principal_cache.invalidate(db_user.id)
+        await authz_versions.bump_users(db_user.id)
+        try:
+            await session_registry.revoke_user_sessions(db_user.id)
+        except Exception as e:
+            print(f"Session revocation error: {e}")
         return db_user
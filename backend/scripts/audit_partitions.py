@@ -0,0 +1,96 @@
+"""
+Maintenance des partitions mensuelles de audit_logs.
+
+Crée à l'avance les partitions des prochains mois, puis applique la
+rétention définie dans les paramètres système (audit_retention_days) : les
+partitions expirées sont détachées et déplacées dans le schéma
+audit_archive. Si AUDIT_COLD_STORAGE_URI est défini, les tables de
+audit_archive sont ensuite écrites en Parquet dans le stockage à froid puis
+supprimées. Idempotent : à lancer au déploiement (start.sh) et chaque jour
+(cron).
+
+Usage: python -m scripts.audit_partitions [--months-ahead 3] [--retention-days N] [--dry-run]
+"""
+import argparse
+import sys
+
+from app.core.database import engine
+from app.services.audit_cold_storage import audit_cold_store
+from app.services.audit_partitions import (
+    ARCHIVE_SCHEMA,
+    archive_partition,
+    ensure_partitions,
+    expired_partitions,
+    get_retention_days,
+    is_partitioned,
+    list_partitions,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--months-ahead", type=int, default=3)
+    parser.add_argument("--retention-days", type=int, default=None, help="Remplace audit_retention_days")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            print("❌ audit_logs n'est pas partitionnée (alembic upgrade head)")
+            sys.exit(1)
+        created = ensure_partitions(conn, args.months_ahead, dry_run=args.dry_run)
+        retention_days = args.retention_days if args.retention_days is not None else get_retention_days(conn)
+        expired = expired_partitions(list_partitions(conn), retention_days)
+
+    for name in created:
+        print(f"✅ Partition créée : {name}")
+    if not created:
+        print(f"✅ Partitions déjà prêtes pour les {args.months_ahead} prochains mois")
+
+    failures = 0
+    if retention_days <= 0:
+        print("ℹ️  Rétention illimitée (audit_retention_days = 0)")
+        expired = []
+    for partition in expired:
+        if args.dry_run:
+            print(f"📦 À archiver : {partition.name} (< {partition.upper:%Y-%m-%d})")
+            continue
+        # Une transaction par partition : un verrou refusé n'annule pas les autres
+        try:
+            with engine.begin() as conn:
+                archive_partition(conn, partition)
+            print(f"📦 Archivée : {ARCHIVE_SCHEMA}.{partition.name}")
+        except Exception as e:
+            failures += 1
+            print(f"❌ Archivage de {partition.name} impossible : {e}")
+    if retention_days > 0 and not expired:
+        print(f"✅ Aucune partition au-delà de {retention_days} jours")
+
+    if audit_cold_store.enabled:
+        failures += store_archived(args.dry_run)
+    if failures:
+        sys.exit(1)
+
+
+def store_archived(dry_run: bool) -> int:
+    """Déplacer les tables de audit_archive vers le stockage à froid ; retourne le nombre d'échecs"""
+    with engine.connect() as conn:
+        tables = audit_cold_store.archived_tables(conn)
+    failures = 0
+    for table in tables:
+        if dry_run:
+            print(f"🧊 À déplacer vers {audit_cold_store.uri} : {ARCHIVE_SCHEMA}.{table}")
+            continue
+        try:
+            with engine.begin() as conn:
+                written = audit_cold_store.store_table(conn, table)
+                audit_cold_store.drop_table(conn, table, written)
+            print(f"🧊 {ARCHIVE_SCHEMA}.{table} -> {audit_cold_store.uri} ({written} logs)")
+        except Exception as e:
+            failures += 1
+            print(f"❌ Stockage à froid de {table} impossible : {e}")
+    return failures
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark : débit des middlewares, anciennes versions `@app.middleware("http")`
+(BaseHTTPMiddleware) contre les middlewares ASGI purs.
+
+Deux petites applications identiques (GET /api/v1/ping et un PUT @audited qui
+renseigne request.state comme la dépendance d'authentification), appelées en
+ASGI direct par httpx, requêtes concurrentes. L'insertion en base est
+remplacée par un compteur : on mesure le coût du middleware et du dépôt dans
+audit_writer, pas celui du stockage.
+
+Pile complète : GET /api/v1/ping sur `app.main.app` (CORS, audit, instrumentation
+SQL) contre la même pile montée avec les anciens middlewares http.
+
+Usage: python -m scripts.bench_audit_middleware [--requests 5000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+
+import app.core.audit_writer as audit_writer_module
+from app.api.middleware.audit import AuditMiddleware, generate_description, log_audit_event, WRITE_METHODS
+from app.core.audit_routes import audited, audit_routes
+from app.core.audit_writer import audit_writer
+from app.core.query_stats import RequestQueryStats, _current, query_stats
+from app.models.audit import ActionType
+
+
+async def legacy_audit_middleware(request: Request, call_next):
+    """Ancien audit_middleware (BaseHTTPMiddleware, dépôt attendu)"""
+    if request.method not in WRITE_METHODS:
+        return await call_next(request)
+    response: Response = await call_next(request)
+    if not 200 <= response.status_code < 300:
+        return response
+    try:
+        audit = audit_routes.lookup(request.scope)
+        if audit is not None:
+            await log_audit_event(
+                action=audit.action,
+                description=generate_description(audit.action, request),
+                request=request,
+                user_id=getattr(request.state, "user_id", None),
+                user_email=getattr(request.state, "user_email", None),
+                user_name=getattr(request.state, "user_name", None),
+                target_type=audit.target_type,
+                target_id=audit.target_id(request.path_params),
+            )
+    except Exception as e:
+        print(f"Audit middleware error: {e}")
+    return response
+
+
+async def legacy_query_stats_middleware(request: Request, call_next):
+    """Ancienne instrumentation SQL (BaseHTTPMiddleware)"""
+    stats = RequestQueryStats()
+    token = _current.set(stats)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _current.reset(token)
+    elapsed = time.perf_counter() - started
+    response.headers["Server-Timing"] = query_stats.finish(request.scope, stats, elapsed, response.status_code)
+    return response
+
+
+def build_app(legacy: bool, full_stack: bool = False) -> FastAPI:
+    """full_stack : mêmes middlewares, dans le même ordre, que app.main.app"""
+    bench_app = FastAPI()
+
+    @bench_app.get("/api/v1/ping")
+    async def ping():
+        return {"message": "pong"}
+
+    @bench_app.put("/api/v1/users/{user_id}")
+    @audited(ActionType.USER_UPDATE, "user", "user_id")
+    async def update_user(user_id: str, request: Request):
+        request.state.user_id = "00000000-0000-0000-0000-000000000001"
+        request.state.user_email = "bench@example.com"
+        request.state.user_name = "Bench"
+        return {"id": user_id}
+
+    if full_stack:
+        bench_app.add_middleware(
+            CORSMiddleware, allow_origins=["*"], allow_credentials=True,
+            allow_methods=["*"], allow_headers=["*"], expose_headers=["*"],
+        )
+    if legacy:
+        bench_app.middleware("http")(legacy_audit_middleware)
+    else:
+        bench_app.add_middleware(AuditMiddleware)
+    if full_stack and legacy:
+        bench_app.middleware("http")(legacy_query_stats_middleware)
+    return bench_app
+
+
+async def run(bench_app: FastAPI, method: str, path: str, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=bench_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        remaining = iter(range(requests))
+
+        async def worker():
+            for _ in remaining:
+                response = await client.request(method, path)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - started)
+
+
+async def main(requests: int, concurrency: int):
+    written = 0
+
+    async def count_insert(events):
+        nonlocal written
+        written += len(events)
+
+    audit_writer_module._insert = count_insert
+    audit_writer.start()
+    apps = {"legacy (http)": build_app(legacy=True), "ASGI": build_app(legacy=False)}
+    # Les deux applications ont les mêmes routes : une seule table suffit
+    audit_routes.build(apps["ASGI"].routes)
+
+    print(f"🚀 {requests} requêtes, {concurrency} concurrentes\n")
+    results = {}
+    for label, (method, path) in {"GET /api/v1/ping": ("GET", "/api/v1/ping"), "PUT /api/v1/users/{id}": ("PUT", "/api/v1/users/42")}.items():
+        for name, bench_app in apps.items():
+            await run(bench_app, method, path, min(requests, 500), concurrency)  # échauffement
+            results[(label, name)] = await run(bench_app, method, path, requests, concurrency)
+            print(f"  {label:24s} {name:14s} {results[(label, name)]:10.0f} req/s")
+        print(f"  {'':24s} {'gain':14s} {results[(label, 'ASGI')] / results[(label, 'legacy (http)')]:10.2f}x\n")
+
+    # Import tardif : app.main construit les moteurs et la pile de production
+    from app.main import app as main_app
+
+    label = "app.main GET /ping"
+    stacks = {"legacy (http)": build_app(legacy=True, full_stack=True), "ASGI": main_app}
+    for name, bench_app in stacks.items():
+        await run(bench_app, "GET", "/api/v1/ping", min(requests, 500), concurrency)
+        results[(label, name)] = await run(bench_app, "GET", "/api/v1/ping", requests, concurrency)
+        print(f"  {label:24s} {name:14s} {results[(label, name)]:10.0f} req/s")
+    print(f"  {'':24s} {'gain':14s} {results[(label, 'ASGI')] / results[(label, 'legacy (http)')]:10.2f}x\n")
+
+    await audit_writer.stop()
+    print(f"✅ {written} événements d'audit déposés")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,126 @@
+"""
+Benchmark : classification des requêtes d'écriture par le middleware d'audit.
+
+Compare l'ancienne analyse de l'URL (tests de sous-chaînes, `isdigit()` pour
+l'identifiant) à la table (méthode, gabarit de route) -> @audited, interrogée
+avec la route déjà résolue par Starlette. Affiche aussi les routes que les
+deux approches classent différemment.
+
+Usage: python -m scripts.bench_audit_routes [--requests 200000]
+"""
+import argparse
+import random
+import re
+import time
+import uuid
+
+from app.main import app
+from app.core.audit_routes import audit_routes
+from app.models.audit import ActionType
+
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+def legacy_action(method: str, path: str):
+    """Ancien get_action_from_route (sans les membres d'ActionType inexistants)"""
+    if "/users" in path:
+        if method == "POST" and not any(x in path for x in ["activate", "deactivate"]):
+            return ActionType.USER_CREATE
+        elif method == "PUT" or method == "PATCH":
+            return ActionType.USER_UPDATE
+        elif method == "DELETE":
+            return ActionType.USER_DELETE
+        elif "activate" in path:
+            return ActionType.USER_ACTIVATE
+        elif "deactivate" in path:
+            return ActionType.USER_DEACTIVATE
+    elif "/roles" in path:
+        if method == "POST":
+            return ActionType.ROLE_CREATE
+        elif method == "PUT" or method == "PATCH":
+            return ActionType.ROLE_UPDATE
+        elif method == "DELETE":
+            return ActionType.ROLE_DELETE
+        elif "permissions" in path:
+            return ActionType.PERMISSION_ASSIGN
+    elif "/permissions" in path:
+        if method == "POST":
+            return ActionType.PERMISSION_CREATE
+        elif method == "PUT" or method == "PATCH":
+            return ActionType.PERMISSION_UPDATE
+        elif method == "DELETE":
+            return ActionType.PERMISSION_DELETE
+    elif "/login" in path and method == "POST":
+        return ActionType.USER_LOGIN
+    elif "/logout" in path:
+        return ActionType.USER_LOGOUT
+    elif "/settings" in path:
+        if method == "PUT" or method == "PATCH":
+            return ActionType.SYSTEM_SETTINGS_UPDATE
+    return None
+
+
+def legacy_target(path: str):
+    """Ancien extract_target_info"""
+    parts = path.strip("/").split("/")
+    for i, part in enumerate(parts):
+        if part in ["users", "roles", "permissions", "settings"]:
+            target_type = part.rstrip("s")
+            target_id = parts[i + 1] if i + 1 < len(parts) and parts[i + 1].isdigit() else None
+            return target_type, target_id
+    return None, None
+
+
+def requests_for_routes():
+    """Une requête d'écriture par (méthode, route), identifiants UUID dans le chemin"""
+    samples = []
+    for route in app.routes:
+        for method in sorted(set(getattr(route, "methods", None) or ()) & set(WRITE_METHODS)):
+            params = {name: str(uuid.uuid4()) for name in re.findall(r"{(\w+)}", route.path)}
+            path = route.path.format(**params)
+            samples.append((method, path, {"method": method, "route": route, "path_params": params}))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200000)
+    args = parser.parse_args()
+
+    audit_routes.build(app.routes)
+    samples = requests_for_routes()
+    rng = random.Random(42)
+    order = [samples[rng.randrange(len(samples))] for _ in range(args.requests)]
+
+    print(f"🚀 {len(samples)} routes d'écriture, {len(audit_routes)} entrées auditées, {args.requests} requêtes\n")
+
+    started = time.perf_counter()
+    for method, path, _ in order:
+        legacy_action(method, path)
+        legacy_target(path)
+    legacy = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _, _, scope in order:
+        audit = audit_routes.lookup(scope)
+        if audit is not None:
+            audit.target_id(scope["path_params"])
+    table = time.perf_counter() - started
+
+    print(f"  analyse d'URL : {legacy / args.requests * 1e6:8.3f} µs/requête")
+    print(f"  table         : {table / args.requests * 1e6:8.3f} µs/requête")
+    print(f"  gain          : x{legacy / table:.1f}\n")
+
+    print("  Différences de classification (ancienne -> table) :")
+    for method, path, scope in samples:
+        audit = audit_routes.lookup(scope)
+        old = (legacy_action(method, path), legacy_target(path)[1])
+        new = (audit.action, audit.target_id(scope["path_params"])) if audit else (None, None)
+        if old != new:
+            template = scope["route"].path
+            print(f"    {method:6s} {template:45s} {old[0] and old[0].value} -> {new[0] and new[0].value}"
+                  f"{'  (+id)' if new[1] and not old[1] else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark : vérification de permission par boucle imbriquée (ancienne
+implémentation de has_permission) vs test de bit sur le catalogue compilé.
+
+Usage: python -m scripts.bench_rbac [--roles 50] [--permissions 500]
+"""
+import argparse
+import random
+import timeit
+import uuid
+from types import SimpleNamespace
+
+from app.core.rbac import compile_catalog
+
+
+def nested_loop_check(user, resource: str, action: str) -> bool:
+    """Reproduction fidèle de l'ancienne boucle de has_permission"""
+    for role in user.roles:
+        for permission in role.permissions:
+            if permission.resource == resource and permission.action == action:
+                return True
+            if role.name == "Super Admin":
+                return True
+    return False
+
+
+def build_dataset(n_roles: int, n_permissions: int, seed: int = 42):
+    rng = random.Random(seed)
+    permissions = [
+        SimpleNamespace(id=uuid.uuid4(), resource=f"resource{i // 5}", action=f"action{i % 5}")
+        for i in range(n_permissions)
+    ]
+    roles = []
+    for i in range(n_roles):
+        granted = rng.sample(permissions, k=n_permissions // 2)
+        roles.append(SimpleNamespace(id=uuid.uuid4(), name=f"Role {i}", permissions=granted))
+    return permissions, roles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--roles", type=int, default=50)
+    parser.add_argument("--permissions", type=int, default=500)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    permissions, roles = build_dataset(args.roles, args.permissions)
+    catalog = compile_catalog(
+        [(p.id, p.resource, p.action) for p in permissions],
+        [(r.id, r.name) for r in roles],
+        [(r.id, p.id) for r in roles for p in r.permissions],
+    )
+
+    # Utilisateur portant tous les rôles : pire cas pour la boucle imbriquée
+    user = SimpleNamespace(roles=roles)
+    granted = roles[-1].permissions[-1]
+    cases = {
+        "permission accordée": (granted.resource, granted.action),
+        "permission refusée": ("unknown", "read"),
+    }
+
+    print(f"🚀 RBAC: {args.roles} rôles × {args.permissions} permissions, {args.number} appels\n")
+    for label, (resource, action) in cases.items():
+        expected = nested_loop_check(user, resource, action)
+
+        def compiled_check():
+            mask = catalog.mask_for_roles(role.id for role in user.roles)
+            return catalog.allows(mask, resource, action)
+
+        assert compiled_check() == expected
+
+        loop_time = timeit.timeit(lambda: nested_loop_check(user, resource, action), number=args.number)
+        compiled_time = timeit.timeit(compiled_check, number=args.number)
+        print(f"  {label}:")
+        print(f"    boucle imbriquée : {loop_time / args.number * 1e6:9.2f} µs/appel")
+        print(f"    masque compilé   : {compiled_time / args.number * 1e6:9.2f} µs/appel")
+        print(f"    accélération     : x{loop_time / compiled_time:.1f}\n")
+
+
+if __name__ == "__main__":
+    main()
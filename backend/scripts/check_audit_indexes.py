@@ -0,0 +1,125 @@
+"""
+Vérification (EXPLAIN) que chaque filtre de recherche des logs d'audit est
+servi par son index.
+
+Sur une base PostgreSQL JETABLE (schéma créé, logs fictifs insérés sur
+plusieurs mois), construit la requête de chaque filtre avec AuditLogFilters
+(le code de la route), puis lit son plan avec `enable_seqscan = off` : si
+l'index attendu peut servir le prédicat, le planificateur le prend. Affiche
+aussi le nombre de partitions parcourues (élagage). Échoue si un filtre
+n'utilise pas son index.
+
+Usage: python -m scripts.check_audit_indexes --database-url postgresql://.../crm_scratch [--rows 20000]
+"""
+import argparse
+import inspect
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    # Avant tout import de l'application : les moteurs lisent DATABASE_URL
+    os.environ["DATABASE_URL"] = args.database_url
+
+    from sqlalchemy import insert, select, text
+    from sqlalchemy.ext.compiler import compiles
+    from sqlalchemy.sql.expression import ClauseElement, Executable
+    from app.core.database import Base, engine
+    from app.models.audit import AuditLog, ActionType
+    from app.services.audit_partitions import add_months, ensure_partitions, month_start
+    from app.services.audit_search import AuditLogFilters
+
+    class Explain(Executable, ClauseElement):
+        inherit_cache = False
+
+        def __init__(self, statement):
+            self.statement = statement
+
+    @compiles(Explain, "postgresql")
+    def _explain(element, compiler, **kw):
+        return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+    def filters(**values):
+        names = list(inspect.signature(AuditLogFilters.__init__).parameters)[1:]
+        return AuditLogFilters(**{name: values.get(name) for name in names})
+
+    now = datetime.now(timezone.utc)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(42)
+    actions = list(ActionType)
+    with engine.begin() as conn:
+        ensure_partitions(conn, 4, now=add_months(month_start(now), -3))
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "action": actions[i % len(actions)],
+                "description": "check",
+                "user_id": uuid.uuid4(),
+                "user_email": f"user{i % 500}@bank-{i % 7}.example.com",
+                "user_name": f"Agent {i % 500}",
+                "target_type": "user",
+                "target_id": str(uuid.uuid4()),
+                "ip_address": f"10.{i % 250}.{i % 200}.{i % 100}",
+                "details": {"reason": rng.choice(["manual", "import", "api"]), **({"batch": i % 40} if i % 3 == 0 else {})},
+                "created_at": now - timedelta(minutes=rng.randrange(90 * 24 * 60)),
+            }
+            for i in range(args.rows)
+        ]
+        for start in range(0, len(rows), 5000):
+            conn.execute(insert(AuditLog), rows[start:start + 5000])
+        conn.execute(text("ANALYZE audit_logs"))
+    print(f"🚀 {args.rows} logs sur 90 jours\n")
+
+    sample = rows[len(rows) // 2]
+    cases = [
+        ("user_email (sous-chaîne)", filters(user_email="bank-3"), "ix_audit_logs_user_email_trgm"),
+        ("user_name (sous-chaîne)", filters(user_name="gent 42"), "ix_audit_logs_user_name_trgm"),
+        ("details_key", filters(details_key=["batch"]), "ix_audit_logs_details"),
+        ("details clé=valeur", filters(details=["reason=manual"]), "ix_audit_logs_details"),
+        ("target_id", filters(target_id=sample["target_id"]), "ix_audit_logs_target_id"),
+        ("ip_address", filters(ip_address=sample["ip_address"]), "ix_audit_logs_ip_address"),
+        ("action + période", filters(action=ActionType.USER_UPDATE.value, days=7), "ix_audit_logs_action_created_at_id"),
+        ("start_date / end_date", filters(start_date=now - timedelta(days=40), end_date=now - timedelta(days=35)), "ix_audit_logs_created_at_id"),
+        ("days", filters(days=3), "ix_audit_logs_created_at_id"),
+    ]
+
+    failures = []
+    with engine.connect() as conn:
+        conn.execute(text("SET enable_seqscan = off"))
+        for label, case, expected in cases:
+            plan = conn.execute(Explain(case.apply(select(AuditLog)))).scalar()[0]["Plan"]
+            nodes, stack = [], [plan]
+            while stack:
+                node = stack.pop()
+                nodes.append(node)
+                stack.extend(node.get("Plans", []))
+            # Index des partitions -> index parent déclaré sur audit_logs
+            used = {
+                conn.scalar(text("SELECT COALESCE(pg_partition_root(CAST(:name AS regclass)), CAST(:name AS regclass))::text"), {"name": node["Index Name"]})
+                for node in nodes if "Index Name" in node
+            }
+            partitions = {node["Relation Name"] for node in nodes if "Relation Name" in node}
+            seq_scans = [node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"]
+            ok = expected in used and not seq_scans
+            if not ok:
+                failures.append(f"{label}: attendu {expected}, plan {sorted(used) or seq_scans}")
+            print(f"  {'✅' if ok else '❌'} {label:28s} {', '.join(sorted(used)) or 'Seq Scan'}  ({len(partitions)} partition(s))")
+
+    if failures:
+        print("\n❌ Filtres non servis par leur index :")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n✅ Chaque filtre utilise son index")
+
+
+if __name__ == "__main__":
+    main()
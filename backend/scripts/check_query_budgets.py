@@ -0,0 +1,129 @@
+"""
+Vérification des budgets de requêtes SQL (@query_budget) à volume croissant.
+
+Sur une base JETABLE (le schéma y est créé et des utilisateurs fictifs y sont
+insérés), appelle chaque route GET qui déclare un budget, en mode strict et
+avec le cache des principals désactivé (pire cas : authentification sans
+cache). Échoue si une route dépasse son budget ou si son nombre de requêtes
+varie avec le volume (signe d'un N+1).
+
+Redis doit être joignable (REDIS_URL) : la connexion crée une session.
+
+Usage: python -m scripts.check_query_budgets --database-url postgresql://.../crm_scratch [--sizes 10,100,1000]
+"""
+import argparse
+import os
+import re
+import sys
+import uuid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--sizes", default="10,100,1000")
+    args = parser.parse_args()
+
+    # Avant tout import de l'application : les moteurs lisent DATABASE_URL
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["READ_REPLICA_URL"] = ""
+    # Les comptes sont lus dans l'en-tête Server-Timing du middleware d'instrumentation
+    os.environ["SQL_INSTRUMENTATION_ENABLED"] = "true"
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.core.auth_cache import principal_cache
+    from app.core.database import Base, SessionLocal, engine
+    from app.core.query_stats import query_stats
+    from app.core.security import get_password_hash
+    from app.models.user import User, Role, Permission
+
+    Base.metadata.create_all(bind=engine)
+    password = uuid.uuid4().hex
+    db = SessionLocal()
+    super_admin = db.query(Role).filter(Role.name == "Super Admin").first() or Role(name="Super Admin")
+    admin = User(
+        email=f"budget-{uuid.uuid4().hex[:8]}@example.com", username=f"budget-{uuid.uuid4().hex[:8]}",
+        hashed_password=get_password_hash(password), first_name="Budget", last_name="Check", roles=[super_admin],
+    )
+    db.add(admin)
+    db.commit()
+    admin_id, role_id = str(admin.id), str(super_admin.id)
+    db.close()
+
+    params = {"user_id": admin_id, "role_id": role_id}
+    routes = []
+    for route in app.routes:
+        budget = getattr(getattr(route, "endpoint", None), "query_budget", None)
+        if not budget or "GET" not in getattr(route, "methods", ()) or route.path.endswith("/"):
+            continue
+        names = re.findall(r"{(\w+)}", route.path)
+        if all(name in params for name in names):
+            routes.append((route.path.format(**params), budget))
+
+    principal_cache.enabled = False
+    query_stats.strict = True
+    failures = []
+    seeded = 0
+    counts = {}
+    with TestClient(app) as client:
+        response = client.post("/api/v1/auth/login", json={"email": admin.email, "password": password})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        for size in [int(size) for size in args.sizes.split(",")]:
+            db = SessionLocal()
+            tag = uuid.uuid4().hex[:6]
+            roles = [
+                Role(name=f"budget-{tag}-{i}", permissions=[
+                    Permission(name=f"budget{tag}{i}.{action}", resource=f"budget{tag}{i}", action=action)
+                    for action in ("read", "update")
+                ])
+                for i in range(max(size // 10, 1))
+            ]
+            db.add_all(roles)
+            db.add_all([
+                User(
+                    email=f"budget-{tag}-{i}@example.com", username=f"budget-{tag}-{i}", hashed_password="!",
+                    first_name="Budget", last_name=str(i), roles=[roles[i % len(roles)]],
+                )
+                for i in range(size - seeded)
+            ])
+            db.commit()
+            db.close()
+            seeded = size
+
+            # Préchauffage hors mesure : rechargement du catalogue RBAC (nouveaux rôles)
+            query_stats.strict = False
+            for path, _ in routes:
+                client.get(path, headers=headers)
+            query_stats.strict = True
+
+            print(f"🚀 {size} utilisateurs")
+            for path, budget in routes:
+                try:
+                    response = client.get(f"{path}?limit={size}", headers=headers)
+                except Exception as e:
+                    failures.append(f"{path} @ {size}: {e}")
+                    print(f"  ❌ {path}: {e}")
+                    continue
+                queries = int(re.search(r'desc="(\d+) queries"', response.headers["server-timing"]).group(1))
+                counts.setdefault(path, set()).add(queries)
+                if queries > budget:
+                    failures.append(f"{path} @ {size}: {queries} requêtes (budget {budget})")
+                print(f"  {'✅' if queries <= budget else '❌'} {queries:3d}/{budget:<3d} {path}")
+
+    for path, seen in counts.items():
+        if len(seen) > 1:
+            failures.append(f"{path}: nombre de requêtes variable selon le volume {sorted(seen)}")
+
+    if failures:
+        print("\n❌ Budgets non respectés :")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n✅ Tous les budgets sont respectés")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Profil du temps d'import d'un worker (`python -X importtime`).
+
+Importe le module dans un interpréteur neuf, agrège le temps cumulé par
+paquet de premier niveau et affiche les modules les plus coûteux. Avec
+--budget-ms, le code de sortie vaut 1 si l'import dépasse le budget (à
+brancher en CI pour garder le démarrage des workers sous contrôle).
+
+Usage: python -m scripts.profile_import [--module app.main] [--top 25] [--budget-ms 1500]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+# Ligne : "import time:  self [us] | cumulative | imported package"
+PREFIX = "import time:"
+
+
+def profile(module: str):
+    """Retourne [(module, self_us, cumulative_us, profondeur)] dans l'ordre d'import"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=os.environ.copy(),
+    )
+    if completed.returncode != 0:
+        print(completed.stderr[-2000:], file=sys.stderr)
+        raise SystemExit(f"❌ Import de {module} impossible")
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith(PREFIX) or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len(PREFIX):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    entries = profile(args.module)
+    target = next((e for e in reversed(entries) if e[0] == args.module), None)
+    total_ms = target[2] / 1000 if target else sum(e[1] for e in entries) / 1000
+
+    # Coût propre agrégé par paquet de premier niveau (fastapi, sqlalchemy, app...)
+    packages = defaultdict(int)
+    for name, self_us, _, _ in entries:
+        packages[name.split(".")[0]] += self_us
+
+    print(f"🚀 import {args.module} : {total_ms:.1f} ms ({len(entries)} modules)\n")
+
+    print("  Paquets (temps propre cumulé)")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"    {self_us / 1000:8.1f} ms  {package}")
+
+    print("\n  Modules de l'application (temps cumulé)")
+    app_modules = [e for e in entries if e[0].startswith("app.")]
+    for name, _, cumulative_us, _ in sorted(app_modules, key=lambda e: -e[2])[:args.top]:
+        print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+
+    if args.budget_ms is not None:
+        if total_ms > args.budget_ms:
+            print(f"\n❌ Budget dépassé : {total_ms:.1f} ms > {args.budget_ms:.1f} ms")
+            raise SystemExit(1)
+        print(f"\n✅ Sous le budget : {total_ms:.1f} ms <= {args.budget_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,10 @@ pip install -r requirements.txt
 echo "Running database migrations..."
 alembic upgrade head
 
+# Pre-create audit_logs partitions and apply retention
+echo "Maintaining audit log partitions..."
+python -m scripts.audit_partitions || echo "Audit partition maintenance failed"
+
 # Initialize roles and permissions (only if tables are empty)
 echo "Initializing roles and permissions..."
 python -m scripts.init_roles || echo "Roles already initialized"
@@ -2,7 +2,7 @@
 
 import { useAuth } from '@/contexts/AuthContext';
 import { useRouter } from 'next/navigation';
-import { useEffect, useState } from 'react';
+import { useCallback, useEffect, useRef, useState } from 'react';
 import API_URL from '@/config/api';
 
 interface AuditLog {
@@ -17,6 +17,8 @@ interface AuditLog {
   created_at: string;
 }
 
+const PAGE_SIZE = 50;
+
 export default function AuditPage() {
   const { loading, isAuthenticated } = useAuth();
   const router = useRouter();
@@ -26,6 +28,11 @@ export default function AuditPage() {
   const [filterUser, setFilterUser] = useState('');
   const [filterDays, setFilterDays] = useState('7');
   const [availableActions, setAvailableActions] = useState<string[]>([]);
+  // Curseur de la page suivante (en-tête X-Next-Cursor), null en fin de liste
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  const [isLive, setIsLive] = useState(false);
+  const sentinelRef = useRef<HTMLDivElement | null>(null);
 
   useEffect(() => {
     if (!loading && !isAuthenticated) {
@@ -58,26 +65,34 @@ export default function AuditPage() {
     }
   };
 
+  const fetchPage = async (cursor: string | null) => {
+    const token = localStorage.getItem('token');
+    const params = new URLSearchParams();
+
+    if (filterAction) params.append('action', filterAction);
+    if (filterUser) params.append('user_email', filterUser);
+    if (filterDays) params.append('days', filterDays);
+    if (cursor) params.append('cursor', cursor);
+    params.append('limit', String(PAGE_SIZE));
+
+    const response = await fetch(`${API_URL}/audit?${params}`, {
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+
+    if (!response.ok) return null;
+    const data: AuditLog[] = await response.json();
+    return { data, next: response.headers.get('X-Next-Cursor') };
+  };
+
   const fetchLogs = async () => {
     setIsLoading(true);
     try {
-      const token = localStorage.getItem('token');
-      const params = new URLSearchParams();
-      
-      if (filterAction) params.append('action', filterAction);
-      if (filterUser) params.append('user_email', filterUser);
-      if (filterDays) params.append('days', filterDays);
-      params.append('limit', '50');
-
-      const response = await fetch(`${API_URL}/audit?${params}`, {
-        headers: {
-          'Authorization': `Bearer ${token}`,
-        },
-      });
-
-      if (response.ok) {
-        const data = await response.json();
-        setLogs(data);
+      const page = await fetchPage(null);
+      if (page) {
+        setLogs(page.data);
+        setNextCursor(page.next);
       }
     } catch (error) {
       console.error('Error fetching logs:', error);
@@ -86,6 +101,84 @@ export default function AuditPage() {
     }
   };
 
+  const fetchMore = useCallback(async () => {
+    if (!nextCursor || isLoadingMore) return;
+    setIsLoadingMore(true);
+    try {
+      const page = await fetchPage(nextCursor);
+      if (page) {
+        setLogs((previous) => [...previous, ...page.data]);
+        setNextCursor(page.next);
+      }
+    } catch (error) {
+      console.error('Error fetching logs:', error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [nextCursor, isLoadingMore, filterAction, filterUser, filterDays]);
+
+  // Flux en direct (SSE via fetch : l'en-tête Authorization est conservé)
+  useEffect(() => {
+    if (!isAuthenticated) return;
+    const controller = new AbortController();
+    const params = new URLSearchParams();
+    if (filterAction) params.append('action', filterAction);
+    if (filterUser) params.append('user_email', filterUser);
+
+    const listen = async () => {
+      const token = localStorage.getItem('token');
+      const response = await fetch(`${API_URL}/audit/stream?${params}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+        },
+        signal: controller.signal,
+      });
+      if (!response.ok || !response.body) return;
+      setIsLive(true);
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buffer = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += value;
+        const messages = buffer.split('\n\n');
+        buffer = messages.pop() ?? '';
+        for (const message of messages) {
+          const lines = message.split('\n');
+          const data = lines.find((line) => line.startsWith('data: '))?.slice(6);
+          if (!data) continue;
+          if (lines.includes('event: dropped')) {
+            // Client trop lent : des événements ont été perdus, recharger la liste
+            fetchLogs();
+            continue;
+          }
+          const log: AuditLog = JSON.parse(data);
+          setLogs((previous) => previous.some((item) => item.id === log.id) ? previous : [log, ...previous]);
+        }
+      }
+    };
+
+    listen()
+      .catch((error) => {
+        if (!controller.signal.aborted) console.error('Error streaming logs:', error);
+      })
+      .finally(() => setIsLive(false));
+    return () => controller.abort();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [isAuthenticated, filterAction, filterUser]);
+
+  // Défilement infini : charger la page suivante quand le bas de liste devient visible
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!sentinel || !nextCursor) return;
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting) fetchMore();
+    }, { rootMargin: '200px' });
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [nextCursor, fetchMore]);
+
   const getActionColor = (action: string) => {
     if (action.includes('create')) return 'text-green-400 bg-green-500/10 border-green-500/30';
     if (action.includes('update')) return 'text-blue-400 bg-blue-500/10 border-blue-500/30';
@@ -163,7 +256,15 @@ export default function AuditPage() {
             </svg>
             Logs et Audit Trail
           </h1>
-          <p className="text-gray-400">Historique de toutes les actions du système</p>
+          <p className="text-gray-400 flex items-center gap-3">
+            Historique de toutes les actions du système
+            {isLive && (
+              <span className="flex items-center gap-1.5 text-xs text-green-400">
+                <span className="w-2 h-2 rounded-full bg-green-400 animate-pulse"></span>
+                En direct
+              </span>
+            )}
+          </p>
         </div>
 
         {/* Filters */}
@@ -285,9 +386,18 @@ export default function AuditPage() {
           </div>
         </div>
 
+        <div ref={sentinelRef} />
+
+        {isLoadingMore && (
+          <div className="mt-4 flex justify-center">
+            <div className="animate-spin rounded-full h-6 w-6 border-b-2 border-purple-500"></div>
+          </div>
+        )}
+
         {logs.length > 0 && (
           <div className="mt-4 text-center text-gray-400 text-sm">
             {logs.length} log{logs.length > 1 ? 's' : ''} affiché{logs.length > 1 ? 's' : ''}
+            {!nextCursor && ' — fin de l\'historique'}
           </div>
         )}
       </div>
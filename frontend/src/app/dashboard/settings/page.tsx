@@ -475,6 +475,19 @@ export default function SettingsPage() {
                   </div>
                 </label>
 
+                <div className="p-4 bg-white/5 rounded-lg border border-white/10">
+                  <label className="block text-sm font-medium text-gray-300 mb-2">Conservation du journal d'audit (jours)</label>
+                  <input
+                    type="number"
+                    min={0}
+                    max={3650}
+                    value={settings.audit_retention_days ?? 0}
+                    onChange={(e) => setSettings({ ...settings, audit_retention_days: Number.parseInt(e.target.value) || 0 })}
+                    className="w-full px-4 py-2 bg-white/5 border border-white/10 rounded-lg text-white focus:border-purple-500 focus:outline-none"
+                  />
+                  <div className="text-sm text-gray-400 mt-2">Les partitions mensuelles plus anciennes sont détachées et archivées par la maintenance (0 = conservation illimitée)</div>
+                </div>
+
                 <label className="flex items-center gap-3 p-4 bg-white/5 rounded-lg border border-white/10 cursor-pointer hover:bg-white/10 transition-all">
                   <input
                     type="checkbox"
@@ -31,6 +31,15 @@ export function AuthProvider({ children }: { children: React.ReactNode }) {
         setUser(currentUser);
       }
     } catch (error) {
+      // Token d'accès expiré : tenter une rotation avec le refresh token
+      if (await authService.refresh()) {
+        try {
+          setUser(await authService.getCurrentUser());
+          return;
+        } catch (retryError) {
+          console.error('Auth check failed after refresh:', retryError);
+        }
+      }
       console.error('Auth check failed:', error);
       authService.logout();
     } finally {
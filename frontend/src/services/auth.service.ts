@@ -33,6 +33,7 @@ export interface User {
 export interface AuthResponse {
   access_token: string;
   token_type: string;
+  refresh_token?: string;
   user: User;
 }
 
@@ -47,12 +48,44 @@ class AuthService {
     if (response.data.access_token) {
       localStorage.setItem('token', response.data.access_token);
       localStorage.setItem('user', JSON.stringify(response.data.user));
+      if (response.data.refresh_token) {
+        localStorage.setItem('refresh_token', response.data.refresh_token);
+      }
     }
     return response.data;
   }
 
+  async refresh(): Promise<string | null> {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (!refreshToken) {
+      return null;
+    }
+
+    try {
+      const response = await axios.post(`${API_URL}/auth/refresh`, {
+        refresh_token: refreshToken,
+      });
+      localStorage.setItem('token', response.data.access_token);
+      localStorage.setItem('refresh_token', response.data.refresh_token);
+      return response.data.access_token;
+    } catch (error) {
+      localStorage.removeItem('refresh_token');
+      return null;
+    }
+  }
+
   async logout(): Promise<void> {
+    const token = this.getToken();
+    if (token) {
+      // Révoquer la session côté serveur ; la déconnexion locale a lieu quoi qu'il arrive
+      await axios
+        .post(`${API_URL}/auth/logout`, null, {
+          headers: { Authorization: `Bearer ${token}` },
+        })
+        .catch(() => undefined);
+    }
     localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
     localStorage.removeItem('user');
   }
 
@@ -32,6 +32,7 @@ export interface SystemSettings {
   smtp_from_name?: string;
   // Fonctionnalités
   enable_audit_log?: boolean;
+  audit_retention_days?: number;
   enable_email_notifications?: boolean;
   enable_user_registration?: boolean;
   enable_password_reset?: boolean;